@@ -6,6 +6,7 @@ from flask_jwt_extended import JWTManager
 from .config import Config
 from flask_cors import CORS
 from .extensions import executor
+from .background import start_background_jobs
 
 from .routes.views import views_bp
 from .routes.batch import batch_bp
@@ -15,6 +16,12 @@ from .routes.model import model_bp
 from .routes.operator import operator_bp
 from .routes.products import products_bp
 from .routes.auth import auth_bp
+from .routes.health import health_bp
+from .routes.metrics import metrics_bp
+from .routes.jobs import jobs_bp
+from .routes.imports import imports_bp
+from .routes.exports import exports_bp
+from .routes.dashboard import dashboard_bp
 
 # # Carica .env solo se esiste il file (sviluppo locale)
 # if os.path.exists('.env'):
@@ -39,6 +46,16 @@ app.register_blueprint(databoom_bp)
 app.register_blueprint(ledger_bp)
 app.register_blueprint(model_bp)
 app.register_blueprint(operator_bp)
+app.register_blueprint(health_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(imports_bp)
+app.register_blueprint(exports_bp)
+app.register_blueprint(dashboard_bp)
+
+# --- JOB IN BACKGROUND ---
+# avviati alla prima richiesta di ogni processo (dopo un eventuale fork dei worker)
+app.before_request(start_background_jobs)
 
 
 # Profilation per capire i tempi di risposta di ongi api chiamata (in fase di test abilitarlo)
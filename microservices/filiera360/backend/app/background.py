@@ -0,0 +1,49 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+from .database_mongo.history_archive import start_history_archiver
+from .database_mongo.migrate_operators import migrate_operators
+from .services.import_service import fail_interrupted_imports
+from .services.ownership_service import start_ownership_reconciler
+from .services.reconcile_service import start_ledger_reconciler
+from .services.trending_service import start_trending_refresher
+from .services.write_jobs_service import start_write_job_recovery
+from .utils.operator_cache import preload_operator_producers
+
+# Processo in cui i job in background sono stati avviati. I thread non sopravvivono a un fork:
+# vengono avviati nel processo che serve le richieste, non all'import del modulo (che può avvenire
+# nel processo padre prima del fork, e senza I/O verso MongoDB)
+_started_pid = None
+_lock = threading.Lock()
+
+
+def _startup_tasks(started_at):
+    # find_operator_producer legge solo la collection operators: gli array embedded ancora presenti
+    # vanno migrati prima che gli operatori perdano l'autorizzazione sui batch
+    try:
+        migrate_operators()
+    except Exception as e:
+        print(f"[startup] Operator migration failed: {e}")
+    preload_operator_producers()
+    fail_interrupted_imports(started_at)
+
+
+def start_background_jobs():
+    """Avvia una sola volta per processo i job in background; registrato come before_request dell'app."""
+    global _started_pid
+    pid = os.getpid()
+    if _started_pid == pid:
+        return
+    with _lock:
+        if _started_pid == pid:
+            return
+        _started_pid = pid
+        start_history_archiver()
+        start_write_job_recovery()
+        start_ownership_reconciler()
+        start_ledger_reconciler()
+        start_trending_refresher()
+        # operazioni una tantum su MongoDB: non ritardano la prima richiesta
+        threading.Thread(target=_startup_tasks, args=(datetime.now(timezone.utc),),
+                         name="startup-tasks", daemon=True).start()
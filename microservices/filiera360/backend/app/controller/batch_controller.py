@@ -3,6 +3,7 @@ from flask_jwt_extended import get_jwt_identity
 
 from ..services.batch_service import get_batch_service, get_batch_history_service, upload_batch_service, \
     update_batch_service
+from .jobs_controller import wants_async_write, write_response
 
 def get_batch_controller():
     batch_id = request.args.get('batchId')
@@ -18,12 +19,12 @@ def upload_batch_controller():
     batch_data = request.json
     user_email = get_jwt_identity()
 
-    result, status = upload_batch_service(user_email, batch_data)
-    return jsonify(result), status
+    result, status = upload_batch_service(user_email, batch_data, async_write=wants_async_write())
+    return write_response(result, status)
 
 def update_batch_controller():
     batch_data = request.json
     user_email = get_jwt_identity()
 
-    result, status = update_batch_service(user_email, batch_data)
-    return jsonify(result), status
+    result, status = update_batch_service(user_email, batch_data, async_write=wants_async_write())
+    return write_response(result, status)
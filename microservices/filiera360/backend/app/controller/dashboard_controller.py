@@ -0,0 +1,8 @@
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity
+
+from ..services.dashboard_service import get_dashboard_service
+
+def get_dashboard_controller():
+    result, status = get_dashboard_service(get_jwt_identity())
+    return jsonify(result), status
@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+from flask import Response, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+from ..services.export_service import export_products_service
+
+def export_products_controller():
+    include_history = request.args.get("history", "true") != "false"
+    result, status = export_products_service(get_jwt_identity(), include_history)
+    if status != 200:
+        return jsonify(result), status
+    filename = f"products-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.ndjson"
+    return Response(result, mimetype="application/x-ndjson", headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no"
+    })
@@ -0,0 +1,10 @@
+from flask import jsonify
+
+from ..database_mongo.mongo_client import mongo
+
+def healthz_controller():
+    mongo_ok, mongo_error = mongo.is_ready()
+    if not mongo_ok:
+        return jsonify({"status": "unavailable", "mongo": "down", "error": mongo_error}), 503
+
+    return jsonify({"status": "ok", "mongo": "up"}), 200
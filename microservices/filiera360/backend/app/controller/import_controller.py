@@ -0,0 +1,28 @@
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+from ..services.import_service import start_product_import_service, get_product_import_service, \
+    get_product_import_rows_service
+
+def start_product_import_controller():
+    user_email = get_jwt_identity()
+    # file in un form multipart (campo "file") oppure direttamente nel corpo della richiesta
+    upload = request.files.get("file")
+    if upload:
+        source, filename, content_type = upload.stream, upload.filename, upload.mimetype
+    else:
+        source, filename, content_type = request.stream, None, request.mimetype
+    result, status = start_product_import_service(user_email, source, filename, content_type,
+                                                  request.args.get("format"))
+    if status == 202:
+        return jsonify(result), status, {"Location": result["statusUrl"]}
+    return jsonify(result), status
+
+def get_product_import_controller(job_id):
+    result, status = get_product_import_service(get_jwt_identity(), job_id)
+    return jsonify(result), status
+
+def get_product_import_rows_controller(job_id):
+    result, status = get_product_import_rows_service(get_jwt_identity(), job_id, request.args.get("status"),
+                                                     request.args.get("after"), request.args.get("limit"))
+    return jsonify(result), status
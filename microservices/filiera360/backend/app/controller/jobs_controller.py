@@ -0,0 +1,38 @@
+from flask import Response, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+from ..services.write_jobs_service import acquire_event_stream, get_write_job_service, release_event_stream, \
+    stream_write_job_events
+
+def wants_async_write():
+    """Scrittura asincrona richiesta con ?async=true oppure con l'header `Prefer: respond-async`."""
+    if request.args.get("async") == "true":
+        return True
+    return "respond-async" in request.headers.get("Prefer", "")
+
+def write_response(result, status):
+    """Risposta dei controller di scrittura: sui 202 indica che la preferenza async è stata applicata."""
+    if status == 202:
+        return jsonify(result), status, {"Preference-Applied": "respond-async", "Location": result["statusUrl"]}
+    return jsonify(result), status
+
+def get_job_controller(job_id):
+    result, status = get_write_job_service(get_jwt_identity(), job_id)
+    return jsonify(result), status
+
+def job_events_controller(job_id):
+    # il controllo di proprietà avviene prima di aprire lo stream
+    result, status = get_write_job_service(get_jwt_identity(), job_id)
+    if status != 200:
+        return jsonify(result), status
+    # ogni stream occupa un worker: oltre il limite il client legge lo stato con GET /jobs/<id>
+    if not acquire_event_stream():
+        return jsonify({"message": "Too many event streams, poll the job status instead.",
+                        "statusUrl": f"/jobs/{job_id}"}), 429, {"Retry-After": "5"}
+    response = Response(
+        stream_write_job_events(job_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.call_on_close(release_event_stream)
+    return response
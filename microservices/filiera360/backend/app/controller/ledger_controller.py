@@ -1,6 +1,11 @@
-from flask import jsonify
+from flask import Response, jsonify, request
 from ..services.ledger_service import init_ledger_service
 
 def init_ledger_controller():
-    result, status = init_ledger_service()
-    return jsonify(result), status
+    # ?restart=true ignora il checkpoint del run precedente sullo stesso file
+    result, status = init_ledger_service(restart=request.args.get("restart") == "true")
+    if status != 200:
+        return jsonify(result), status
+    # avanzamento in streaming, una riga JSON per evento
+    return Response(result, mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
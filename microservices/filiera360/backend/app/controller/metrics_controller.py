@@ -0,0 +1,10 @@
+from flask import jsonify
+
+from ..database_mongo.monitoring import query_metrics
+
+def mongo_metrics_controller():
+    return jsonify(query_metrics.snapshot()), 200
+
+def reset_mongo_metrics_controller():
+    query_metrics.reset()
+    return jsonify({"message": "Mongo metrics reset."}), 200
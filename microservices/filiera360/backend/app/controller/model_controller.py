@@ -1,7 +1,15 @@
-from flask import jsonify,request
+from flask import Response, jsonify, request
 from flask_jwt_extended import get_jwt_identity
 
-from ..services.model_service import upload_model_service, get_model_service
+from ..services.model_service import upload_model_service, get_model_service, get_model_file_service, \
+    init_model_upload_service, upload_model_part_service, get_model_upload_service, complete_model_upload_service, \
+    abort_model_upload_service, get_model_catalogue_service, get_model_thumbnail_service, get_model_info_service
+from ..utils.blob_store import BlobNotFound, get_blob_store
+from ..utils.model_utils import MODEL_PRECOMPRESSED_ENCODINGS, open_model_stream
+
+# Con ?v=<hash> l'URL cambia a ogni nuovo modello: la risposta può restare in cache per sempre
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
 
 def upload_model_controller():
     product_data = request.json
@@ -10,8 +18,127 @@ def upload_model_controller():
     result, status = upload_model_service(user_email, product_data)
     return jsonify(result), status
 
+def init_model_upload_controller():
+    upload_data = request.json
+    user_email = get_jwt_identity()
+
+    result, status = init_model_upload_service(user_email, upload_data)
+    return jsonify(result), status
+
+def upload_model_part_controller(upload_id, part_number):
+    user_email = get_jwt_identity()
+
+    # il body (application/octet-stream) viene letto a blocchi, senza request.data
+    result, status = upload_model_part_service(user_email, upload_id, part_number, request.stream,
+                                               request.content_length)
+    return jsonify(result), status
+
+def get_model_upload_controller(upload_id):
+    user_email = get_jwt_identity()
+
+    result, status = get_model_upload_service(user_email, upload_id)
+    return jsonify(result), status
+
+def complete_model_upload_controller(upload_id):
+    user_email = get_jwt_identity()
+
+    result, status = complete_model_upload_service(user_email, upload_id)
+    return jsonify(result), status
+
+def abort_model_upload_controller(upload_id):
+    user_email = get_jwt_identity()
+
+    result, status = abort_model_upload_service(user_email, upload_id)
+    return jsonify(result), status
+
 def get_model_controller():
     product_id = request.args.get('productId')
 
     result, status = get_model_service(product_id)
-    return jsonify(result), status
\ No newline at end of file
+    return jsonify(result), status
+
+def get_model_info_controller(product_id):
+    result, status = get_model_info_service(product_id)
+    return jsonify(result), status
+
+def get_model_catalogue_controller():
+    user_email = get_jwt_identity()
+
+    result, status = get_model_catalogue_service(user_email, request.args.get('limit'), request.args.get('before'))
+    return jsonify(result), status
+
+def download_model_thumbnail_controller(content_hash):
+    result, status = get_model_thumbnail_service(content_hash)
+    if status != 200:
+        return jsonify(result), status
+
+    # URL indirizzato dall'hash del contenuto: l'anteprima non cambia mai
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": f'"{content_hash}"',
+               "Content-Length": str(result["size"])}
+    if request.if_none_match.contains(content_hash):
+        return Response(status=304, headers=headers)
+
+    try:
+        chunks = get_blob_store(result["storage"]).open_stream(result["blobKey"])
+    except BlobNotFound:
+        return jsonify({"message": "Thumbnail not found."}), 404
+    return Response(chunks, headers=headers, mimetype=result["contentType"], direct_passthrough=True)
+
+def _negotiate_model_encoding(variants):
+    # le varianti precompresse valgono solo per la risposta completa: i range sono sui byte originali
+    if request.range:
+        return None
+    for encoding in MODEL_PRECOMPRESSED_ENCODINGS:
+        if encoding in variants and request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+def download_model_controller(product_id):
+    result, status = get_model_file_service(product_id)
+    if status != 200:
+        return jsonify(result), status
+
+    size = result["size"]
+    content_hash = result["contentHash"]
+    encoding = _negotiate_model_encoding(result["variants"])
+    etag = f"{content_hash}-{encoding}" if encoding else content_hash
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if request.args.get("v") == content_hash
+        else REVALIDATE_CACHE_CONTROL,
+    }
+    if result["variants"]:
+        headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        size = result["variants"][encoding]["size"]
+
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    start, length, status = 0, size, 200
+    # If-Range: il range vale solo se il client ha ancora la stessa versione del modello
+    if_range = request.if_range
+    range_valid = if_range.etag is None and if_range.date is None or if_range.etag == content_hash
+    if request.range and request.range.units == "bytes" and len(request.range.ranges) == 1 and range_valid:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status=416, headers=headers)
+        start, stop = byte_range
+        length = stop - start
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status=status, headers=headers, mimetype=result["contentType"])
+
+    try:
+        chunks = open_model_stream(result["model"], start, length, encoding)
+    except BlobNotFound:
+        return jsonify({"message": "Model file not found."}), 404
+
+    return Response(chunks, status=status, headers=headers, mimetype=result["contentType"],
+                    direct_passthrough=True)
@@ -5,7 +5,7 @@ from ..services.operator_service import get_operators_service, add_operator_serv
 
 def get_operators_controller():
     user_id = get_jwt_identity()
-    result, status = get_operators_service(user_id)
+    result, status = get_operators_service(user_id, request.args.get('limit'), request.args.get('after'))
     return jsonify(result), status
 
 def add_operator_controller():
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from flask import request, jsonify
 from flask_jwt_extended import get_jwt_identity
 
@@ -7,14 +8,19 @@ from ..services.products_service import get_product_service ,get_product_history
     upload_product_service, update_product_service, like_product_service, unlike_product_service, \
     get_liked_products_service, add_recently_searched_service, add_sensor_data_service, add_movement_data_service, \
     add_certification_data_service, verify_product_compliance_service, get_all_movements_service, \
-    get_all_sensor_data_service, get_all_certifications_service
+    get_all_sensor_data_service, get_all_certifications_service, get_product_at_service, search_products_service, \
+    get_also_liked_service
+from ..services.trending_service import get_trending_products_service
+from ..services.ingestion_service import add_sensor_data_bulk_service, add_movement_data_bulk_service
+from .jobs_controller import wants_async_write, write_response
 
 def get_product_controller():
     product_id = request.args.get('productId')
     if not product_id:
         return jsonify({'message': 'productId is required'}), 400
 
-    product_data = get_product_service(product_id)
+    # verify=true: lettura dal ledger invece che dalla vista locale
+    product_data = get_product_service(product_id, verify=request.args.get('verify') == 'true')
 
     if "error" in product_data:
         print("Error fetching product:", product_data["error"])
@@ -22,6 +28,19 @@ def get_product_controller():
 
     return jsonify(product_data)
 
+def search_products_controller():
+    result, status = search_products_service(
+        request.args.get('q'),
+        page=request.args.get('page'),
+        limit=request.args.get('limit'),
+        manufacturer=request.args.get('manufacturer')
+    )
+    return jsonify(result), status
+
+def get_trending_products_controller():
+    result, status = get_trending_products_service(request.args.get('kind'), request.args.get('limit'))
+    return jsonify(result), status
+
 def get_product_history_controller():
     product_id = request.args.get('productId')
     if not product_id:
@@ -35,17 +54,34 @@ def get_product_history_controller():
 
     return jsonify(product_history_data)
 
+def get_product_at_controller():
+    product_id = request.args.get('productId')
+    at = request.args.get('at')
+    if not product_id or not at:
+        return jsonify({'message': 'productId and at are required'}), 400
+
+    try:
+        # ISO 8601, es. 2024-05-01 o 2024-05-01T10:00:00Z (senza fuso orario si assume UTC)
+        at_datetime = datetime.fromisoformat(at.replace("Z", "+00:00"))
+    except ValueError:
+        return jsonify({'message': 'at must be an ISO 8601 date or datetime'}), 400
+    if at_datetime.tzinfo is None:
+        at_datetime = at_datetime.replace(tzinfo=timezone.utc)
+
+    result, status = get_product_at_service(product_id, at_datetime)
+    return jsonify(result), status
+
 def upload_product_controller():
     product_data = request.json
     user_identity = get_jwt_identity()
-    result, status = upload_product_service(product_data, user_identity)
-    return jsonify(result), status
+    result, status = upload_product_service(product_data, user_identity, async_write=wants_async_write())
+    return write_response(result, status)
 
 def update_product_controller():
     product_data = request.json
     user_identity = get_jwt_identity()
-    result, status = update_product_service(product_data, user_identity)
-    return jsonify(result), status
+    result, status = update_product_service(product_data, user_identity, async_write=wants_async_write())
+    return write_response(result, status)
 
 def like_product_controller():
     data = request.json
@@ -56,6 +92,10 @@ def unlike_product_controller():
     result, status = unlike_product_service(request)
     return jsonify(result), status
 
+def get_also_liked_controller():
+    result, status = get_also_liked_service(request.args.get('productId'), request.args.get('limit'))
+    return jsonify(result), status
+
 def get_liked_products_controller():
     result, status = get_liked_products_service(request)
     return jsonify(result), status
@@ -120,6 +160,23 @@ def add_movement_data_controller():
     result = add_movement_data_service(data, manufacturer)
     return jsonify(result.get("body")), result.get("status")
 
+def _bulk_readings():
+    """Corpo delle richieste bulk: un array di letture oppure {"readings": [...]}."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        return data.get("readings")
+    return data
+
+def add_sensor_data_bulk_controller():
+    user = get_user_by_email(get_jwt_identity())
+    result = add_sensor_data_bulk_service(_bulk_readings(), user.get("manufacturer"))
+    return jsonify(result.get("body")), result.get("status")
+
+def add_movement_data_bulk_controller():
+    user = get_user_by_email(get_jwt_identity())
+    result = add_movement_data_bulk_service(_bulk_readings(), user.get("manufacturer"))
+    return jsonify(result.get("body")), result.get("status")
+
 def add_certification_data_controller():
     data = request.json
     user_email = get_jwt_identity()
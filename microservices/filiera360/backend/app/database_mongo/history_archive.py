@@ -0,0 +1,89 @@
+import gzip
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import bson
+
+from .mongo_client import product_history_buckets
+from ..utils.s3_utils import get_s3_client
+
+# Bucket S3 (LocalStack) che ospita la cronologia fredda
+HISTORY_ARCHIVE_BUCKET = os.getenv("HISTORY_ARCHIVE_BUCKET", "ecofood-backup")
+HISTORY_ARCHIVE_PREFIX = os.getenv("HISTORY_ARCHIVE_PREFIX", "product_history/")
+# I bucket la cui ultima entry è più vecchia di questa soglia vengono archiviati
+HISTORY_ARCHIVE_AFTER_DAYS = int(os.getenv("HISTORY_ARCHIVE_AFTER_DAYS", 90))
+HISTORY_ARCHIVE_INTERVAL_SECONDS = int(os.getenv("HISTORY_ARCHIVE_INTERVAL_SECONDS", 3600))
+HISTORY_ARCHIVE_BATCH_SIZE = int(os.getenv("HISTORY_ARCHIVE_BATCH_SIZE", 500))
+HISTORY_ARCHIVE_ENABLED = os.getenv("HISTORY_ARCHIVE_ENABLED", "False") == "True"
+
+_archiver_thread = None
+
+
+def _archive_key(bucket):
+    return f"{HISTORY_ARCHIVE_PREFIX}{bucket['blockchainProductId']}/{bucket['_id']}.bson.gz"
+
+
+def archive_cold_buckets(older_than_days=HISTORY_ARCHIVE_AFTER_DAYS, limit=HISTORY_ARCHIVE_BATCH_SIZE):
+    """
+    Sposta su S3 le entry dei bucket non più aggiornati da older_than_days giorni.
+    Nel documento del bucket restano solo i metadati e la chiave dell'oggetto archiviato.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    s3 = get_s3_client()
+    archived = 0
+
+    cold_buckets = product_history_buckets.find(
+        {"archived": False, "end": {"$lt": cutoff}},
+        limit=limit
+    )
+    for bucket in cold_buckets:
+        key = _archive_key(bucket)
+        body = gzip.compress(bson.encode({"entries": bucket["entries"]}))
+        s3.put_object(Bucket=HISTORY_ARCHIVE_BUCKET, Key=key, Body=body,
+                      ContentType="application/bson", ContentEncoding="gzip")
+
+        # Se nel frattempo è arrivata una nuova entry il bucket resta caldo: l'oggetto verrà riscritto
+        result = product_history_buckets.update_one(
+            {"_id": bucket["_id"], "archived": False, "count": bucket["count"]},
+            {
+                "$set": {"archived": True, "archiveKey": key, "archivedAt": datetime.now(timezone.utc)},
+                "$unset": {"entries": ""}
+            }
+        )
+        archived += result.modified_count
+
+    return archived
+
+
+@lru_cache(maxsize=256)
+def _load_archive(key):
+    response = get_s3_client().get_object(Bucket=HISTORY_ARCHIVE_BUCKET, Key=key)
+    return bson.decode(gzip.decompress(response["Body"].read()))["entries"]
+
+
+def load_archived_entries(key):
+    # Gli oggetti archiviati sono immutabili: la cache evita di riscaricarli a ogni lettura
+    return [dict(entry) for entry in _load_archive(key)]
+
+
+def _archiver_loop():
+    while True:
+        try:
+            archived = archive_cold_buckets()
+            if archived:
+                print(f"[history_archive] Archived {archived} history buckets.")
+        except Exception as e:
+            print(f"[history_archive] Error: {e}")
+        time.sleep(HISTORY_ARCHIVE_INTERVAL_SECONDS)
+
+
+def start_history_archiver():
+    """Avvia l'archiviazione periodica in un thread daemon (se HISTORY_ARCHIVE_ENABLED=True)."""
+    global _archiver_thread
+    if not HISTORY_ARCHIVE_ENABLED or _archiver_thread is not None:
+        return
+    _archiver_thread = threading.Thread(target=_archiver_loop, name="history-archiver", daemon=True)
+    _archiver_thread.start()
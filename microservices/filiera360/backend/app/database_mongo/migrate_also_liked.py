@@ -0,0 +1,35 @@
+"""
+Ricostruisce l'indice dei prodotti piaciuti insieme (collection product_cooccurrence) da liked_products,
+ripetendo per ogni utente i like nell'ordine in cui sono stati messi e salvando in ogni like (cooccurringWith)
+le coppie incrementate. Si può rieseguire: l'indice viene ricreato.
+
+Uso (dalla cartella backend): python -m app.database_mongo.migrate_also_liked
+"""
+from pymongo import UpdateOne
+from .mongo_client import liked_products, product_cooccurrence, product_cooccurrence_floors
+from .queries.cooccurrence_queries import add_product_cooccurrences
+from .queries.liked_queries import ALSO_LIKED_MAX_USER_LIKES
+
+def migrate_also_liked():
+    product_cooccurrence.delete_many({})
+    product_cooccurrence_floors.delete_many({})
+    users = 0
+    user_likes = liked_products.aggregate([
+        {"$sort": {"userId": 1, "likedAt": 1}},
+        {"$group": {"_id": "$userId", "likes": {"$push": {"_id": "$_id", "productId": "$blockchainProductId"}}}}
+    ], allowDiskUse=True)
+    for user in user_likes:
+        likes = user["likes"]
+        updates = []
+        for index, like in enumerate(likes):
+            # come in like_a_product: i like precedenti più recenti, al più ALSO_LIKED_MAX_USER_LIKES
+            others = [previous["productId"] for previous in likes[max(0, index - ALSO_LIKED_MAX_USER_LIKES):index]]
+            add_product_cooccurrences(like["productId"], others, 1)
+            updates.append(UpdateOne({"_id": like["_id"]}, {"$set": {"cooccurringWith": others}}))
+        liked_products.bulk_write(updates, ordered=False)
+        users += 1
+    print(f"Also-liked index rebuilt from the likes of {users} users.")
+    return users
+
+if __name__ == "__main__":
+    migrate_also_liked()
@@ -0,0 +1,55 @@
+"""
+Sposta le history entry salvate un documento per modifica (product_history) nei bucket
+di product_history_buckets, con la dimensione/finestra configurata per HISTORY_STORAGE_MODE=bucket.
+Si può rieseguire: le entry già presenti in un bucket non vengono duplicate.
+
+Uso (dalla cartella backend): python -m app.database_mongo.migrate_history_buckets
+"""
+from .mongo_client import product_history, product_history_buckets
+from .models.history_bucket_model import create_history_bucket_model, create_bucket_entry
+from .queries.history_queries import HISTORY_BUCKET_SIZE, HISTORY_BUCKET_WINDOW_SECONDS, bucket_start_for
+
+def _split_into_buckets(entries):
+    """Divide le entry (ordinate per data) in gruppi (bucketStart, entries) come farebbe add_history_entry."""
+    groups = []
+    for entry in entries:
+        start = bucket_start_for(entry["timestamp"]) if HISTORY_BUCKET_WINDOW_SECONDS > 0 else None
+        last = groups[-1] if groups else None
+        if last and len(last[1]) < HISTORY_BUCKET_SIZE and (start is None or last[0] == start):
+            last[1].append(entry)
+        else:
+            groups.append((start if start is not None else entry["timestamp"], [entry]))
+    return groups
+
+def migrate_product_history(blockchain_product_id):
+    entries = list(product_history.find({"blockchainProductId": blockchain_product_id}).sort("timestamp", 1))
+    entry_ids = [entry["_id"] for entry in entries]
+
+    # Entry già copiate da un'esecuzione precedente interrotta prima della cancellazione
+    already_migrated = set()
+    for bucket in product_history_buckets.find({"entries._id": {"$in": entry_ids}}, {"entries._id": 1}):
+        already_migrated.update(entry["_id"] for entry in bucket["entries"])
+
+    pending = [create_bucket_entry(entry) for entry in entries if entry["_id"] not in already_migrated]
+    buckets = [create_history_bucket_model(blockchain_product_id, bucket_start, bucket_entries)
+               for bucket_start, bucket_entries in _split_into_buckets(pending)]
+    if buckets:
+        product_history_buckets.insert_many(buckets)
+
+    product_history.delete_many({"_id": {"$in": entry_ids}})
+    return len(pending), len(buckets)
+
+def migrate_history_to_buckets():
+    migrated_entries = 0
+    created_buckets = 0
+    product_ids = product_history.aggregate([{"$group": {"_id": "$blockchainProductId"}}], allowDiskUse=True)
+    for product in product_ids:
+        entries, buckets = migrate_product_history(product["_id"])
+        migrated_entries += entries
+        created_buckets += buckets
+
+    print(f"Migrated {migrated_entries} history entries into {created_buckets} buckets.")
+    return migrated_entries, created_buckets
+
+if __name__ == "__main__":
+    migrate_history_to_buckets()
@@ -0,0 +1,17 @@
+"""
+Ricalcola da liked_products il numero di like di ogni prodotto (collection product_popularity),
+per i like messi prima dei contatori. Si può rieseguire: i contatori vengono sovrascritti.
+
+Uso (dalla cartella backend): python -m app.database_mongo.migrate_like_counts
+"""
+from .mongo_client import liked_products
+
+def migrate_like_counts():
+    liked_products.aggregate([
+        {"$group": {"_id": "$blockchainProductId", "likes": {"$sum": 1}}},
+        {"$merge": {"into": "product_popularity", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ])
+    print("Like counts rebuilt.")
+
+if __name__ == "__main__":
+    migrate_like_counts()
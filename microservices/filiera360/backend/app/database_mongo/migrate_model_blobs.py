@@ -0,0 +1,64 @@
+"""
+Porta i documenti di `models` al formato a contenuti condivisi (`model_contents`):
+- i GLB ancora salvati inline (campo modelString) vengono scritti nel blob store configurato;
+- i documenti con blobKey/storage propri diventano riferimenti al contenuto con lo stesso hash,
+  e le copie duplicate dello stesso file vengono eliminate.
+Un'interruzione tra la creazione del riferimento e l'aggiornamento del documento può lasciare
+un riferimento in più (il blob non viene mai eliminato, nessun dato perso).
+
+Uso (dalla cartella backend): python -m app.database_mongo.migrate_model_blobs
+"""
+from .mongo_client import models
+from .models.model_content_model import create_model_content_model
+from .queries.model_contents_queries import add_model_content_ref, create_model_content
+from ..utils.blob_store import get_blob_store
+from ..utils.model_utils import DEFAULT_MODEL_CONTENT_TYPE, decode_model_data_url, schedule_model_processing, \
+    store_model
+
+def _migrate_inline_model(model):
+    content_type, model_bytes = decode_model_data_url(model["modelString"])
+    store_model(model["blockchainProductId"], model_bytes, content_type, model["uploadedBy"])
+
+def _migrate_blob_model(model):
+    content_hash = model["contentHash"]
+    if add_model_content_ref(content_hash):
+        # stesso file già migrato per un altro prodotto: la copia di questo documento non serve
+        get_blob_store(model["storage"]).delete(model["blobKey"])
+    else:
+        content = create_model_content_model(content_hash, model["size"],
+                                             model.get("contentType") or DEFAULT_MODEL_CONTENT_TYPE,
+                                             model["storage"], model["blobKey"])
+        create_model_content(content)
+        schedule_model_processing(content_hash)
+    models.update_one({"_id": model["_id"]}, {"$unset": {"blobKey": "", "storage": ""}})
+
+def migrate_model_blobs():
+    migrated, failed = 0, []
+    # solo _id nel cursore: il GLB inline viene letto un documento alla volta
+    legacy_models = models.find(
+        {"$or": [{"modelString": {"$exists": True}}, {"blobKey": {"$exists": True}}]},
+        {"_id": 1}
+    )
+    for legacy in list(legacy_models):
+        model = models.find_one({"_id": legacy["_id"]})
+        if not model:
+            continue
+        try:
+            if "modelString" in model:
+                _migrate_inline_model(model)
+            elif model.get("blobKey"):
+                _migrate_blob_model(model)
+            else:
+                continue
+            migrated += 1
+        except (ValueError, KeyError) as e:
+            failed.append({"modelId": str(model["_id"]), "error": repr(e)})
+
+    # varianti e anteprime vengono generate in background: l'executor attende la fine all'uscita
+    print(f"Migrated {migrated} models to shared model contents, {len(failed)} failed.")
+    for failure in failed:
+        print("  -", failure)
+    return migrated, failed
+
+if __name__ == "__main__":
+    migrate_model_blobs()
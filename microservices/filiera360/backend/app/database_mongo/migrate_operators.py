@@ -0,0 +1,45 @@
+"""
+Sposta gli operatori salvati nell'array embedded users.operators nella collection `operators`
+(un documento per associazione produttore-operatore) e rimuove dall'array le voci migrate.
+Le voci malformate restano in users.operators e vengono elencate alla fine.
+Si può rieseguire: le associazioni già presenti non vengono duplicate.
+Viene eseguito anche all'avvio di ogni worker (app/background.py), prima del caricamento della cache.
+
+Uso (dalla cartella backend): python -m app.database_mongo.migrate_operators
+"""
+from .mongo_client import users
+from .models.operator_model import create_operator_model
+from .queries.operators_queries import add_operator
+from ..utils.operator_cache import operator_producers_changed
+
+def migrate_operators():
+    migrated, skipped = 0, []
+    producers = users.find({"operators": {"$exists": True}}, {"email": 1, "manufacturer": 1, "operators": 1})
+    for producer in producers:
+        moved, malformed = [], []
+        for operator in producer.get("operators") or []:
+            if not isinstance(operator, dict) or not operator.get("operatorId") or not operator.get("email"):
+                malformed.append(operator)
+                continue
+            if add_operator(create_operator_model(producer, {"_id": operator["operatorId"],
+                                                             "email": operator["email"]})):
+                migrated += 1
+            moved.append(operator)
+
+        if not malformed:
+            users.update_one({"_id": producer["_id"]}, {"$unset": {"operators": ""}})
+        else:
+            # le voci non migrabili restano nell'array per la correzione manuale
+            skipped.extend({"producer": producer["email"], "operator": operator} for operator in malformed)
+            if moved:
+                users.update_one({"_id": producer["_id"]}, {"$pull": {"operators": {"$in": moved}}})
+
+    if migrated:
+        operator_producers_changed()
+    print(f"Migrated {migrated} operator associations, {len(skipped)} skipped.")
+    for entry in skipped:
+        print("  -", entry)
+    return migrated, skipped
+
+if __name__ == "__main__":
+    migrate_operators()
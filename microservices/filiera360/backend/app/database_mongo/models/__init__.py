@@ -1,19 +1,38 @@
+from .checkpoint_model import create_checkpoint_model
 from .history_model import create_history_model
+from .history_bucket_model import create_history_bucket_model
+from .import_job_model import create_import_job_model, create_import_row_model
 from .liked_model import create_liked_product_model
 from .models_model import create_model_model
+from .model_content_model import create_model_content_model
+from .model_upload_model import create_model_upload_model
+from .operator_model import create_operator_model
 from .otp_model import create_otp_model
 from .products_model import create_product_model
+from .product_state_model import create_product_state_model
 from .recently_searched_model import create_recently_searched_model
+from .seed_run_model import create_seed_run_model
 from .token_model import create_token_model
 from .users_model import create_user_model
+from .write_job_model import create_write_job_model
 
 __all__ = [
+    "create_checkpoint_model",
     "create_history_model",
+    "create_history_bucket_model",
+    "create_import_job_model",
+    "create_import_row_model",
     "create_liked_product_model",
     "create_model_model",
+    "create_model_content_model",
+    "create_model_upload_model",
+    "create_operator_model",
     "create_otp_model",
     "create_product_model",
+    "create_product_state_model",
     "create_recently_searched_model",
+    "create_seed_run_model",
     "create_user_model",
-    "create_token_model"
+    "create_token_model",
+    "create_write_job_model"
 ]
@@ -0,0 +1,9 @@
+def create_checkpoint_model(blockchain_product_id, version, timestamp, state):
+    return {
+        "blockchainProductId": blockchain_product_id,
+        # numero di history entry già applicate allo stato
+        "version": version,
+        # istante a cui si riferisce lo stato completo
+        "timestamp": timestamp,
+        "state": state
+    }
@@ -0,0 +1,29 @@
+from bson import ObjectId
+
+def create_history_bucket_model(blockchain_product_id, bucket_start, entries):
+    modified_by = []
+    for entry in entries:
+        if entry["modifiedBy"] not in modified_by:
+            modified_by.append(entry["modifiedBy"])
+
+    return {
+        "blockchainProductId": blockchain_product_id,
+        # inizio della finestra temporale (o timestamp della prima entry in modalità a conteggio)
+        "bucketStart": bucket_start,
+        "start": min(entry["timestamp"] for entry in entries),
+        "end": max(entry["timestamp"] for entry in entries),
+        "count": len(entries),
+        # utenti che compaiono nelle entry, per le ricerche per utente anche sui bucket archiviati
+        "modifiedBy": modified_by,
+        # history entry senza blockchainProductId: [{_id, modifiedBy, timestamp, changes}, ...]
+        "entries": entries,
+        "archived": False
+    }
+
+def create_bucket_entry(entry):
+    return {
+        "_id": entry.get("_id") or ObjectId(),
+        "modifiedBy": entry["modifiedBy"],
+        "timestamp": entry["timestamp"],
+        "changes": entry["changes"]
+    }
@@ -1,11 +1,11 @@
 from bson import ObjectId
 from datetime import datetime, timezone
 
-def create_history_model(blockchain_product_id, modified_by, changes):
+def create_history_model(blockchain_product_id, modified_by, changes, timestamp=None):
     return {
         "blockchainProductId": blockchain_product_id,
         "modifiedBy": ObjectId(modified_by),
-        "timestamp": datetime.now(timezone.utc),
+        "timestamp": timestamp or datetime.now(timezone.utc),
         # lista di dizionari: [{field, oldValue, newValue}, ...]
         "changes": changes
     }
\ No newline at end of file
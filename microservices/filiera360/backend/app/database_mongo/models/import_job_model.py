@@ -0,0 +1,41 @@
+import uuid
+from bson import ObjectId
+from datetime import datetime, timezone
+
+def create_import_job_model(user_id, user_email, file_format, filename, owner, path):
+    now = datetime.now(timezone.utc)
+    return {
+        # jobId restituito al client con il 202
+        "_id": uuid.uuid4().hex,
+        "userId": ObjectId(user_id),
+        "userEmail": user_email,
+        # csv | ndjson
+        "format": file_format,
+        "filename": filename,
+        # processo (host:pid) che esegue il job e file temporaneo con il contenuto caricato
+        "owner": owner,
+        "path": path,
+        # queued -> running -> completed | failed
+        "status": "queued",
+        # righe lette dal file e loro esito
+        "total": 0,
+        "uploaded": 0,
+        "skipped": 0,
+        "failed": 0,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+        "finishedAt": None
+    }
+
+def create_import_row_model(job_id, row, product_id, status, error=None):
+    return {
+        "jobId": job_id,
+        # numero della riga di dati nel file (da 1)
+        "row": row,
+        "productId": product_id,
+        # queued -> uploaded | skipped | failed
+        "status": status,
+        "error": error,
+        "createdAt": datetime.now(timezone.utc)
+    }
@@ -1,9 +1,11 @@
 from bson import ObjectId
 from datetime import datetime, timezone
 
-def create_liked_product_model(user_id, blockchain_product_id):
+def create_liked_product_model(user_id, blockchain_product_id, cooccurring_with=None):
     return {
         "userId": ObjectId(user_id),
         "blockchainProductId": blockchain_product_id,
+        # prodotti con cui le coppie dei prodotti piaciuti insieme sono state incrementate da questo like
+        "cooccurringWith": cooccurring_with or [],
         "likedAt": datetime.now(timezone.utc)
     }
\ No newline at end of file
@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+def create_model_content_model(content_hash, size, content_type, storage, blob_key):
+    return {
+        # SHA-256 del GLB: lo stesso file caricato per più prodotti è salvato una sola volta
+        "_id": content_hash,
+        "size": size,
+        "contentType": content_type,
+        # il GLB è nel blob store `storage` (gridfs | s3) sotto la chiave blobKey
+        "storage": storage,
+        "blobKey": blob_key,
+        # numero di documenti di `models` che puntano a questo contenuto
+        "refCount": 1,
+        # varianti precompresse: {"gzip": {"blobKey": ..., "size": ...}, "br": {...}}
+        "variants": {},
+        # anteprima JPEG {"blobKey", "contentType", "size"}: assente finché non viene generata
+        "createdAt": datetime.now(timezone.utc)
+    }
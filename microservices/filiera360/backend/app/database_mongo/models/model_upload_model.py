@@ -0,0 +1,27 @@
+from bson import ObjectId
+from datetime import datetime, timezone
+
+def create_model_upload_model(upload_id, blockchain_product_id, uploaded_by, size, part_size, content_type, storage,
+                              blob_key, multipart_handle, expires_at):
+    now = datetime.now(timezone.utc)
+    return {
+        # uploadId restituito al client e usato negli URL delle parti
+        "_id": upload_id,
+        "blockchainProductId": blockchain_product_id,
+        "uploadedBy": ObjectId(uploaded_by),
+        "size": size,
+        "partSize": part_size,
+        "totalParts": max(1, -(-size // part_size)),
+        "contentType": content_type,
+        # blob store e chiave in cui vengono scritte le parti; handle è l'UploadId S3 (o la chiave per GridFS)
+        "storage": storage,
+        "blobKey": blob_key,
+        "multipartHandle": multipart_handle,
+        # "<numero parte>": {"size": ..., "etag": ...}
+        "parts": {},
+        # open | completing
+        "status": "open",
+        "createdAt": now,
+        "updatedAt": now,
+        "expiresAt": expires_at
+    }
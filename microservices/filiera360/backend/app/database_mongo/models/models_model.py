@@ -1,10 +1,13 @@
 from bson import ObjectId
 from datetime import datetime, timezone
 
-def create_model_model(blockchain_product_id, model_string, uploaded_by):
+def create_model_model(blockchain_product_id, content_hash, size, content_type, uploaded_by):
     return {
         "blockchainProductId": blockchain_product_id,
-        "modelString": model_string,
+        # SHA-256 del GLB: collega il prodotto al contenuto condiviso in `model_contents`
+        "contentHash": content_hash,
+        "size": size,
+        "contentType": content_type,
         "uploadedBy": ObjectId(uploaded_by),
         "uploadedAt": datetime.now(timezone.utc)
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,13 @@
+from bson import ObjectId
+from datetime import datetime, timezone
+
+def create_operator_model(producer, operator):
+    return {
+        # produttore a cui l'operatore è associato (email e manufacturer copiati per le letture)
+        "producerId": ObjectId(producer["_id"]),
+        "producerEmail": producer["email"],
+        "manufacturer": producer.get("manufacturer"),
+        "operatorId": ObjectId(operator["_id"]),
+        "email": operator["email"],
+        "addedAt": datetime.now(timezone.utc)
+    }
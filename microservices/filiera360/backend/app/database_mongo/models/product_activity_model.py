@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+
+# Contatori orari di attività su un prodotto (like e ricerche), base della classifica dei prodotti di tendenza
+def activity_hour(at=None):
+    at = at or datetime.now(timezone.utc)
+    return at.replace(minute=0, second=0, microsecond=0)
+
+def create_product_ranking_model(name, items, window_hours):
+    return {
+        "_id": name,
+        # prodotti in ordine di punteggio: {productId, score, likes, searches}
+        "items": items,
+        "windowHours": window_hours,
+        "refreshedAt": datetime.now(timezone.utc)
+    }
@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+
+def create_product_state_model(blockchain_product_id, state):
+    return {
+        "blockchainProductId": blockchain_product_id,
+        # ultimi valori noti dei campi del prodotto (CustomObject annidato), con le chiavi codificate da product_state_queries
+        "state": state,
+        # numero di history entry applicate allo snapshot
+        "version": 0,
+        "updatedAt": datetime.now(timezone.utc)
+    }
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+from ...utils.product_utils import product_content_hash
+from ...utils.search_utils import build_search_fields
+
+# Versione della struttura della vista: le viste precedenti vengono riscritte dalla riconciliazione con il ledger
+PRODUCT_VIEW_SCHEMA_VERSION = 2
+
+# Campi del prodotto registrati dal chaincode in createProduct, con i default applicati dal middleware
+LEDGER_PRODUCT_DEFAULTS = {
+    "Name": "",
+    "Manufacturer": "",
+    "HarvestDate": "",
+    "Ingredients": "",
+    "Allergens": "",
+    "Nutritional_information": "",
+    "SowingDate": "",
+    "PesticideUse": "",
+    "FertilizerUse": "",
+    "CountryOfOrigin": "",
+    "SensorData": {},
+    "Certifications": {},
+    "CustomObject": {}
+}
+
+# corpo del prodotto come viene salvato sul ledger dall'upload
+def create_ledger_product_body(product_data):
+    body = {"ID": product_data["ID"]}
+    for field, default in LEDGER_PRODUCT_DEFAULTS.items():
+        body[field] = product_data.get(field, default)
+    return body
+
+def create_product_view_model(product, synced_at=None):
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": product["ID"],
+        "schemaVersion": PRODUCT_VIEW_SCHEMA_VERSION,
+        "manufacturer": product.get("Manufacturer"),
+        # copia del prodotto come restituito da /readProduct
+        "product": product,
+        "contentHash": product_content_hash(product),
+        # campi della ricerca full-text (/searchProducts)
+        "search": build_search_fields(product),
+        # movimenti registrati tramite il backend (non fanno parte del prodotto sul ledger)
+        "movements": [],
+        # incrementata a ogni scrittura della vista: le cache in memoria delle liste la usano come stamp
+        "version": 0,
+        # ultima lettura o scrittura completa confermata dal ledger
+        "syncedAt": synced_at or now,
+        "updatedAt": now
+    }
@@ -1,8 +1,12 @@
 from bson import ObjectId
 
-def create_product_model(blockchain_product_id, created_by):
-    return {
+def create_product_model(blockchain_product_id, created_by, manufacturer=None):
+    product = {
         "blockchainProductId": blockchain_product_id,
         # Assicura che sia un ObjectId
         "createdBy": ObjectId(created_by)
-    }
\ No newline at end of file
+    }
+    # Indice locale di proprietà: manufacturer registrato sul ledger per il prodotto
+    if manufacturer:
+        product["manufacturer"] = manufacturer
+    return product
\ No newline at end of file
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+def create_reconcile_run_model(run_id):
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": run_id,
+        # bookmark della prossima pagina del ledger ("" = inizio di un nuovo passaggio)
+        "bookmark": "",
+        "passes": 0,
+        # contatori del passaggio in corso
+        "scanned": 0,
+        "repaired": 0,
+        "failedPages": 0,
+        # worker che esegue la riconciliazione e scadenza della presa in carico
+        "owner": None,
+        "leaseUntil": None,
+        "passStartedAt": None,
+        "lastPassCompletedAt": None,
+        # riepilogo dell'ultimo passaggio concluso
+        "lastPass": None,
+        "createdAt": now,
+        "updatedAt": now
+    }
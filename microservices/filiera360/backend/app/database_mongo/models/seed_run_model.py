@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+def create_seed_run_model(run_id, source, size):
+    now = datetime.now(timezone.utc)
+    return {
+        # hash di percorso, dimensione e data di modifica del file: un file diverso è un nuovo run
+        "_id": run_id,
+        "source": source,
+        "size": size,
+        # elementi dell'array già conclusi senza buchi: la ripresa riparte da qui
+        "processed": 0,
+        "uploaded": 0,
+        "skipped": 0,
+        "failed": 0,
+        # ultimi errori (lista limitata)
+        "errors": [],
+        # running | interrupted | completed
+        "status": "running",
+        "leaseUntil": None,
+        "startedAt": now,
+        "updatedAt": now,
+        "finishedAt": None
+    }
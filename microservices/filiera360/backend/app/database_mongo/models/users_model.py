@@ -10,6 +10,5 @@ def create_user_model(email, password_hash, manufacturer, role):
         "password": password_hash,
         "manufacturer": manufacturer,
         "role": role,
-        "flags": flags,
-        "operators": []
+        "flags": flags
     }
\ No newline at end of file
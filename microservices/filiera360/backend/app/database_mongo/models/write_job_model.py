@@ -0,0 +1,26 @@
+import uuid
+from bson import ObjectId
+from datetime import datetime, timezone
+
+def create_write_job_model(kind, payload, user_id, user_email, max_attempts):
+    now = datetime.now(timezone.utc)
+    return {
+        # jobId restituito al client con il 202
+        "_id": uuid.uuid4().hex,
+        # uploadProduct | updateProduct | uploadBatch | updateBatch
+        "kind": kind,
+        # dati già validati da inviare al middleware
+        "payload": payload,
+        "userId": ObjectId(user_id),
+        "userEmail": user_email,
+        # queued -> running -> succeeded | failed (running torna queued tra un tentativo e l'altro)
+        "status": "queued",
+        "attempts": 0,
+        "maxAttempts": max_attempts,
+        # {"status": <codice HTTP della scrittura sincrona equivalente>, "body": <risposta>}
+        "result": None,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+        "finishedAt": None
+    }
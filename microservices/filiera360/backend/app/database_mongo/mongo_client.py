@@ -1,24 +1,192 @@
 import os
+import threading
+import time
+
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 from pymongo.server_api import ServerApi
 
+try:
+    from .monitoring import MONGO_COMMAND_MONITORING, query_metrics
+except ImportError:  # script eseguiti dalla cartella database_mongo (es. setup_indexes.py)
+    from monitoring import MONGO_COMMAND_MONITORING, query_metrics
+
 uri = os.getenv("MONGO_URI", "mongodb://mongodb:27017")
-client = MongoClient(uri, server_api=ServerApi('1'))
+DB_NAME = os.getenv("MONGO_DB_NAME", "supplychainDB")
 
-# Ping per confermare la connessione
-try:
-    client.admin.command('ping')
-    print("Pinged your deployment. You successfully connected to MongoDB!")
-except Exception as e:
-    print(e)
-
-db = client["supplychainDB"]
-
-users = db["users"]
-users_otp = db["users_otp"]
-liked_products = db["liked_products"]
-models = db["models"]
-invite_tokens = db["invite_tokens"]
-product_history = db["product_history"]
-products = db["products"]
-recently_searched = db["recently_searched"]
+# Configurazione del pool (valori 0 = default di pymongo)
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+# Codice restituito da un'istanza standalone quando si apre una transazione
+ILLEGAL_OPERATION = 20
+
+# Per quanti secondi il risultato del ping di /healthz resta valido
+MONGO_HEALTH_CACHE_SECONDS = float(os.getenv("MONGO_HEALTH_CACHE_SECONDS", 5))
+
+
+class MongoClientManager:
+    """
+    Crea il MongoClient solo al primo utilizzo e lo ricrea nel processo figlio dopo una fork
+    (es. worker gunicorn con --preload), dove il client del padre non è utilizzabile.
+    """
+
+    def __init__(self, mongo_uri, db_name):
+        self._uri = mongo_uri
+        self._db_name = db_name
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._health = {"checkedAt": 0.0, "ok": False, "error": None}
+        self._health_lock = threading.Lock()
+        self._transactions_supported = None
+
+    def _client_options(self):
+        options = {
+            "server_api": ServerApi('1'),
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "readPreference": MONGO_READ_PREFERENCE,
+            # Nessuna connessione in costruzione: il primo comando apre il pool
+            "connect": False,
+        }
+        if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+            options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+        if MONGO_COMMAND_MONITORING:
+            # metriche per query helper (/metrics/mongo), registrate su ogni client creato dal manager
+            options["event_listeners"] = [query_metrics]
+        return options
+
+    def get_client(self):
+        pid = os.getpid()
+        if self._client is not None and self._pid == pid:
+            return self._client
+
+        with self._lock:
+            if self._client is None or self._pid != pid:
+                self._client = MongoClient(self._uri, **self._client_options())
+                self._pid = pid
+            return self._client
+
+    def get_db(self):
+        return self.get_client()[self._db_name]
+
+    def get_collection(self, name):
+        return self.get_db()[name]
+
+    def reset_after_fork(self):
+        # Il client copiato dal padre non va chiuso né usato nel figlio: si scarta il riferimento
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._health_lock = threading.Lock()
+        self._health = {"checkedAt": 0.0, "ok": False, "error": None}
+        self._transactions_supported = None
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def run_in_transaction(self, callback):
+        """
+        Esegue callback(session) in una transazione multi-documento. Su un'istanza standalone
+        (senza replica set) le transazioni non sono disponibili: callback viene eseguita con
+        session=None e le scritture restano singolarmente atomiche.
+        """
+        if self._transactions_supported is not False:
+            try:
+                with self.get_client().start_session() as session:
+                    result = session.with_transaction(callback)
+                self._transactions_supported = True
+                return result
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                self._transactions_supported = False
+        return callback(None)
+
+    def is_ready(self):
+        """
+        Readiness check per /healthz: esegue un ping al massimo una volta ogni
+        MONGO_HEALTH_CACHE_SECONDS e restituisce (ok, errore) dall'ultimo ping.
+        """
+        now = time.monotonic()
+        if now - self._health["checkedAt"] < MONGO_HEALTH_CACHE_SECONDS:
+            return self._health["ok"], self._health["error"]
+
+        # Un solo thread alla volta esegue il ping, gli altri usano il valore in cache
+        if not self._health_lock.acquire(blocking=False):
+            return self._health["ok"], self._health["error"]
+        try:
+            try:
+                self.get_client().admin.command('ping')
+                health = {"checkedAt": time.monotonic(), "ok": True, "error": None}
+            except Exception as e:
+                health = {"checkedAt": time.monotonic(), "ok": False, "error": str(e)}
+            self._health = health
+            return health["ok"], health["error"]
+        finally:
+            self._health_lock.release()
+
+
+class LazyCollection:
+    """Proxy di una collection: risolve la collection reale solo quando viene usata."""
+
+    __slots__ = ("_name",)
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(mongo.get_collection(self._name), attr)
+
+    def __getitem__(self, key):
+        return mongo.get_collection(self._name)[key]
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+mongo = MongoClientManager(uri, DB_NAME)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=mongo.reset_after_fork)
+
+
+def get_db():
+    return mongo.get_db()
+
+
+users = LazyCollection("users")
+users_otp = LazyCollection("users_otp")
+liked_products = LazyCollection("liked_products")
+models = LazyCollection("models")
+model_uploads = LazyCollection("model_uploads")
+model_contents = LazyCollection("model_contents")
+invite_tokens = LazyCollection("invite_tokens")
+product_history = LazyCollection("product_history")
+product_history_buckets = LazyCollection("product_history_buckets")
+products = LazyCollection("products")
+recently_searched = LazyCollection("recently_searched")
+product_state = LazyCollection("product_state")
+product_checkpoints = LazyCollection("product_checkpoints")
+write_jobs = LazyCollection("write_jobs")
+cache_versions = LazyCollection("cache_versions")
+operators = LazyCollection("operators")
+ledger_seed_runs = LazyCollection("ledger_seed_runs")
+import_jobs = LazyCollection("import_jobs")
+import_rows = LazyCollection("import_rows")
+product_view = LazyCollection("product_view")
+ledger_reconcile_runs = LazyCollection("ledger_reconcile_runs")
+product_activity = LazyCollection("product_activity")
+product_popularity = LazyCollection("product_popularity")
+product_rankings = LazyCollection("product_rankings")
+product_cooccurrence = LazyCollection("product_cooccurrence")
+product_cooccurrence_floors = LazyCollection("product_cooccurrence_floors")
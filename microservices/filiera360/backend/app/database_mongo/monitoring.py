@@ -0,0 +1,182 @@
+import logging
+import os
+import sys
+import threading
+
+import bson
+from pymongo import monitoring
+
+MONGO_COMMAND_MONITORING = os.getenv("MONGO_COMMAND_MONITORING", "True") == "True"
+# Soglia oltre la quale un comando viene loggato come lento (millisecondi)
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", 100))
+# Misura dei byte delle risposte: richiede di serializzare di nuovo ogni risposta (costoso su cursori
+# e aggregazioni grandi), quindi è disattivata per default
+MONGO_MONITOR_REPLY_BYTES = os.getenv("MONGO_MONITOR_REPLY_BYTES", "False") == "True"
+
+# Limiti superiori (ms) dei bucket dell'istogramma delle latenze, l'ultimo bucket è +Inf
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+UNTAGGED = "untagged"
+
+logger = logging.getLogger(__name__)
+
+
+def _find_query_helper():
+    """
+    Risale lo stack del thread corrente fino alla prima funzione definita in un modulo
+    database_mongo/queries/*_queries.py e la restituisce come 'modulo.funzione'.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        module_name = frame.f_globals.get("__name__", "")
+        if module_name.endswith("_queries"):
+            return f"{module_name.rsplit('.', 1)[-1]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return UNTAGGED
+
+
+def _count_documents(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        if batch is not None:
+            return len(batch)
+    if "n" in reply:
+        return reply["n"]
+    return 0
+
+
+def _new_stats():
+    return {
+        "count": 0,
+        "failures": 0,
+        "slow": 0,
+        "totalMs": 0.0,
+        "maxMs": 0.0,
+        # una cella per ogni bucket più quella finale per +Inf
+        "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        "documents": 0,
+        "bytes": 0,
+        "commands": {},
+    }
+
+
+def _percentile(buckets, count, quantile):
+    """Stima il percentile come limite superiore del bucket che lo contiene."""
+    if not count:
+        return None
+    target = quantile * count
+    seen = 0
+    for i, bucket_count in enumerate(buckets):
+        seen += bucket_count
+        if seen >= target:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+
+class QueryMetricsListener(monitoring.CommandListener):
+    """
+    Raccoglie, per ogni query helper che ha originato il comando, istogramma delle latenze,
+    numero di documenti e (con count_bytes) byte restituiti da MongoDB.
+    """
+
+    def __init__(self, slow_query_ms=MONGO_SLOW_QUERY_MS, count_bytes=MONGO_MONITOR_REPLY_BYTES):
+        self.slow_query_ms = slow_query_ms
+        self.count_bytes = count_bytes
+        self._lock = threading.Lock()
+        self._stats = {}
+        # (connection_id, request_id) -> helper, i comandi in volo
+        self._pending = {}
+
+    def started(self, event):
+        helper = _find_query_helper()
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = helper
+
+    def _pop_pending(self, event):
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), UNTAGGED)
+
+    def succeeded(self, event):
+        helper = self._pop_pending(event)
+        reply = event.reply or {}
+        reply_bytes = 0
+        if self.count_bytes:
+            try:
+                reply_bytes = len(bson.encode(reply))
+            except Exception:
+                pass
+        self._record(helper, event.command_name, event.duration_micros / 1000.0,
+                     documents=_count_documents(reply), reply_bytes=reply_bytes)
+
+    def failed(self, event):
+        helper = self._pop_pending(event)
+        self._record(helper, event.command_name, event.duration_micros / 1000.0, failed=True)
+
+    def _record(self, helper, command_name, duration_ms, documents=0, reply_bytes=0, failed=False):
+        bucket = len(LATENCY_BUCKETS_MS)
+        for i, upper in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= upper:
+                bucket = i
+                break
+
+        is_slow = duration_ms >= self.slow_query_ms
+        with self._lock:
+            stats = self._stats.setdefault(helper, _new_stats())
+            stats["count"] += 1
+            stats["totalMs"] += duration_ms
+            stats["maxMs"] = max(stats["maxMs"], duration_ms)
+            stats["buckets"][bucket] += 1
+            stats["documents"] += documents
+            stats["bytes"] += reply_bytes
+            stats["commands"][command_name] = stats["commands"].get(command_name, 0) + 1
+            if failed:
+                stats["failures"] += 1
+            if is_slow:
+                stats["slow"] += 1
+
+        if is_slow and self.count_bytes:
+            logger.warning("Slow Mongo command '%s' from %s: %.1f ms, %d docs, %d bytes",
+                           command_name, helper, duration_ms, documents, reply_bytes)
+        elif is_slow:
+            logger.warning("Slow Mongo command '%s' from %s: %.1f ms, %d docs",
+                           command_name, helper, duration_ms, documents)
+
+    def snapshot(self):
+        """Copia delle metriche per helper, con media e percentili stimati dall'istogramma."""
+        with self._lock:
+            stats = {helper: {**s, "buckets": list(s["buckets"]), "commands": dict(s["commands"])}
+                     for helper, s in self._stats.items()}
+
+        result = {}
+        for helper, s in stats.items():
+            count = s["count"]
+            result[helper] = {
+                "count": count,
+                "failures": s["failures"],
+                "slow": s["slow"],
+                "avgMs": round(s["totalMs"] / count, 3) if count else 0.0,
+                "maxMs": round(s["maxMs"], 3),
+                "p50Ms": _percentile(s["buckets"], count, 0.50),
+                "p95Ms": _percentile(s["buckets"], count, 0.95),
+                "p99Ms": _percentile(s["buckets"], count, 0.99),
+                "histogram": {
+                    **{f"le_{upper}": n for upper, n in zip(LATENCY_BUCKETS_MS, s["buckets"])},
+                    "le_inf": s["buckets"][-1],
+                },
+                "documents": s["documents"],
+                # None se la misura dei byte è disattivata (MONGO_MONITOR_REPLY_BYTES)
+                "bytes": s["bytes"] if self.count_bytes else None,
+                "commands": s["commands"],
+            }
+        return {
+            "slowQueryThresholdMs": self.slow_query_ms,
+            "helpers": result,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+
+query_metrics = QueryMetricsListener()
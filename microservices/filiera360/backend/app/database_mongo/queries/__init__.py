@@ -1,8 +1,17 @@
+from . import cache_versions_queries
+from . import checkpoint_queries
 from . import history_queries
+from . import import_jobs_queries
 from . import liked_queries
 from . import models_queries
+from . import model_contents_queries
+from . import model_uploads_queries
+from . import operators_queries
 from . import otp_queries
 from . import products_queries
+from . import product_state_queries
 from . import recently_searched_queries
+from . import seed_runs_queries
 from . import token_queries
 from . import users_queries
+from . import write_jobs_queries
@@ -0,0 +1,18 @@
+from pymongo import ReturnDocument
+
+from ..mongo_client import cache_versions
+
+# versione corrente di una cache in memoria condivisa tra i worker (0 se mai incrementata)
+def get_cache_version(name):
+    doc = cache_versions.find_one({"_id": name}, {"version": 1})
+    return doc["version"] if doc else 0
+
+# incrementa la versione dopo una modifica dei dati in cache e restituisce la nuova
+def bump_cache_version(name):
+    doc = cache_versions.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
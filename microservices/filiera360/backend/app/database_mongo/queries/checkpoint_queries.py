@@ -0,0 +1,32 @@
+from pymongo import UpdateOne
+from ..mongo_client import product_checkpoints
+from ..models.checkpoint_model import create_checkpoint_model
+
+def create_checkpoint(blockchain_product_id, version, timestamp, state, session=None):
+    checkpoint = create_checkpoint_model(blockchain_product_id, version, timestamp, state)
+    product_checkpoints.update_one(
+        {"blockchainProductId": blockchain_product_id, "version": version},
+        {"$setOnInsert": checkpoint},
+        upsert=True,
+        session=session
+    )
+
+# come create_checkpoint per più prodotti ([(blockchainProductId, version, timestamp, state), ...]) con una bulk write
+def create_checkpoints(checkpoints):
+    operations = [UpdateOne({"blockchainProductId": blockchain_product_id, "version": version},
+                            {"$setOnInsert": create_checkpoint_model(blockchain_product_id, version, timestamp, state)},
+                            upsert=True)
+                  for blockchain_product_id, version, timestamp, state in checkpoints]
+    if operations:
+        product_checkpoints.bulk_write(operations, ordered=False)
+
+# recupera il checkpoint più recente con timestamp <= at
+def get_checkpoint_before(blockchain_product_id, at):
+    return product_checkpoints.find_one(
+        {"blockchainProductId": blockchain_product_id, "timestamp": {"$lte": at}},
+        sort=[("timestamp", -1)]
+    )
+
+def delete_checkpoints(blockchain_product_id):
+    result = product_checkpoints.delete_many({"blockchainProductId": blockchain_product_id})
+    return result.deleted_count
@@ -0,0 +1,63 @@
+import os
+from pymongo import DESCENDING, UpdateOne
+from ..mongo_client import product_cooccurrence, product_cooccurrence_floors
+
+# Budget di spazio: vicini conservati per prodotto (oltre questo numero restano solo i più frequenti)
+ALSO_LIKED_MAX_NEIGHBOURS = int(os.getenv("ALSO_LIKED_MAX_NEIGHBOURS", 50))
+# Vicini in più tollerati prima di riportare un prodotto entro il budget (evita una potatura a ogni like)
+ALSO_LIKED_PRUNE_SLACK = int(os.getenv("ALSO_LIKED_PRUNE_SLACK", 10))
+
+# conteggio minimo di partenza dei nuovi vicini di ciascun prodotto: il massimo dei conteggi eliminati
+# dalla potatura (space-saving), così un nuovo vicino può superare quelli conservati invece di essere
+# eliminato subito con conteggio 1
+def _get_floors(blockchain_product_ids):
+    docs = product_cooccurrence_floors.find({"_id": {"$in": list(blockchain_product_ids)}})
+    return {doc["_id"]: doc["floor"] for doc in docs}
+
+# aggiorna di amount (+1 like, -1 unlike) le coppie tra il prodotto e gli altri prodotti piaciuti allo stesso utente,
+# in entrambe le direzioni e con una sola bulk write
+def add_product_cooccurrences(blockchain_product_id, other_product_ids, amount):
+    other_product_ids = [other for other in other_product_ids if other != blockchain_product_id]
+    if not other_product_ids:
+        return
+    touched = [blockchain_product_id, *other_product_ids]
+    floors = _get_floors(touched) if amount > 0 else {}
+    operations = []
+    for other in other_product_ids:
+        for product, neighbour in ((blockchain_product_id, other), (other, blockchain_product_id)):
+            pair = {"productId": product, "otherId": neighbour}
+            if amount > 0:
+                # coppia nuova: parte dal conteggio minimo del prodotto (ordered: prima dell'incremento)
+                operations.append(UpdateOne(pair, {"$setOnInsert": {"count": floors.get(product, 0)}}, upsert=True))
+            operations.append(UpdateOne(pair, {"$inc": {"count": amount}}))
+    result = product_cooccurrence.bulk_write(operations, ordered=True)
+
+    if amount < 0:
+        product_cooccurrence.delete_many({"productId": {"$in": touched}, "count": {"$lte": 0}})
+    elif result.upserted_count:
+        prune_product_cooccurrences(touched)
+
+# riporta entro ALSO_LIKED_MAX_NEIGHBOURS i vicini dei prodotti che superano il budget di oltre
+# ALSO_LIKED_PRUNE_SLACK, eliminando i meno frequenti e alzando il conteggio minimo dei nuovi vicini
+def prune_product_cooccurrences(blockchain_product_ids, max_neighbours=None, slack=None):
+    max_neighbours = ALSO_LIKED_MAX_NEIGHBOURS if max_neighbours is None else max_neighbours
+    slack = ALSO_LIKED_PRUNE_SLACK if slack is None else slack
+    over_budget = product_cooccurrence.aggregate([
+        {"$match": {"productId": {"$in": list(blockchain_product_ids)}}},
+        {"$group": {"_id": "$productId", "neighbours": {"$sum": 1}}},
+        {"$match": {"neighbours": {"$gt": max_neighbours + slack}}}
+    ])
+    for product in over_budget:
+        excess = list(product_cooccurrence.find({"productId": product["_id"]}, {"_id": 1, "count": 1})
+                      .sort([("count", DESCENDING), ("otherId", 1)]).skip(max_neighbours))
+        if not excess:
+            continue
+        product_cooccurrence.delete_many({"_id": {"$in": [doc["_id"] for doc in excess]}})
+        product_cooccurrence_floors.update_one({"_id": product["_id"]},
+                                               {"$max": {"floor": max(doc["count"] for doc in excess)}}, upsert=True)
+
+# prodotti piaciuti più spesso insieme al prodotto indicato (indice productId, count)
+def get_also_liked(blockchain_product_id, limit):
+    cursor = product_cooccurrence.find({"productId": blockchain_product_id}, {"otherId": 1, "count": 1, "_id": 0}) \
+        .sort([("count", DESCENDING), ("otherId", 1)]).limit(limit)
+    return [{"productId": doc["otherId"], "count": doc["count"]} for doc in cursor]
@@ -0,0 +1,62 @@
+from ..mongo_client import users
+
+def _lookup(collection, match_expr, stages, as_field, producer_only=False):
+    """$lookup con pipeline correlata all'utente ($$userId); producer_only la esegue solo per i produttori."""
+    if producer_only:
+        match_expr = {"$and": [match_expr, "$$isProducer"]}
+    return {"$lookup": {
+        "from": collection,
+        "let": {"userId": "$_id", "isProducer": {"$arrayElemAt": ["$flags", 0]}},
+        "pipeline": [{"$match": {"$expr": match_expr}}, *stages],
+        "as": as_field
+    }}
+
+# dati della dashboard dell'utente in una sola aggregazione: like, ricerche recenti e, per i produttori,
+# operatori e catalogo dei modelli (ogni sezione con proiezione e limite)
+def get_user_dashboard(email, liked_limit, operators_limit, models_limit):
+    pipeline = [
+        {"$match": {"email": email}},
+        {"$project": {"email": 1, "manufacturer": 1, "flags": 1}},
+        _lookup("liked_products", {"$eq": ["$userId", "$$userId"]}, [
+            {"$sort": {"likedAt": -1}},
+            {"$limit": liked_limit},
+            {"$lookup": {
+                "from": "product_view",
+                "let": {"productId": "$blockchainProductId"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$productId"]}}},
+                    {"$project": {"_id": 0, "Name": "$product.Name", "Manufacturer": "$product.Manufacturer"}}
+                ],
+                "as": "product"
+            }},
+            {"$project": {"_id": 0, "blockchainProductId": 1, "likedAt": 1,
+                          "product": {"$arrayElemAt": ["$product", 0]}}}
+        ], "likedProducts"),
+        _lookup("recently_searched", {"$eq": ["$userId", "$$userId"]}, [
+            {"$project": {"_id": 0, "products": 1}}
+        ], "recentlySearched"),
+        _lookup("operators", {"$eq": ["$producerId", "$$userId"]}, [
+            {"$sort": {"email": 1}},
+            {"$limit": operators_limit},
+            {"$project": {"_id": 0, "operatorId": 1, "email": 1, "addedAt": 1}}
+        ], "operators", producer_only=True),
+        _lookup("models", {"$eq": ["$uploadedBy", "$$userId"]}, [
+            {"$sort": {"_id": -1}},
+            {"$limit": models_limit},
+            {"$project": {"blockchainProductId": 1, "contentHash": 1, "size": 1, "contentType": 1,
+                          "uploadedAt": 1, "uploadedBy": 1}},
+            {"$lookup": {
+                "from": "model_contents",
+                "let": {"contentHash": "$contentHash"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$contentHash"]}}},
+                    {"$project": {"thumbnail": 1}}
+                ],
+                "as": "content"
+            }},
+            {"$set": {"content": {"$arrayElemAt": ["$content", 0]}}}
+        ], "models", producer_only=True),
+        {"$set": {"recentlySearched": {"$ifNull": [{"$arrayElemAt": ["$recentlySearched.products", 0]}, []]}}}
+    ]
+    result = list(users.aggregate(pipeline))
+    return result[0] if result else None
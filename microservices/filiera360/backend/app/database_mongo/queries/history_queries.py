@@ -1,32 +1,131 @@
+import os
+from datetime import datetime, timezone
 from bson import ObjectId
-from ..mongo_client import product_history
+from ..mongo_client import product_history, product_history_buckets
 from ..models.history_model import create_history_model
+from ..models.history_bucket_model import create_bucket_entry
+from ..history_archive import load_archived_entries
 
-def add_history_entry(blockchain_product_id, modified_by, changes):
-    entry = create_history_model(blockchain_product_id, modified_by, changes)
-    result = product_history.insert_one(entry)
-    return result.inserted_id
+# document: una history entry per documento; bucket: più entry per documento (bucket pattern)
+HISTORY_STORAGE_MODE = os.getenv("HISTORY_STORAGE_MODE", "document")
+# numero massimo di entry per bucket (vale anche in modalità a finestra temporale)
+HISTORY_BUCKET_SIZE = int(os.getenv("HISTORY_BUCKET_SIZE", 100))
+# se > 0 ogni bucket raccoglie le entry di una finestra temporale di questa durata (secondi)
+HISTORY_BUCKET_WINDOW_SECONDS = int(os.getenv("HISTORY_BUCKET_WINDOW_SECONDS", 0))
+
+def bucket_start_for(timestamp):
+    if timestamp.tzinfo is None:
+        # pymongo restituisce datetime naive in UTC
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % HISTORY_BUCKET_WINDOW_SECONDS, tz=timezone.utc)
+
+def _naive_utc(timestamp):
+    # i timestamp letti da MongoDB sono datetime naive in UTC
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def add_history_entry(blockchain_product_id, modified_by, changes, session=None, timestamp=None):
+    entry = create_history_model(blockchain_product_id, modified_by, changes, timestamp)
+    if HISTORY_STORAGE_MODE != "bucket":
+        result = product_history.insert_one(entry, session=session)
+        return result.inserted_id
+
+    # Aggiunge l'entry al bucket aperto del prodotto, creandone uno nuovo se è pieno
+    bucket_entry = create_bucket_entry(entry)
+    bucket_filter = {
+        "blockchainProductId": blockchain_product_id,
+        "count": {"$lt": HISTORY_BUCKET_SIZE},
+        "archived": False
+    }
+    update = {
+        "$push": {"entries": bucket_entry},
+        "$inc": {"count": 1},
+        "$min": {"start": entry["timestamp"]},
+        "$max": {"end": entry["timestamp"]},
+        "$addToSet": {"modifiedBy": entry["modifiedBy"]}
+    }
+    if HISTORY_BUCKET_WINDOW_SECONDS > 0:
+        bucket_filter["bucketStart"] = bucket_start_for(entry["timestamp"])
+    else:
+        update["$setOnInsert"] = {"bucketStart": entry["timestamp"]}
+
+    product_history_buckets.update_one(bucket_filter, update, upsert=True, session=session)
+    return bucket_entry["_id"]
+
+def _bucket_entries(bucket):
+    """Entry di un bucket nel formato dei documenti di product_history, anche se archiviato."""
+    if bucket.get("archived"):
+        entries = load_archived_entries(bucket["archiveKey"])
+    else:
+        entries = bucket.get("entries", [])
+    return [{**entry, "blockchainProductId": bucket["blockchainProductId"]} for entry in entries]
 
 def delete_history_entry(entry_id):
     if isinstance(entry_id, str):
         entry_id = ObjectId(entry_id)
     result = product_history.delete_one({"_id": entry_id})
-    return result.deleted_count > 0
+    if result.deleted_count > 0:
+        return True
+
+    # le entry dei bucket archiviati sono in sola lettura
+    result = product_history_buckets.update_one(
+        {"entries._id": entry_id, "archived": False},
+        {"$pull": {"entries": {"_id": entry_id}}, "$inc": {"count": -1}}
+    )
+    return result.modified_count > 0
 
 # recupera tutta la cronologia di un prodotto, ordinata per data.
 def get_history_by_blockchain_id(blockchain_product_id):
-    return list(product_history.find({"blockchainProductId": blockchain_product_id}).sort("timestamp", 1))
+    history = list(product_history.find({"blockchainProductId": blockchain_product_id}))
+    for bucket in product_history_buckets.find({"blockchainProductId": blockchain_product_id}):
+        history.extend(_bucket_entries(bucket))
+    history.sort(key=lambda entry: (entry["timestamp"], entry["_id"]))
+    return history
+
+# recupera le modifiche di un prodotto con after < timestamp <= until, ordinate per data
+def get_history_between(blockchain_product_id, after, until):
+    after, until = _naive_utc(after), _naive_utc(until)
+    timestamp_range = {"$lte": until}
+    if after is not None:
+        timestamp_range["$gt"] = after
+    history = list(product_history.find({"blockchainProductId": blockchain_product_id, "timestamp": timestamp_range}))
+
+    bucket_filter = {"blockchainProductId": blockchain_product_id, "start": {"$lte": until}}
+    if after is not None:
+        bucket_filter["end"] = {"$gt": after}
+    for bucket in product_history_buckets.find(bucket_filter):
+        history.extend(
+            entry for entry in _bucket_entries(bucket)
+            if entry["timestamp"] <= until and (after is None or entry["timestamp"] > after)
+        )
+    history.sort(key=lambda entry: (entry["timestamp"], entry["_id"]))
+    return history
 
 # recupera tutte le modifiche fatte da un certo utente
 def get_history_by_user(user_id):
     if isinstance(user_id, str):
         user_id = ObjectId(user_id)
-    return list(product_history.find({"modifiedBy": user_id}))
+    history = list(product_history.find({"modifiedBy": user_id}))
+    for bucket in product_history_buckets.find({"modifiedBy": user_id}):
+        history.extend(entry for entry in _bucket_entries(bucket) if entry["modifiedBy"] == user_id)
+    return history
 
 # recupera l'ultima modifica fatta a un prodotto
 def get_last_history_entry(blockchain_product_id):
-    return product_history.find_one(
+    last_entry = product_history.find_one(
         {"blockchainProductId": blockchain_product_id},
         sort=[("timestamp", -1)]
     )
-
+    last_bucket = product_history_buckets.find_one(
+        {"blockchainProductId": blockchain_product_id},
+        sort=[("end", -1)]
+    )
+    if last_bucket:
+        bucket_entries = _bucket_entries(last_bucket)
+        if bucket_entries:
+            last_bucket_entry = max(bucket_entries, key=lambda entry: entry["timestamp"])
+            if not last_entry or last_bucket_entry["timestamp"] > last_entry["timestamp"]:
+                return last_bucket_entry
+    return last_entry
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from ..mongo_client import import_jobs, import_rows
+
+def create_import_job(job_doc):
+    import_jobs.insert_one(job_doc)
+    return job_doc["_id"]
+
+def get_import_job(job_id):
+    return import_jobs.find_one({"_id": job_id})
+
+# aggiorna stato e contatori del job (inc: {"uploaded": n, ...})
+def update_import_job(job_id, fields=None, inc=None):
+    update = {"$set": {**(fields or {}), "updatedAt": datetime.now(timezone.utc)}}
+    if inc:
+        update["$inc"] = inc
+    import_jobs.update_one({"_id": job_id}, update)
+
+# job non conclusi (queued o running), per individuare quelli dei processi terminati
+def get_unfinished_import_jobs():
+    return list(import_jobs.find({"status": {"$in": ["queued", "running"]}},
+                                 {"owner": 1, "path": 1, "status": 1, "createdAt": 1, "updatedAt": 1}))
+
+# chiude come falliti i job indicati, se non sono stati conclusi nel frattempo
+def fail_import_jobs(job_ids, error):
+    if not job_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    result = import_jobs.update_many(
+        {"_id": {"$in": list(job_ids)}, "status": {"$in": ["queued", "running"]}},
+        {"$set": {"status": "failed", "error": error, "updatedAt": now, "finishedAt": now}}
+    )
+    return result.modified_count
+
+# righe validate di una finestra del file, inserite insieme
+def insert_import_rows(row_docs):
+    if row_docs:
+        import_rows.insert_many(row_docs, ordered=False)
+
+# esiti delle righe caricate: [(row, status, error), ...] in un solo bulk_write
+def set_import_row_results(job_id, results):
+    if not results:
+        return
+    import_rows.bulk_write([
+        UpdateOne({"jobId": job_id, "row": row}, {"$set": {"status": status, "error": error}})
+        for row, status, error in results
+    ], ordered=False)
+
+# pagina di righe del job in ordine di riga, opzionalmente filtrate per stato
+def get_import_rows(job_id, limit, after_row=0, status=None):
+    query = {"jobId": job_id, "row": {"$gt": after_row}}
+    if status:
+        query["status"] = status
+    cursor = import_rows.find(query, {"_id": 0, "jobId": 0, "createdAt": 0}).sort("row", 1).limit(limit)
+    return list(cursor)
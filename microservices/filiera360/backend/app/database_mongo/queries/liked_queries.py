@@ -1,17 +1,52 @@
+import os
 from bson import ObjectId
+from pymongo import DESCENDING, UpdateOne
 from ..mongo_client import liked_products
 from ..models.liked_model import create_liked_product_model
+from .cooccurrence_queries import add_product_cooccurrences
+
+# Like più recenti dell'utente considerati per i prodotti piaciuti insieme (limita il lavoro per ogni like)
+ALSO_LIKED_MAX_USER_LIKES = int(os.getenv("ALSO_LIKED_MAX_USER_LIKES", 100))
+
+def _other_liked_products(user_id, blockchain_product_id):
+    cursor = liked_products.find(
+        {"userId": user_id, "blockchainProductId": {"$ne": blockchain_product_id}},
+        {"blockchainProductId": 1, "_id": 0}
+    ).sort("likedAt", DESCENDING).limit(ALSO_LIKED_MAX_USER_LIKES)
+    return [doc["blockchainProductId"] for doc in cursor]
+
+def _update_cooccurrences(blockchain_product_id, other_product_ids, amount):
+    try:
+        add_product_cooccurrences(blockchain_product_id, other_product_ids, amount)
+    except Exception as e:
+        # l'indice è approssimato: un aggiornamento perso non blocca il like
+        print(f"[liked_queries] Cannot update also-liked index for {blockchain_product_id}: {e}")
 
 def like_a_product(user_id, blockchain_product_id):
-    liked_data = create_liked_product_model(user_id, blockchain_product_id)
+    user_id = ObjectId(user_id)
+    others = _other_liked_products(user_id, blockchain_product_id)
+    # le coppie incrementate vengono salvate nel like: all'unlike si decrementano solo quelle
+    liked_data = create_liked_product_model(user_id, blockchain_product_id, others)
     result = liked_products.insert_one(liked_data)
+    _update_cooccurrences(blockchain_product_id, others, 1)
     return result.inserted_id
 
 def unlike_a_product(user_id, blockchain_product_id):
     if isinstance(user_id, str):
         user_id = ObjectId(user_id)
-    result = liked_products.delete_one({"userId": user_id, "blockchainProductId": blockchain_product_id})
-    return result.deleted_count > 0
+    liked = liked_products.find_one_and_delete({"userId": user_id, "blockchainProductId": blockchain_product_id})
+    if not liked:
+        return False
+    # coppie incrementate da questo like e dai like successivi dell'utente che lo includono
+    later = list(liked_products.find({"userId": user_id, "cooccurringWith": blockchain_product_id},
+                                     {"blockchainProductId": 1}))
+    if later:
+        # l'unlike di quei prodotti non deve decrementare di nuovo le stesse coppie
+        liked_products.bulk_write([UpdateOne({"_id": doc["_id"]}, {"$pull": {"cooccurringWith": blockchain_product_id}})
+                                   for doc in later], ordered=False)
+    others = liked.get("cooccurringWith", []) + [doc["blockchainProductId"] for doc in later]
+    _update_cooccurrences(blockchain_product_id, others, -1)
+    return True
 
 # ricerca i prodotti con like di un utente e i gli utenti che hanno messo like a un prodotto
 def get_liked_products_by_user(user_id):
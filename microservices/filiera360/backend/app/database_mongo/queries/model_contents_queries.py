@@ -0,0 +1,48 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from ..mongo_client import model_contents
+
+def get_model_content(content_hash):
+    return model_contents.find_one({"_id": content_hash})
+
+def get_model_thumbnail(content_hash):
+    content = model_contents.find_one({"_id": content_hash}, {"storage": 1, "thumbnail": 1})
+    if not content or not content.get("thumbnail"):
+        return None
+    return {**content["thumbnail"], "storage": content["storage"]}
+
+# False se un altro upload ha creato lo stesso contenuto nel frattempo
+def create_model_content(content_doc):
+    try:
+        model_contents.insert_one(content_doc)
+        return True
+    except DuplicateKeyError:
+        return False
+
+# aggiunge un riferimento al contenuto; None se il contenuto non esiste
+def add_model_content_ref(content_hash):
+    return model_contents.find_one_and_update(
+        {"_id": content_hash},
+        {"$inc": {"refCount": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+def release_model_content_ref(content_hash):
+    return model_contents.find_one_and_update(
+        {"_id": content_hash},
+        {"$inc": {"refCount": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+# elimina il contenuto solo se nessuno lo ha referenziato di nuovo nel frattempo
+def delete_unreferenced_model_content(content_hash):
+    return model_contents.find_one_and_delete({"_id": content_hash, "refCount": {"$lte": 0}})
+
+def set_model_content_variant(content_hash, encoding, variant):
+    result = model_contents.update_one({"_id": content_hash}, {"$set": {f"variants.{encoding}": variant}})
+    return result.matched_count > 0
+
+# thumbnail None: il modello non ha texture utilizzabili (tentativo già fatto)
+def set_model_content_thumbnail(content_hash, thumbnail):
+    result = model_contents.update_one({"_id": content_hash}, {"$set": {"thumbnail": thumbnail}})
+    return result.matched_count > 0
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from ..mongo_client import model_uploads
+
+def create_upload_session(upload_doc):
+    model_uploads.insert_one(upload_doc)
+    return upload_doc["_id"]
+
+def get_upload_session(upload_id):
+    return model_uploads.find_one({"_id": upload_id})
+
+# registra una parte ricevuta; False se la sessione non è più aperta
+def record_upload_part(upload_id, part_number, part_info, expires_at):
+    result = model_uploads.update_one(
+        {"_id": upload_id, "status": "open"},
+        {"$set": {f"parts.{part_number}": part_info, "updatedAt": datetime.now(timezone.utc),
+                  "expiresAt": expires_at}}
+    )
+    return result.matched_count > 0
+
+# passa la sessione in "completing": una sola richiesta di completamento alla volta
+def claim_upload_session(upload_id):
+    return model_uploads.find_one_and_update(
+        {"_id": upload_id, "status": "open"},
+        {"$set": {"status": "completing", "updatedAt": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER
+    )
+
+def reopen_upload_session(upload_id):
+    model_uploads.update_one({"_id": upload_id}, {"$set": {"status": "open"}})
+
+def delete_upload_session(upload_id):
+    result = model_uploads.delete_one({"_id": upload_id})
+    return result.deleted_count > 0
+
+def get_expired_upload_sessions(now, limit):
+    return list(model_uploads.find({"expiresAt": {"$lt": now}, "status": "open"}, limit=limit))
@@ -1,26 +1,22 @@
 from bson import ObjectId
+from pymongo import ReturnDocument
 from ..mongo_client import models
 from ..models.models_model import create_model_model
 from datetime import datetime
 
-# Update || Insert
-def upsert_model_for_product(blockchain_product_id, model_string, uploaded_by):
-    existing = models.find_one({"blockchainProductId": blockchain_product_id})
-    model_doc = create_model_model(blockchain_product_id, model_string, uploaded_by)
-    if existing:
-        # Aggiorna solo i campi modificabili, mantieni uploadedAt aggiornato
-        models.update_one(
-            {"_id": existing["_id"]},
-            {"$set": {
-                "modelString": model_string,
-                "uploadedBy": ObjectId(uploaded_by),
-                "uploadedAt": model_doc["uploadedAt"]
-            }}
-        )
-        return existing["_id"]
-    else:
-        result = models.insert_one(model_doc)
-        return result.inserted_id
+# Update || Insert, restituisce il documento precedente (None se è un nuovo modello)
+def upsert_model_for_product(blockchain_product_id, content_hash, size, content_type, uploaded_by):
+    model_doc = create_model_model(blockchain_product_id, content_hash, size, content_type, uploaded_by)
+    return models.find_one_and_update(
+        {"blockchainProductId": blockchain_product_id},
+        {
+            "$set": model_doc,
+            # rimuove GLB inline e posizione del blob dei documenti precedenti ai contenuti condivisi
+            "$unset": {"modelString": "", "blobKey": "", "storage": ""}
+        },
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
 
 def get_model_by_id(model_id):
     if isinstance(model_id, str):
@@ -30,10 +26,58 @@ def get_model_by_id(model_id):
 def get_model_by_blockchain_id(blockchain_id):
     return models.find_one({"blockchainProductId": blockchain_id})
 
+# solo l'hash del contenuto (None per i documenti non ancora migrati, con il GLB inline)
+def get_model_hash_by_blockchain_id(blockchain_id):
+    return models.find_one({"blockchainProductId": blockchain_id}, {"contentHash": 1, "_id": 0})
+
+def get_model_by_hash(content_hash):
+    return models.find_one({"contentHash": content_hash})
+
+# solo metadati: i documenti non ancora migrati contengono il GLB inline in modelString
 def get_models_by_user(user_id):
     if isinstance(user_id, str):
         user_id = ObjectId(user_id)
-    return list(models.find({"uploadedBy": user_id}))
+    return list(models.find({"uploadedBy": user_id}, {"modelString": 0}))
+
+# catalogo dei modelli di un utente, dal più recente: metadati, anteprima ed email di chi ha caricato
+def get_model_catalogue(user_id, limit, before_id=None):
+    if isinstance(user_id, str):
+        user_id = ObjectId(user_id)
+    match = {"uploadedBy": user_id}
+    if before_id is not None:
+        match["_id"] = {"$lt": before_id}
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"_id": -1}},
+        {"$limit": limit},
+        {"$project": {"blockchainProductId": 1, "contentHash": 1, "size": 1, "contentType": 1,
+                      "uploadedAt": 1, "uploadedBy": 1}},
+        {"$lookup": {
+            "from": "model_contents",
+            "let": {"contentHash": "$contentHash"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$contentHash"]}}},
+                {"$project": {"thumbnail": 1}}
+            ],
+            "as": "content"
+        }},
+        {"$lookup": {
+            "from": "users",
+            "let": {"userId": "$uploadedBy"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$userId"]}}},
+                {"$project": {"email": 1}}
+            ],
+            "as": "uploader"
+        }},
+        {"$set": {
+            "content": {"$arrayElemAt": ["$content", 0]},
+            "uploaderEmail": {"$arrayElemAt": ["$uploader.email", 0]}
+        }},
+        {"$unset": "uploader"}
+    ]
+    return list(models.aggregate(pipeline))
 
 def update_model(model_id, update_data):
     if isinstance(model_id, str):
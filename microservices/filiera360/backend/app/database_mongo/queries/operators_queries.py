@@ -0,0 +1,42 @@
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from ..mongo_client import operators
+
+# associa un operatore a un produttore; False se l'associazione esiste già (indice unico producerId+email)
+def add_operator(operator_doc):
+    try:
+        operators.insert_one(operator_doc)
+        return True
+    except DuplicateKeyError:
+        return False
+
+# rimuove l'associazione con una sola operazione atomica; False se non esisteva
+def remove_operator(producer_id, operator_email):
+    if isinstance(producer_id, str):
+        producer_id = ObjectId(producer_id)
+    result = operators.delete_one({"producerId": producer_id, "email": operator_email})
+    return result.deleted_count > 0
+
+# pagina di operatori di un produttore in ordine di email; after è l'ultima email della pagina precedente
+def get_operators_page(producer_id, limit, after=None):
+    if isinstance(producer_id, str):
+        producer_id = ObjectId(producer_id)
+    query = {"producerId": producer_id}
+    if after is not None:
+        query["email"] = {"$gt": after}
+    cursor = operators.find(query, {"_id": 0, "operatorId": 1, "email": 1, "addedAt": 1}) \
+        .sort("email", 1).limit(limit)
+    return list(cursor)
+
+# produttore dell'operatore (il primo associato, come la vecchia ricerca sugli array embedded)
+def find_operator_producer(operator_email):
+    return operators.find_one(
+        {"email": operator_email},
+        {"producerId": 1, "producerEmail": 1, "manufacturer": 1},
+        sort=[("_id", 1)]
+    )
+
+# tutte le associazioni per la cache operatore -> produttore
+def get_all_operator_producers():
+    return operators.find({}, {"producerId": 1, "producerEmail": 1, "manufacturer": 1, "email": 1}).sort("_id", 1)
@@ -0,0 +1,55 @@
+from pymongo import DESCENDING
+from ..mongo_client import liked_products, product_activity, product_popularity, product_rankings
+from ..models.product_activity_model import activity_hour, create_product_ranking_model
+
+# incrementa il contatore orario di un prodotto (kind: "likes" | "searches"; amount negativo per i like rimossi)
+def record_product_activity(blockchain_product_id, kind, amount=1, at=None):
+    product_activity.update_one(
+        {"productId": blockchain_product_id, "hour": activity_hour(at)},
+        {"$inc": {kind: amount}},
+        upsert=True
+    )
+
+# numero totale di like del prodotto, aggiornato a ogni like/unlike (dopo la scrittura in liked_products)
+def increment_product_likes(blockchain_product_id, amount):
+    result = product_popularity.update_one({"_id": blockchain_product_id}, {"$inc": {"likes": amount}})
+    if result.matched_count == 0:
+        # primo like/unlike del prodotto da quando esistono i contatori: il contatore parte dai like presenti
+        # (quello appena scritto incluso), così i like precedenti contano e un unlike non lo rende negativo
+        likes = liked_products.count_documents({"blockchainProductId": blockchain_product_id})
+        product_popularity.update_one({"_id": blockchain_product_id}, {"$max": {"likes": likes}}, upsert=True)
+
+# prodotti con più like, dall'indice su likes
+def get_most_liked_products(limit):
+    cursor = product_popularity.find({"likes": {"$gt": 0}}).sort([("likes", DESCENDING), ("_id", 1)]).limit(limit)
+    return [{"productId": doc["_id"], "likes": doc["likes"]} for doc in cursor]
+
+# classifica dei prodotti per attività nelle ore successive a since; le ore più vecchie pesano fino alla metà
+def aggregate_trending_products(since, now, like_weight, search_weight, limit):
+    window_ms = max((now - since).total_seconds() * 1000, 1)
+    decay = {"$subtract": [1, {"$divide": [{"$subtract": [now, "$hour"]}, 2 * window_ms]}]}
+    pipeline = [
+        {"$match": {"hour": {"$gte": since}}},
+        {"$group": {
+            "_id": "$productId",
+            "likes": {"$sum": {"$ifNull": ["$likes", 0]}},
+            "searches": {"$sum": {"$ifNull": ["$searches", 0]}},
+            "score": {"$sum": {"$multiply": [{"$add": [
+                {"$multiply": [{"$ifNull": ["$likes", 0]}, like_weight]},
+                {"$multiply": [{"$ifNull": ["$searches", 0]}, search_weight]}
+            ]}, decay]}}
+        }},
+        {"$match": {"score": {"$gt": 0}}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "productId": "$_id", "score": 1, "likes": 1, "searches": 1}}
+    ]
+    return list(product_activity.aggregate(pipeline))
+
+def save_product_ranking(name, items, window_hours):
+    ranking = create_product_ranking_model(name, items, window_hours)
+    product_rankings.replace_one({"_id": name}, ranking, upsert=True)
+
+# primi limit elementi della classifica (letto solo il prefisso dell'array)
+def get_product_ranking(name, limit):
+    return product_rankings.find_one({"_id": name}, {"items": {"$slice": limit}, "refreshedAt": 1, "windowHours": 1})
@@ -0,0 +1,134 @@
+import copy
+import os
+from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from ..mongo_client import mongo, product_state
+from ..models.product_state_model import create_product_state_model
+from ...utils.product_utils import apply_product_changes, revert_product_changes
+from .checkpoint_queries import create_checkpoint, create_checkpoints
+from .history_queries import add_history_entry, get_history_by_blockchain_id
+
+# Ogni quante history entry salvare uno snapshot completo in product_checkpoints
+HISTORY_CHECKPOINT_INTERVAL = int(os.getenv("HISTORY_CHECKPOINT_INTERVAL", 50))
+
+# Le chiavi dello stato (campi del prodotto e sottochiavi di CustomObject) arrivano dal payload e finiscono
+# nei path di $set e delle proiezioni: "." creerebbe un path annidato e "$" verrebbe rifiutato.
+# Nello snapshot si salvano quindi con "%", "." e "$" codificati (percent-encoding, reversibile).
+_KEY_ESCAPES = (("%", "%25"), (".", "%2E"), ("$", "%24"))
+
+def _escape_key(key):
+    for char, escaped in _KEY_ESCAPES:
+        key = key.replace(char, escaped)
+    return key
+
+def _unescape_key(key):
+    for char, escaped in reversed(_KEY_ESCAPES):
+        key = key.replace(escaped, char)
+    return key
+
+def _convert_state(state, convert_key):
+    converted = {}
+    for key, value in (state or {}).items():
+        if key == "CustomObject" and isinstance(value, dict):
+            value = {convert_key(subkey): subvalue for subkey, subvalue in value.items()}
+        converted[convert_key(key)] = value
+    return converted
+
+def _state_path(field):
+    # stessa convenzione di apply_product_changes: "CustomObject.<sottochiave>" indica una sottochiave
+    if field.startswith("CustomObject."):
+        _, subkey = field.split(".", 1)
+        return f"state.CustomObject.{_escape_key(subkey)}"
+    return f"state.{_escape_key(field)}"
+
+# recupera lo snapshot dello stato corrente, eventualmente solo per alcuni campi
+def get_product_state(blockchain_product_id, fields=None):
+    projection = None
+    if fields:
+        projection = {f"state.{_escape_key(field)}": 1 for field in fields}
+        projection["version"] = 1
+    snapshot = product_state.find_one({"blockchainProductId": blockchain_product_id}, projection)
+    if snapshot is not None:
+        snapshot["state"] = _convert_state(snapshot.get("state"), _unescape_key)
+    return snapshot
+
+# blockchainProductId con uno snapshot tra quelli indicati
+def get_existing_product_state_ids(blockchain_ids):
+    cursor = product_state.find({"blockchainProductId": {"$in": list(blockchain_ids)}}, {"blockchainProductId": 1, "_id": 0})
+    return {state["blockchainProductId"] for state in cursor}
+
+# crea lo snapshot al caricamento del prodotto (non sovrascrive uno snapshot esistente)
+def create_product_state(blockchain_product_id, product_data):
+    state_data = create_product_state_model(blockchain_product_id, _convert_state(product_data, _escape_key))
+    result = product_state.update_one(
+        {"blockchainProductId": blockchain_product_id},
+        {"$setOnInsert": state_data},
+        upsert=True
+    )
+    if result.upserted_id is not None:
+        # checkpoint iniziale: lo stato al momento del caricamento
+        create_checkpoint(blockchain_product_id, 0, state_data["updatedAt"], product_data)
+
+# come create_product_state per più prodotti, con una bulk write per gli snapshot e una per i checkpoint iniziali
+def create_product_states(products):
+    if not products:
+        return
+    states = [create_product_state_model(product["ID"], _convert_state(product, _escape_key)) for product in products]
+    operations = [UpdateOne({"blockchainProductId": state["blockchainProductId"]}, {"$setOnInsert": state}, upsert=True)
+                  for state in states]
+    try:
+        upserted = product_state.bulk_write(operations, ordered=False).upserted_ids
+    except BulkWriteError as e:
+        # snapshot creato nel frattempo da un'altra scrittura: l'upsert collide sull'indice unico
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+    # checkpoint iniziale solo per gli snapshot creati ora
+    create_checkpoints([(products[index]["ID"], 0, states[index]["updatedAt"], products[index])
+                        for index in upserted])
+
+# ricostruisce lo snapshot (e i checkpoint) dall'intera cronologia, per i prodotti caricati prima di product_state.
+# La history contiene solo i campi modificati: con current_product (il prodotto attuale dal ledger) lo stato
+# di partenza è quello del caricamento, ottenuto annullando la history a ritroso; senza, si parte da vuoto
+def rebuild_product_state(blockchain_product_id, current_product=None):
+    history = get_history_by_blockchain_id(blockchain_product_id)
+    state = copy.deepcopy(current_product) if current_product else {}
+    if current_product:
+        for entry in reversed(history):
+            revert_product_changes(state, entry.get("changes"))
+    for version, entry in enumerate(history, start=1):
+        apply_product_changes(state, entry.get("changes"))
+        if version % HISTORY_CHECKPOINT_INTERVAL == 0:
+            create_checkpoint(blockchain_product_id, version, entry["timestamp"], state)
+
+    state_data = create_product_state_model(blockchain_product_id, _convert_state(state, _escape_key))
+    state_data["version"] = len(history)
+    product_state.replace_one({"blockchainProductId": blockchain_product_id}, state_data, upsert=True)
+    return {**state_data, "state": state}
+
+def _changes_to_update(changes):
+    return {_state_path(change["field"]): change["newValue"] for change in changes}
+
+# inserisce la history entry e aggiorna lo snapshot nella stessa transazione
+def record_product_changes(blockchain_product_id, modified_by, changes):
+    now = datetime.now(timezone.utc)
+
+    def _write(session):
+        entry_id = add_history_entry(blockchain_product_id, modified_by, changes, session=session, timestamp=now)
+        updated = product_state.find_one_and_update(
+            {"blockchainProductId": blockchain_product_id},
+            {"$set": {**_changes_to_update(changes), "updatedAt": now}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        # ogni HISTORY_CHECKPOINT_INTERVAL entry salva lo stato completo per le letture point-in-time
+        if updated["version"] % HISTORY_CHECKPOINT_INTERVAL == 0:
+            snapshot = product_state.find_one({"_id": updated["_id"]}, {"state": 1}, session=session)
+            create_checkpoint(blockchain_product_id, updated["version"], now,
+                              _convert_state(snapshot.get("state"), _unescape_key), session=session)
+        return entry_id
+
+    return mongo.run_in_transaction(_write)
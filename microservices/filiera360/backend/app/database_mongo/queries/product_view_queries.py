@@ -0,0 +1,148 @@
+import math
+from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from ..mongo_client import product_view
+from ..models.product_view_model import PRODUCT_VIEW_SCHEMA_VERSION, create_product_view_model
+
+def get_product_view(blockchain_product_id):
+    return product_view.find_one({"_id": blockchain_product_id})
+
+# solo versione e data di allineamento della vista (per validare le liste in cache senza rileggerle)
+def get_product_view_version(blockchain_product_id):
+    return product_view.find_one({"_id": blockchain_product_id}, {"version": 1, "syncedAt": 1})
+
+# una lista della vista (es. "movements", "product.SensorData") con la versione a cui si riferisce
+def get_product_view_entries(blockchain_product_id, field):
+    return product_view.find_one({"_id": blockchain_product_id}, {field: 1, "version": 1, "syncedAt": 1})
+
+# (hash del contenuto, versione) delle viste dei prodotti indicati (una sola query per un gruppo di ID);
+# hash None per le viste con una struttura precedente, da riscrivere
+def get_product_view_hashes(blockchain_ids):
+    cursor = product_view.find({"_id": {"$in": list(blockchain_ids)}},
+                               {"contentHash": 1, "schemaVersion": 1, "version": 1})
+    return {view["_id"]: (view.get("contentHash") if view.get("schemaVersion") == PRODUCT_VIEW_SCHEMA_VERSION else None,
+                          view.get("version")) for view in cursor}
+
+def _view_update(product, synced_at=None):
+    view = create_product_view_model(product, synced_at)
+    movements = view.pop("movements")
+    view.pop("version")
+    return {"_id": view.pop("_id")}, {"$set": view, "$setOnInsert": {"movements": movements}, "$inc": {"version": 1}}
+
+def _guard_version(view_filter, version):
+    view_filter["version"] = {"$exists": False} if version is None else version
+
+# salva il prodotto completo nella vista (i movimenti già registrati restano)
+def save_product_view(product, synced_at=None):
+    product_view.update_one(*_view_update(product, synced_at), upsert=True)
+
+# come save_product_view, ma solo se la vista ha ancora la versione letta prima del ledger
+# (None se non esisteva); False se nel frattempo è cambiata
+def save_product_view_if_unchanged(product, expected_version, synced_at=None):
+    view_filter, update = _view_update(product, synced_at)
+    _guard_version(view_filter, expected_version)
+    try:
+        result = product_view.update_one(view_filter, update, upsert=True)
+    except DuplicateKeyError:
+        return False
+    return result.matched_count > 0 or result.upserted_id is not None
+
+# come save_product_view per più prodotti, con una sola bulk write.
+# Con expected_versions ({ID: versione letta, None se la vista non esisteva}) una vista viene scritta solo
+# se nel frattempo non è cambiata (es. dati dei sensori aggiunti dopo la lettura dal ledger)
+def save_product_views(products, synced_at=None, expected_versions=None):
+    if not products:
+        return
+    operations = []
+    for product in products:
+        view_filter, update = _view_update(product, synced_at)
+        if expected_versions is not None:
+            _guard_version(view_filter, expected_versions.get(product["ID"]))
+        operations.append(UpdateOne(view_filter, update, upsert=True))
+    try:
+        product_view.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # vista cambiata (o creata) dopo la lettura: l'upsert collide sull'_id e la vista resta com'è
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+# aggiunge elementi a una lista della vista (es. product.SensorData) e restituisce {version, syncedAt}
+# dopo la scrittura; None se la vista non esiste. L'hash del contenuto viene rimosso: sarà ricalcolato
+# dalla riconciliazione
+def push_product_view_entries(blockchain_product_id, field, entries):
+    return product_view.find_one_and_update(
+        {"_id": blockchain_product_id},
+        {"$push": {field: {"$each": entries}}, "$set": {"updatedAt": datetime.now(timezone.utc)},
+         "$unset": {"contentHash": ""}, "$inc": {"version": 1}},
+        projection={"version": 1, "syncedAt": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+def delete_product_view(blockchain_product_id):
+    product_view.delete_one({"_id": blockchain_product_id})
+
+_SEARCH_PROJECTION = {"ID": "$_id", "Name": "$product.Name", "Manufacturer": "$product.Manufacturer",
+                      "CountryOfOrigin": "$product.CountryOfOrigin", "score": 1, "_id": 0}
+
+# numero di elementi di un campo array (senza ripetizioni) presenti in values
+def _count_in(field, values):
+    return {"$size": {"$filter": {"input": field, "cond": {"$in": ["$$this", values]}}}}
+
+def _search_filter(manufacturer, condition):
+    return {**condition, "manufacturer": manufacturer} if manufacturer else condition
+
+# True se almeno un prodotto contiene tutti i prefissi indicati
+def has_product_prefix_match(prefixes, manufacturer=None):
+    return product_view.find_one(_search_filter(manufacturer, {"search.prefixes": {"$all": prefixes}}), {"_id": 1}) is not None
+
+# ricerca per prefisso: tutti i prefissi presenti; punteggio più alto per parole intere e parole del nome
+def search_product_views_by_prefix(prefixes, tokens, skip, limit, manufacturer=None):
+    pipeline = [
+        {"$match": _search_filter(manufacturer, {"search.prefixes": {"$all": prefixes}})},
+        {"$addFields": {"score": {"$add": [
+            1,
+            {"$multiply": [2, _count_in("$search.terms", tokens)]},
+            {"$multiply": [3, _count_in("$search.name", tokens)]}
+        ]}}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": _SEARCH_PROJECTION}
+    ]
+    return list(product_view.aggregate(pipeline))
+
+# trigrammi su cui filtrare con l'indice: un prodotto con almeno `required` degli n trigrammi della ricerca
+# ne contiene almeno uno tra n - required + 1 qualsiasi. Si scelgono per primi quelli interni alla parola,
+# più selettivi di quelli di bordo (es. " ca") comuni a molte parole
+def _candidate_grams(grams, required):
+    ordered = sorted(grams, key=lambda gram: gram.startswith(" ") or gram.endswith(" "))
+    return ordered[:len(grams) - required + 1]
+
+# ricerca con errori di battitura: quota dei trigrammi della ricerca presenti nel prodotto.
+# Il filtro sull'indice esclude solo prodotti che non possono raggiungere min_similarity e la
+# somiglianza viene calcolata su tutti i candidati prima dell'ordinamento
+def search_product_views_by_trigrams(grams, tokens, skip, limit, min_similarity, manufacturer=None):
+    required = max(1, math.ceil(min_similarity * len(grams) - 1e-9))
+    overlap = _count_in("$search.grams", grams)
+    pipeline = [
+        {"$match": _search_filter(manufacturer, {"search.grams": {"$in": _candidate_grams(grams, required)}})},
+        {"$addFields": {"overlap": overlap}},
+        {"$match": {"overlap": {"$gte": required}}},
+        {"$addFields": {"similarity": {"$divide": ["$overlap", len(grams)]}}},
+        {"$addFields": {"score": {"$add": [
+            "$similarity",
+            _count_in("$search.name", tokens)
+        ]}}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": _SEARCH_PROJECTION}
+    ]
+    return list(product_view.aggregate(pipeline))
+
+# nome e manufacturer dei prodotti indicati, per arricchire liste di ID (una sola query)
+def get_product_view_summaries(blockchain_ids):
+    cursor = product_view.find({"_id": {"$in": list(blockchain_ids)}}, {"product.Name": 1, "product.Manufacturer": 1})
+    return {view["_id"]: {"Name": view.get("product", {}).get("Name"),
+                          "Manufacturer": view.get("product", {}).get("Manufacturer")} for view in cursor}
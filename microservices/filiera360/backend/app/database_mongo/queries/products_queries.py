@@ -1,4 +1,7 @@
+from datetime import datetime, timezone
+
 from bson import ObjectId
+from pymongo import UpdateOne
 from ..mongo_client import products
 from ..models.products_model import create_product_model
 
@@ -13,17 +16,90 @@ def get_product_by_blockchain_id(blockchain_id):
     return products.find_one({"blockchainProductId": blockchain_id})
 
 # aggiungi il prodotto appena creato nella Blockchain
-def create_product(blockchain_product_id, created_by):
-    product_data = create_product_model(blockchain_product_id, created_by)
+def create_product(blockchain_product_id, created_by, manufacturer=None):
+    product_data = create_product_model(blockchain_product_id, created_by, manufacturer)
     if products.find_one({"blockchainProductId": product_data["blockchainProductId"]}):
         raise ValueError("Product with this id already exists")
     result = products.insert_one(product_data)
     return result.inserted_id
 
+# registra il prodotto dopo l'upload confermato dal ledger; il documento può esistere già
+# (creato da set_product_owner a una lettura dal ledger, o da un tentativo precedente)
+def save_uploaded_product(blockchain_product_id, created_by, manufacturer=None):
+    product_data = create_product_model(blockchain_product_id, created_by, manufacturer)
+    products.update_one({"blockchainProductId": blockchain_product_id}, {"$set": product_data}, upsert=True)
+
 def update_product_by_blockchain_id(blockchain_id, update_data):
     result = products.update_one(
         {"blockchainProductId": blockchain_id},
         {"$set": update_data}
     )
     # ritorna True se il prodotto è stato aggiornato, altrimenti False
-    return result.modified_count > 0
\ No newline at end of file
+    return result.modified_count > 0
+
+# manufacturer del prodotto secondo l'indice locale di proprietà (None se non ancora noto)
+def get_product_owner(blockchain_id):
+    product = products.find_one({"blockchainProductId": blockchain_id}, {"manufacturer": 1, "_id": 0})
+    return product.get("manufacturer") if product else None
+
+# registra nell'indice il manufacturer letto dal ledger; crea il documento per i prodotti caricati fuori dal backend
+def set_product_owner(blockchain_id, manufacturer):
+    result = products.update_one(
+        {"blockchainProductId": blockchain_id},
+        {"$set": {"manufacturer": manufacturer, "ownerCheckedAt": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return result.upserted_id is not None or result.modified_count > 0
+
+# segna il prodotto come controllato anche se il ledger non ha risposto (evita di riprovarlo subito)
+def touch_product_owner_check(blockchain_id):
+    products.update_one({"blockchainProductId": blockchain_id},
+                        {"$set": {"ownerCheckedAt": datetime.now(timezone.utc)}})
+
+# prodotti da riconciliare col ledger: mai controllati per primi, poi i controlli più vecchi
+def get_products_to_reconcile(checked_before, limit):
+    cursor = products.find(
+        {"$or": [{"ownerCheckedAt": {"$exists": False}}, {"ownerCheckedAt": {"$lt": checked_before}}]},
+        {"blockchainProductId": 1, "manufacturer": 1, "_id": 0}
+    ).sort("ownerCheckedAt", 1).limit(limit)
+    return list(cursor)
+
+# blockchainProductId già presenti in locale tra quelli indicati (una sola query per un gruppo di ID)
+def get_existing_product_ids(blockchain_ids):
+    cursor = products.find({"blockchainProductId": {"$in": list(blockchain_ids)}}, {"blockchainProductId": 1, "_id": 0})
+    return {product["blockchainProductId"] for product in cursor}
+
+# ID dei prodotti di un manufacturer (indice di proprietà o, per i documenti non ancora indicizzati, autore
+# dell'upload), letti a batch dal cursore
+def iter_product_ids_by_owner(manufacturer, created_by, batch_size=500):
+    if isinstance(created_by, str):
+        created_by = ObjectId(created_by)
+    cursor = products.find(
+        {"$or": [{"manufacturer": manufacturer}, {"createdBy": created_by}]},
+        {"blockchainProductId": 1, "_id": 0},
+        batch_size=batch_size
+    )
+    for product in cursor:
+        yield product["blockchainProductId"]
+
+# manufacturer registrato in locale per i prodotti indicati (una sola query per un gruppo di ID)
+def get_product_owners(blockchain_ids):
+    cursor = products.find({"blockchainProductId": {"$in": list(blockchain_ids)}},
+                           {"blockchainProductId": 1, "manufacturer": 1, "_id": 0})
+    return {product["blockchainProductId"]: product.get("manufacturer") for product in cursor}
+
+# registra con una sola bulk write il manufacturer di più prodotti: [(blockchainProductId, manufacturer, createdBy)].
+# createdBy vale solo per i documenti mancanti (prodotti caricati sul ledger ma non salvati in locale)
+def set_product_owners(owners):
+    if not owners:
+        return
+    now = datetime.now(timezone.utc)
+    products.bulk_write([
+        UpdateOne(
+            {"blockchainProductId": blockchain_id},
+            {"$set": {"manufacturer": manufacturer, "ownerCheckedAt": now},
+             "$setOnInsert": {"createdBy": ObjectId(created_by) if created_by else None}},
+            upsert=True
+        )
+        for blockchain_id, manufacturer, created_by in owners
+    ], ordered=False)
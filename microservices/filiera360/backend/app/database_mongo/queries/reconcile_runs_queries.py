@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from ..mongo_client import ledger_reconcile_runs
+
+def get_reconcile_run(run_id):
+    return ledger_reconcile_runs.find_one({"_id": run_id})
+
+# prende in carico la riconciliazione (creandola se nuova); None se un altro worker ha un lease valido
+def claim_reconcile_run(run_doc, owner, lease_until):
+    now = datetime.now(timezone.utc)
+    claimable = {k: v for k, v in run_doc.items() if k not in ("_id", "owner", "leaseUntil", "updatedAt")}
+    try:
+        return ledger_reconcile_runs.find_one_and_update(
+            {"_id": run_doc["_id"], "$or": [{"owner": owner}, {"leaseUntil": None}, {"leaseUntil": {"$lt": now}}]},
+            {
+                "$set": {"owner": owner, "leaseUntil": lease_until, "updatedAt": now},
+                "$setOnInsert": claimable
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None
+
+# salva il punto di ripresa e rinnova il lease; False se il lease è passato a un altro worker
+def save_reconcile_checkpoint(run_id, owner, fields, inc, lease_until):
+    update = {"$set": {**fields, "leaseUntil": lease_until, "updatedAt": datetime.now(timezone.utc)}}
+    if inc:
+        update["$inc"] = inc
+    result = ledger_reconcile_runs.update_one({"_id": run_id, "owner": owner}, update)
+    return result.matched_count > 0
+
+def release_reconcile_run(run_id, owner):
+    ledger_reconcile_runs.update_one({"_id": run_id, "owner": owner},
+                                     {"$set": {"owner": None, "leaseUntil": None, "updatedAt": datetime.now(timezone.utc)}})
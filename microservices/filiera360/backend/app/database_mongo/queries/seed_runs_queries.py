@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from ..mongo_client import ledger_seed_runs
+
+SEED_RUN_MAX_ERRORS = 100
+
+def get_seed_run(run_id):
+    return ledger_seed_runs.find_one({"_id": run_id})
+
+# prende in carico il run (creandolo se nuovo); None se è già in esecuzione con un lease valido
+def claim_seed_run(run_doc, lease_until):
+    now = datetime.now(timezone.utc)
+    claimable = {k: v for k, v in run_doc.items() if k not in ("_id", "status", "leaseUntil", "updatedAt", "finishedAt")}
+    try:
+        return ledger_seed_runs.find_one_and_update(
+            {"_id": run_doc["_id"], "$or": [{"status": {"$ne": "running"}}, {"leaseUntil": {"$lt": now}}]},
+            {
+                "$set": {"status": "running", "leaseUntil": lease_until, "updatedAt": now, "finishedAt": None},
+                "$setOnInsert": claimable
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None
+
+# salva il punto di ripresa, i contatori e rinnova il lease
+def save_seed_checkpoint(run_id, processed, counters, new_errors, lease_until):
+    ledger_seed_runs.update_one(
+        {"_id": run_id},
+        {
+            "$set": {"processed": processed, **counters, "leaseUntil": lease_until,
+                     "updatedAt": datetime.now(timezone.utc)},
+            "$push": {"errors": {"$each": new_errors, "$slice": -SEED_RUN_MAX_ERRORS}}
+        }
+    )
+
+def finish_seed_run(run_id, status):
+    now = datetime.now(timezone.utc)
+    ledger_seed_runs.update_one(
+        {"_id": run_id},
+        {"$set": {"status": status, "leaseUntil": None, "updatedAt": now,
+                  "finishedAt": now if status == "completed" else None}}
+    )
+
+# elimina il checkpoint per ripartire da zero (non se il run è in esecuzione)
+def reset_seed_run(run_id):
+    now = datetime.now(timezone.utc)
+    ledger_seed_runs.delete_one(
+        {"_id": run_id, "$or": [{"status": {"$ne": "running"}}, {"leaseUntil": {"$lt": now}}]}
+    )
@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from ..mongo_client import write_jobs
+
+def create_write_job(job_doc):
+    write_jobs.insert_one(job_doc)
+    return job_doc["_id"]
+
+def get_write_job(job_id, projection=None):
+    return write_jobs.find_one({"_id": job_id}, projection)
+
+# passa il job da queued a running: un solo worker (anche tra processi diversi) lo esegue
+def claim_write_job(job_id):
+    now = datetime.now(timezone.utc)
+    return write_jobs.find_one_and_update(
+        {"_id": job_id, "status": "queued"},
+        {"$set": {"status": "running", "updatedAt": now}, "$inc": {"attempts": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+def requeue_write_job(job_id, error):
+    write_jobs.update_one(
+        {"_id": job_id, "status": "running"},
+        {"$set": {"status": "queued", "error": error, "updatedAt": datetime.now(timezone.utc)}}
+    )
+
+def finish_write_job(job_id, status, result, error=None):
+    now = datetime.now(timezone.utc)
+    write_jobs.update_one(
+        {"_id": job_id},
+        {"$set": {"status": status, "result": result, "error": error, "updatedAt": now, "finishedAt": now}}
+    )
+
+# job in coda da prima di queued_before (il processo che li ha creati potrebbe non esistere più)
+def get_pending_write_job_ids(queued_before, limit):
+    jobs = write_jobs.find({"status": "queued", "updatedAt": {"$lt": queued_before}}, {"_id": 1}, limit=limit)
+    return [job["_id"] for job in jobs]
+
+# job rimasti running senza aggiornamenti: il worker è terminato durante la scrittura.
+# Tornano in coda solo se hanno ancora tentativi, altrimenti vengono chiusi come falliti
+def requeue_stale_write_jobs(running_before):
+    now = datetime.now(timezone.utc)
+    stale = {"status": "running", "updatedAt": {"$lt": running_before}}
+    requeued = write_jobs.update_many(
+        {**stale, "$expr": {"$lt": ["$attempts", "$maxAttempts"]}},
+        {"$set": {"status": "queued", "error": "Worker interrupted.", "updatedAt": now}}
+    )
+    write_jobs.update_many(
+        stale,
+        {"$set": {"status": "failed", "error": "Worker interrupted.", "updatedAt": now, "finishedAt": now,
+                  "result": {"status": 502, "body": {"message": "Worker interrupted."}}}}
+    )
+    return requeued.modified_count
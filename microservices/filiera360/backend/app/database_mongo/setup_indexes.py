@@ -1,21 +1,94 @@
-from mongo_client import users, users_otp, liked_products, models, invite_tokens, product_history, products, recently_searched
+import os
+from mongo_client import users, users_otp, liked_products, models, invite_tokens, product_history, products, recently_searched, \
+    product_state, product_history_buckets, product_checkpoints, model_uploads, \
+    write_jobs, operators, import_jobs, import_rows, product_view, product_activity, product_popularity, \
+    product_cooccurrence
+
+# Per quanto tempo restano consultabili i job di scrittura conclusi
+WRITE_JOB_RETENTION_SECONDS = int(os.getenv("WRITE_JOB_RETENTION_DAYS", 7)) * 24 * 3600
+# Ore di attività (like e ricerche) considerate per i prodotti di tendenza
+TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", 72))
+# Per quanto tempo restano consultabili i job di import e le loro righe
+IMPORT_JOB_RETENTION_SECONDS = int(os.getenv("IMPORT_JOB_RETENTION_DAYS", 7)) * 24 * 3600
 
 def setup_indexes():
     # Indice unico su email per gli utenti
     users.create_index([("email", 1)], unique=True)
+    # Gli operatori sono nella collection operators (migrate_operators)
+    if "operators.email_1" in users.index_information():
+        users.drop_index("operators.email_1")
+    # Indice unico sull'associazione produttore-operatore, usato anche per la lista paginata per email
+    operators.create_index([("producerId", 1), ("email", 1)], unique=True)
+    # Indice per risalire dal singolo operatore al produttore
+    operators.create_index([("email", 1), ("_id", 1)])
     # Indice TTL su expiresAt per gli OTP (scadenza automatica)
     users_otp.create_index([("expiresAt", 1)], expireAfterSeconds=0)
     # Indice unico su blockchainProductId per i prodotti
     products.create_index([("blockchainProductId", 1)], unique=True)
+    # Indice per la riconciliazione dell'indice di proprietà con il ledger
+    products.create_index([("ownerCheckedAt", 1)])
+    # Indici per l'export dei prodotti di un manufacturer
+    products.create_index([("manufacturer", 1)])
+    products.create_index([("createdBy", 1)])
     # Indice unico su token per gli inviti
     invite_tokens.create_index([("token", 1)], unique=True)
-    # Indice unico sulla stringa del modello3D per i modelli
-    models.create_index([("modelString", 1)], unique=True)
+    # Indice sull'hash del contenuto del modello 3D: più prodotti possono condividere lo stesso file
+    model_indexes = models.index_information()
+    if "modelString_1" in model_indexes:
+        models.drop_index("modelString_1")
+    if model_indexes.get("contentHash_1", {}).get("unique"):
+        models.drop_index("contentHash_1")
+    models.create_index([("contentHash", 1)])
+    # Indice per il catalogo dei modelli di un utente (dal più recente)
+    models.create_index([("uploadedBy", 1), ("_id", -1)])
+    # Indice unico su blockchainProductId: un modello per prodotto
+    models.create_index([("blockchainProductId", 1)], unique=True,
+                        partialFilterExpression={"blockchainProductId": {"$exists": True}})
+    # Indice sulla scadenza delle sessioni di upload a parti (pulizia delle sessioni abbandonate)
+    model_uploads.create_index([("expiresAt", 1)])
     # Indice unico sulla coppia userId e blockchainProductId (un like a prodotto per utente))
     liked_products.create_index([("userId", 1), ("blockchainProductId", 1)], unique=True)
+    # Indice per i like di un prodotto (contatore iniziale di product_popularity)
+    liked_products.create_index([("blockchainProductId", 1)])
+    # Indice per gli ultimi like di un utente (aggiornamento dei prodotti piaciuti insieme)
+    liked_products.create_index([("userId", 1), ("likedAt", -1)])
+    # Indice per i like di un utente le cui coppie includono un prodotto (decremento all'unlike)
+    liked_products.create_index([("userId", 1), ("cooccurringWith", 1)])
+    # Indici dei prodotti piaciuti insieme: unicità della coppia e vicini più frequenti di un prodotto
+    product_cooccurrence.create_index([("productId", 1), ("otherId", 1)], unique=True)
+    product_cooccurrence.create_index([("productId", 1), ("count", -1), ("otherId", 1)])
     # Indice sulla cronologia dei prodotti per velocizzare le ricerche
     product_history.create_index([("blockchainProductId", 1), ("timestamp", 1)])
+    # Indici dei bucket di cronologia: lettura per prodotto, bucket aperto, ricerca per utente/entry
+    product_history_buckets.create_index([("blockchainProductId", 1), ("end", 1)])
+    product_history_buckets.create_index([("blockchainProductId", 1), ("archived", 1), ("count", 1)])
+    product_history_buckets.create_index([("modifiedBy", 1)])
+    product_history_buckets.create_index([("entries._id", 1)])
     # Indice unico su userId per le ricerche recenti
     recently_searched.create_index([("userId", 1)], unique=True)
+    # Indice unico su blockchainProductId per lo snapshot dello stato corrente
+    product_state.create_index([("blockchainProductId", 1)], unique=True)
+    # Indici dei checkpoint: ricerca del più recente prima di una data, unicità per versione
+    product_checkpoints.create_index([("blockchainProductId", 1), ("timestamp", -1)])
+    product_checkpoints.create_index([("blockchainProductId", 1), ("version", 1)], unique=True)
+    # Indice della vista locale dei prodotti per manufacturer
+    product_view.create_index([("manufacturer", 1)])
+    # Indici della ricerca full-text dei prodotti: prefissi e trigrammi delle parole
+    product_view.create_index([("search.prefixes", 1)])
+    product_view.create_index([("search.grams", 1)])
+    # Contatori orari di attività: uno per prodotto e ora, scaduti dopo la finestra dei prodotti di tendenza
+    product_activity.create_index([("productId", 1), ("hour", 1)], unique=True)
+    product_activity.create_index([("hour", 1)], expireAfterSeconds=(TRENDING_WINDOW_HOURS + 1) * 3600)
+    # Indice per i prodotti con più like
+    product_popularity.create_index([("likes", -1), ("_id", 1)])
+    # Indici dei job di scrittura asincrona: recupero dei job in coda, scadenza dei job conclusi
+    write_jobs.create_index([("status", 1), ("updatedAt", 1)])
+    write_jobs.create_index([("finishedAt", 1)], expireAfterSeconds=WRITE_JOB_RETENTION_SECONDS)
+    # Indici degli import di prodotti: righe per job (tutte o per stato), scadenza di job e righe
+    import_rows.create_index([("jobId", 1), ("row", 1)], unique=True)
+    import_rows.create_index([("jobId", 1), ("status", 1), ("row", 1)])
+    import_rows.create_index([("createdAt", 1)], expireAfterSeconds=IMPORT_JOB_RETENTION_SECONDS)
+    import_jobs.create_index([("finishedAt", 1)], expireAfterSeconds=IMPORT_JOB_RETENTION_SECONDS)
+    import_jobs.create_index([("status", 1)])
 
     print("Indexes set up successfully.")
\ No newline at end of file
@@ -1,3 +1,8 @@
+import os
 from concurrent.futures import ThreadPoolExecutor
 
 executor = ThreadPoolExecutor(max_workers=5)
+
+# Pool dedicato alle scritture asincrone sul ledger (endorsement e commit Fabric possono durare secondi)
+LEDGER_WRITE_WORKERS = int(os.getenv("LEDGER_WRITE_WORKERS", 4))
+ledger_executor = ThreadPoolExecutor(max_workers=LEDGER_WRITE_WORKERS, thread_name_prefix="ledger-write")
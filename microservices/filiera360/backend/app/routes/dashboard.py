@@ -0,0 +1,9 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from ..controller.dashboard_controller import get_dashboard_controller
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+# like, ricerche recenti, operatori e modelli dell'utente in una sola richiesta (prima schermata dopo il login)
+dashboard_bp.route('/dashboard', methods=['GET'])(jwt_required()(get_dashboard_controller))
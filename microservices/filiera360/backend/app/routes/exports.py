@@ -0,0 +1,9 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from ..controller.export_controller import export_products_controller
+
+exports_bp = Blueprint('exports', __name__)
+
+# dump NDJSON in streaming dei prodotti del manufacturer (?history=false per escludere la cronologia)
+exports_bp.route('/exports/products', methods=['GET'])(jwt_required()(export_products_controller))
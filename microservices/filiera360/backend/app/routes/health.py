@@ -0,0 +1,8 @@
+from flask import Blueprint
+
+from ..controller.health_controller import healthz_controller
+
+health_bp = Blueprint('health', __name__)
+
+# usata dalle readiness probe di Kubernetes
+health_bp.route('/healthz', methods=['GET'])(healthz_controller)
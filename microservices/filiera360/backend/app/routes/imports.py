@@ -0,0 +1,12 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from ..controller.import_controller import start_product_import_controller, get_product_import_controller, \
+    get_product_import_rows_controller
+
+imports_bp = Blueprint('imports', __name__)
+
+# import di prodotti da CSV/NDJSON: job in background, stato ed esito per riga consultabili durante l'esecuzione
+imports_bp.route('/imports/products', methods=['POST'])(jwt_required()(start_product_import_controller))
+imports_bp.route('/imports/<job_id>', methods=['GET'])(jwt_required()(get_product_import_controller))
+imports_bp.route('/imports/<job_id>/rows', methods=['GET'])(jwt_required()(get_product_import_rows_controller))
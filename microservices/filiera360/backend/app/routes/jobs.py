@@ -0,0 +1,10 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from ..controller.jobs_controller import get_job_controller, job_events_controller
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# stato delle scritture asincrone sul ledger (?async=true / Prefer: respond-async)
+jobs_bp.route('/jobs/<job_id>', methods=['GET'])(jwt_required()(get_job_controller))
+jobs_bp.route('/jobs/<job_id>/events', methods=['GET'])(jwt_required()(job_events_controller))
@@ -0,0 +1,11 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from ..controller.metrics_controller import mongo_metrics_controller, reset_mongo_metrics_controller
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# latenze, documenti e byte restituiti per ogni query helper di database_mongo/queries
+metrics_bp.route('/metrics/mongo', methods=['GET'])(mongo_metrics_controller)
+# azzera i contatori del processo: solo POST autenticato, per evitare reset da crawler o prefetch
+metrics_bp.route('/metrics/mongo/reset', methods=['POST'])(jwt_required()(reset_mongo_metrics_controller))
@@ -1,8 +1,28 @@
 from flask import Blueprint
+from flask_jwt_extended import jwt_required
 
-from ..controller.model_controller import upload_model_controller, get_model_controller
+from ..controller.model_controller import upload_model_controller, get_model_controller, \
+    download_model_controller, init_model_upload_controller, upload_model_part_controller, \
+    get_model_upload_controller, complete_model_upload_controller, abort_model_upload_controller, \
+    get_model_catalogue_controller, download_model_thumbnail_controller, get_model_info_controller
 
 model_bp = Blueprint('model', __name__)
 
 model_bp.route('/uploadModel', methods=['POST'])(upload_model_controller)
-model_bp.route('/getModel', methods=['GET'])(get_model_controller)
\ No newline at end of file
+model_bp.route('/getModel', methods=['GET'])(get_model_controller)
+model_bp.route('/models/<product_id>.glb', methods=['GET', 'HEAD'])(download_model_controller)
+# metadati con l'URL del GLB indirizzato dall'hash (cacheabile come immutable)
+model_bp.route('/models/<product_id>/info', methods=['GET'])(get_model_info_controller)
+
+# Catalogo dei modelli (solo metadati) e anteprime
+model_bp.route('/models', methods=['GET'])(jwt_required()(get_model_catalogue_controller))
+model_bp.route('/models/thumbnails/<content_hash>.jpg', methods=['GET'])(download_model_thumbnail_controller)
+
+# Upload a parti riprendibile
+model_bp.route('/uploadModel/init', methods=['POST'])(jwt_required()(init_model_upload_controller))
+model_bp.route('/uploadModel/<upload_id>', methods=['GET'])(jwt_required()(get_model_upload_controller))
+model_bp.route('/uploadModel/<upload_id>', methods=['DELETE'])(jwt_required()(abort_model_upload_controller))
+model_bp.route('/uploadModel/<upload_id>/parts/<int:part_number>', methods=['PUT'])(
+    jwt_required()(upload_model_part_controller))
+model_bp.route('/uploadModel/<upload_id>/complete', methods=['POST'])(
+    jwt_required()(complete_model_upload_controller))
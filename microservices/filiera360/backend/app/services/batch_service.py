@@ -1,8 +1,11 @@
 import requests
 
 from ..utils.http_client import http_get, http_post
+from ..utils.blockchain_utils import is_indexed_owner, read_ledger_manufacturer
+from ..utils.operator_cache import get_producer_for_operator
 from ..utils.permissions_utils import required_permissions
-from ..database_mongo.queries.users_queries import get_user_by_email, find_producer_by_operator
+from ..database_mongo.queries.users_queries import get_user_by_email
+from .write_jobs_service import LEDGER_WRITE_TIMEOUT, enqueue_write_job, register_write_handler
 import os
 MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
 
@@ -35,11 +38,11 @@ def get_batch_history_service(batch_id):
         return {'message': 'Failed to get batch history.'}, 500
 
 
-def _process_batch(user_email, batch_data, endpoint, success_message="Batch processed successfully!"):
+def _process_batch(user_email, batch_data, kind, async_write=False):
     """
     Funzione generica per upload o update batch.
-    endpoint: URL del middleware
-    success_message: messaggio in caso di successo
+    kind: tipo di scrittura (WRITE_UPLOAD_BATCH / WRITE_UPDATE_BATCH), determina endpoint e messaggio
+    async_write: accoda la scrittura e risponde 202 con l'id del job
     """
     user = get_user_by_email(user_email)
 
@@ -67,34 +70,52 @@ def _process_batch(user_email, batch_data, endpoint, success_message="Batch proc
     # Assicura che CustomObject esista
     batch_data["CustomObject"] = batch_data.get("CustomObject", {})
 
-    # Chiamata al middleware
+    if async_write:
+        return enqueue_write_job(kind, batch_data, user)
+
     try:
-        response = http_post(endpoint, json=batch_data)
+        return _BATCH_WRITES[kind](batch_data, user)
+    except requests.RequestException as e:
+        print(f"Error calling middleware ({kind}): {e}")
+        return {"message": "Internal Server Error", "error": str(e)}, 500
+
+def _commit_batch(endpoint, success_message):
+    """Handler di scrittura sul middleware per un batch già validato."""
+    def _commit(batch_data, user):
+        response = http_post(endpoint, json=batch_data, timeout=LEDGER_WRITE_TIMEOUT)
         resp_json = response.json()
 
         message = resp_json.get(
             'message',
             success_message if response.status_code == 200 else 'Operation failed.')
         return {"message": message}, response.status_code
-    except requests.RequestException as e:
-        print(f"Error calling middleware ({endpoint}): {e}")
-        return {"message": "Internal Server Error", "error": str(e)}, 500
-
-def upload_batch_service(user_email, batch_data):
-    return _process_batch(
-        user_email,
-        batch_data,
-        endpoint='{MIDDLEWARE_BASE_URL}/uploadBatch',
-        success_message='Batch uploaded successfully!'
-    )
-
-def update_batch_service(user_email, batch_data):
-    return _process_batch(
-        user_email,
-        batch_data,
-        endpoint='{MIDDLEWARE_BASE_URL}/api/batch/updateBatch',
-        success_message='Batch updated successfully!'
-    )
+    return _commit
+
+def _recover_batch_upload(batch_data, user):
+    """Upload ritentato rifiutato perché il batch esiste già: riuscito se il batch sul ledger è quello del payload."""
+    response = http_get(f'{MIDDLEWARE_BASE_URL}/readBatch?batchId={batch_data.get("ID")}')
+    if response.status_code != 200:
+        return None
+    batch = response.json()
+    if any(batch.get(field) != batch_data.get(field) for field in ("ID", "ProductId", "Operator", "BatchNumber")):
+        return None
+    return {"message": "Batch uploaded successfully!"}, 200
+
+WRITE_UPLOAD_BATCH = "uploadBatch"
+WRITE_UPDATE_BATCH = "updateBatch"
+_BATCH_WRITES = {
+    WRITE_UPLOAD_BATCH: _commit_batch(f'{MIDDLEWARE_BASE_URL}/uploadBatch', 'Batch uploaded successfully!'),
+    WRITE_UPDATE_BATCH: _commit_batch(f'{MIDDLEWARE_BASE_URL}/api/batch/updateBatch', 'Batch updated successfully!'),
+}
+_BATCH_DUPLICATE_RECOVERY = {WRITE_UPLOAD_BATCH: _recover_batch_upload}
+for _kind, _handler in _BATCH_WRITES.items():
+    register_write_handler(_kind, _handler, _BATCH_DUPLICATE_RECOVERY.get(_kind))
+
+def upload_batch_service(user_email, batch_data, async_write=False):
+    return _process_batch(user_email, batch_data, WRITE_UPLOAD_BATCH, async_write)
+
+def update_batch_service(user_email, batch_data, async_write=False):
+    return _process_batch(user_email, batch_data, WRITE_UPDATE_BATCH, async_write)
 
 def verify_product_authorization(user, product_id):
     """Verifica che l'utente abbia accesso al prodotto."""
@@ -103,22 +124,18 @@ def verify_product_authorization(user, product_id):
 
     # Se è un operator, trova il produttore associato
     if user.get("flags", [])[1]:  # flags[1] == operator
-        user = find_producer_by_operator(user["email"])
+        user = get_producer_for_operator(user["email"])
         if not user:
             return False, ({"message": "Operator not associated with any producer."}, 403)
 
-    # Chiamata al middleware
-    try:
-        response = http_get(f"{MIDDLEWARE_BASE_URL}/readProduct?productId={product_id}")
-        if response.status_code != 200:
-            return False, ({"message": "Failed to get product from middleware."}, 500)
-
-        product = response.json()
-        if product.get("Manufacturer") != user.get("manufacturer"):
-            return False, ({"message": "Unauthorized: You do not have access to this product."}, 403)
-
+    # Indice locale di proprietà, altrimenti lettura dal ledger
+    if is_indexed_owner(product_id, user.get("manufacturer")):
         return True, None
 
-    except requests.RequestException as e:
-        print("Failed to get product:", e)
-        return False, ({"message": "Failed to get product from middleware."}, 500)
\ No newline at end of file
+    manufacturer, error = read_ledger_manufacturer(product_id)
+    if error and error[1] != 404:  # prodotto senza manufacturer: accesso negato sotto
+        return False, ({"message": "Failed to get product from middleware."}, 500)
+    if manufacturer != user.get("manufacturer"):
+        return False, ({"message": "Unauthorized: You do not have access to this product."}, 403)
+
+    return True, None
@@ -0,0 +1,57 @@
+import os
+
+from ..database_mongo.queries.dashboard_queries import get_user_dashboard
+from .model_service import MODEL_CATALOGUE_DEFAULT_LIMIT, catalogue_entry
+from .operator_service import OPERATORS_PAGE_DEFAULT_LIMIT
+
+# Like mostrati nella dashboard (dal più recente)
+DASHBOARD_LIKED_LIMIT = int(os.getenv("DASHBOARD_LIKED_LIMIT", 20))
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def get_dashboard_service(user_email):
+    """
+    Dati della prima schermata dopo il login in una sola query: like, ricerche recenti e, per i produttori,
+    la prima pagina di operatori e del catalogo dei modelli (nextCursor come in /operators e nel catalogo).
+    """
+    dashboard = get_user_dashboard(user_email, DASHBOARD_LIKED_LIMIT, OPERATORS_PAGE_DEFAULT_LIMIT,
+                                   MODEL_CATALOGUE_DEFAULT_LIMIT)
+    if not dashboard:
+        return {"message": "User not found."}, 404
+
+    is_producer = bool(dashboard.get("flags") and dashboard["flags"][0])
+    liked = [{
+        "blockchainProductId": like["blockchainProductId"],
+        "likedAt": _iso(like.get("likedAt")),
+        "name": (like.get("product") or {}).get("Name"),
+        "manufacturer": (like.get("product") or {}).get("Manufacturer")
+    } for like in dashboard["likedProducts"]]
+    recent = [{"blockchainProductId": entry["blockchainProductId"], "searchedAt": _iso(entry.get("searchedAt"))}
+              for entry in dashboard["recentlySearched"]]
+
+    result = {
+        "user": {"email": dashboard["email"], "manufacturer": dashboard.get("manufacturer"), "isProducer": is_producer},
+        "likedProducts": liked,
+        "recentlySearched": recent,
+        "operators": None,
+        "models": None
+    }
+    if is_producer:
+        operators = [{"operatorId": str(op["operatorId"]), "email": op["email"], "addedAt": _iso(op.get("addedAt"))}
+                     for op in dashboard["operators"]]
+        models = []
+        for model in dashboard["models"]:
+            model["uploaderEmail"] = dashboard["email"]
+            models.append(catalogue_entry(model))
+        result["operators"] = {
+            "operators": operators,
+            "nextCursor": operators[-1]["email"] if len(operators) == OPERATORS_PAGE_DEFAULT_LIMIT else None
+        }
+        result["models"] = {
+            "models": models,
+            "nextCursor": models[-1]["id"] if len(models) == MODEL_CATALOGUE_DEFAULT_LIMIT else None
+        }
+    return result, 200
@@ -0,0 +1,93 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from bson import ObjectId
+
+from ..database_mongo.queries.history_queries import get_history_by_blockchain_id
+from ..database_mongo.queries.products_queries import iter_product_ids_by_owner
+from ..database_mongo.queries.users_queries import get_user_by_email
+from ..utils.http_client import http_get
+from ..utils.permissions_utils import required_permissions
+
+MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
+
+# Prodotti letti in anticipo dal middleware mentre le righe precedenti vengono inviate
+EXPORT_PREFETCH_WINDOW = int(os.getenv("EXPORT_PREFETCH_WINDOW", 16))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 8))
+# Documenti letti da MongoDB per ogni batch del cursore
+EXPORT_CURSOR_BATCH_SIZE = int(os.getenv("EXPORT_CURSOR_BATCH_SIZE", 500))
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _ndjson(record):
+    return json.dumps(record, default=_json_default) + "\n"
+
+
+def _export_product(product_id, include_history):
+    """Riga NDJSON di un prodotto: corpo dal ledger ed eventualmente la cronologia locale."""
+    record = {"type": "product", "id": product_id}
+    try:
+        response = http_get(f'{MIDDLEWARE_BASE_URL}/readProduct?productId={product_id}')
+        if response.status_code == 200:
+            record["product"] = response.json()
+        else:
+            record["error"] = f"Failed to fetch product, status {response.status_code}"
+    except requests.exceptions.RequestException as e:
+        record["error"] = str(e)
+    if include_history:
+        record["history"] = get_history_by_blockchain_id(product_id)
+    return record
+
+
+def _export_lines(user, include_history):
+    """
+    Generatore delle righe dell'export. Gli ID arrivano dal cursore a batch; al più EXPORT_PREFETCH_WINDOW
+    prodotti sono in lettura contemporaneamente e le righe escono nell'ordine del cursore,
+    quindi la memoria usata non dipende dal numero di prodotti.
+    """
+    manufacturer = user.get("manufacturer")
+    yield _ndjson({"type": "export", "manufacturer": manufacturer,
+                   "generatedAt": datetime.now(timezone.utc), "history": include_history})
+
+    exported, failed = 0, 0
+    pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="product-export")
+    window = deque()
+    try:
+        for product_id in iter_product_ids_by_owner(manufacturer, user["_id"], EXPORT_CURSOR_BATCH_SIZE):
+            window.append(pool.submit(_export_product, product_id, include_history))
+            if len(window) >= EXPORT_PREFETCH_WINDOW:
+                record = window.popleft().result()
+                exported, failed = exported + 1, failed + ("error" in record)
+                yield _ndjson(record)
+        while window:
+            record = window.popleft().result()
+            exported, failed = exported + 1, failed + ("error" in record)
+            yield _ndjson(record)
+        yield _ndjson({"type": "summary", "products": exported, "errors": failed})
+    finally:
+        # client disconnesso: le letture non ancora iniziate vengono annullate
+        # (shutdown(cancel_futures=...) non esiste in Python 3.8)
+        for future in window:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+
+def export_products_service(user_email, include_history=True):
+    """Export NDJSON di prodotti e cronologia del manufacturer: generatore con status 200, o (errore, status)."""
+    user = get_user_by_email(user_email)
+    if not required_permissions(user, ['producer']):
+        return {"message": "Unauthorized: Insufficient permissions."}, 403
+    if not user.get("manufacturer"):
+        return {"message": "User manufacturer not found."}, 400
+    return _export_lines(user, include_history), 200
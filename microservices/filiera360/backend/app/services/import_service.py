@@ -0,0 +1,344 @@
+import csv
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import requests
+
+from ..database_mongo.models.import_job_model import create_import_job_model, create_import_row_model
+from ..database_mongo.queries.import_jobs_queries import create_import_job, fail_import_jobs, get_import_job, \
+    get_import_rows, get_unfinished_import_jobs, insert_import_rows, set_import_row_results, update_import_job
+from ..database_mongo.queries.products_queries import get_existing_product_ids
+from ..database_mongo.queries.users_queries import get_user_by_email
+from ..utils.permissions_utils import required_permissions
+from .products_service import commit_product_upload
+
+# Upload contemporanei verso il middleware per ciascun job
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 4))
+# Job di import eseguiti contemporaneamente dal processo (gli altri restano in coda)
+IMPORT_MAX_CONCURRENT_JOBS = int(os.getenv("IMPORT_MAX_CONCURRENT_JOBS", 2))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", 100000))
+# Righe lette dal file per ogni inserimento in import_rows e controllo degli ID già presenti
+IMPORT_WINDOW = int(os.getenv("IMPORT_WINDOW", 200))
+IMPORT_ROWS_PAGE_MAX_LIMIT = 1000
+# Un job running che non aggiorna i contatori per questo tempo appartiene a un processo terminato
+IMPORT_JOB_STALE_SECONDS = int(os.getenv("IMPORT_JOB_STALE_SECONDS", 3600))
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+_job_runner = ThreadPoolExecutor(max_workers=IMPORT_MAX_CONCURRENT_JOBS, thread_name_prefix="product-import")
+
+
+def _cell_value(value):
+    """Celle CSV: vuote ignorate, JSON per liste/oggetti (es. Ingredients, CustomObject), altrimenti testo."""
+    value = value.strip()
+    if value[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _iter_records(file, file_format):
+    """(numero di riga, prodotto o None, errore di parsing) per ogni riga di dati del file, in streaming."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        for row, record in enumerate(csv.DictReader(text), start=1):
+            yield row, {key.strip(): _cell_value(value) for key, value in record.items()
+                        if key and value is not None and value.strip()}, None
+        return
+
+    row = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line), None
+        except ValueError as e:
+            yield row, None, f"Invalid JSON: {e}"
+
+
+def _validate_product(product, manufacturer):
+    """Messaggio di errore della riga, o None se il prodotto può essere caricato."""
+    if not isinstance(product, dict):
+        return "Row is not an object."
+    if not product.get("ID") or not isinstance(product["ID"], str):
+        return "Product ID is required."
+    # stesso controllo di upload_product_service; se assente vale il manufacturer dell'utente
+    product.setdefault("Manufacturer", manufacturer)
+    if product["Manufacturer"] != manufacturer:
+        return "Unauthorized: Manufacturer mismatch."
+    product.setdefault("SensorData", [])
+    product.setdefault("CustomObject", {})
+    return None
+
+
+def _upload_row(product, user):
+    try:
+        body, status = commit_product_upload(product, user)
+    except requests.RequestException as e:
+        return "failed", f"Error connecting to middleware: {e}"
+    if status == 200:
+        return "uploaded", None
+    message = body.get("message", "Failed to upload product.")
+    if status == 400 and "already exists" in message:
+        return "skipped", message
+    return "failed", message
+
+
+def _run_import(job_id, path, file_format, user):
+    """
+    Legge il file a finestre di IMPORT_WINDOW righe: valida, registra le righe in import_rows e invia
+    le valide a un pool di IMPORT_WORKERS upload. Il contesto di autorizzazione (user) è lo stesso per tutte.
+    """
+    update_import_job(job_id, {"status": "running"})
+    manufacturer = user.get("manufacturer")
+    seen_ids = set()
+    inflight = {}  # future -> numero di riga
+    results = []
+
+    def _flush_results():
+        if not results:
+            return
+        counts = {}
+        for _, status, _ in results:
+            counts[status] = counts.get(status, 0) + 1
+        set_import_row_results(job_id, results)
+        update_import_job(job_id, inc=counts)
+        results.clear()
+
+    def _collect(block):
+        if block:
+            finished, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+        else:
+            finished = [future for future in inflight if future.done()]
+        for future in finished:
+            row = inflight.pop(future)
+            status, error = future.result()
+            results.append((row, status, error))
+
+    pool = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix=f"import-{job_id[:8]}")
+    try:
+        with open(path, "rb") as file:
+            records = _iter_records(file, file_format)
+            while True:
+                window = list(islice(records, IMPORT_WINDOW))
+                if not window:
+                    break
+                if window[-1][0] > IMPORT_MAX_ROWS:
+                    raise ValueError(f"Too many rows: at most {IMPORT_MAX_ROWS} per import.")
+
+                row_docs, uploads, rejected = [], [], {}
+                ids = {product["ID"] for _, product, _ in window
+                       if isinstance(product, dict) and isinstance(product.get("ID"), str)}
+                existing = get_existing_product_ids(ids) if ids else set()
+                for row, product, error in window:
+                    error = error or _validate_product(product, manufacturer)
+                    product_id = product.get("ID") if isinstance(product, dict) else None
+                    if not error and (product_id in existing or product_id in seen_ids):
+                        status, error = "skipped", "Product already exists."
+                    else:
+                        status = "failed" if error else "queued"
+                    if status == "queued":
+                        seen_ids.add(product_id)
+                        uploads.append((row, product))
+                    else:
+                        rejected[status] = rejected.get(status, 0) + 1
+                    row_docs.append(create_import_row_model(job_id, row, product_id, status, error))
+
+                insert_import_rows(row_docs)
+                update_import_job(job_id, inc={"total": len(window), **rejected})
+
+                for row, product in uploads:
+                    # coda limitata: il file viene letto al ritmo degli upload
+                    while len(inflight) >= IMPORT_WORKERS * 2:
+                        _collect(block=True)
+                    inflight[pool.submit(_upload_row, product, user)] = row
+                _collect(block=False)
+                _flush_results()
+
+        while inflight:
+            _collect(block=True)
+            if len(results) >= IMPORT_WINDOW:
+                _flush_results()
+        _flush_results()
+        update_import_job(job_id, {"status": "completed", "finishedAt": datetime.now(timezone.utc)})
+
+    except Exception as e:
+        print(f"[import_service] Import {job_id} failed: {e}")
+        # gli upload ancora in coda vengono annullati (shutdown(cancel_futures=...) non esiste in Python 3.8)
+        for future in inflight:
+            future.cancel()
+        pool.shutdown(wait=True)
+        for future, row in inflight.items():
+            if future.done() and not future.cancelled():
+                results.append((row, *future.result()))
+            else:
+                results.append((row, "failed", "Import aborted."))
+        try:
+            _flush_results()
+        except Exception as flush_error:
+            print(f"[import_service] Cannot save row results of import {job_id}: {flush_error}")
+        update_import_job(job_id, {"status": "failed", "error": str(e), "finishedAt": datetime.now(timezone.utc)})
+    finally:
+        pool.shutdown(wait=True)
+        os.remove(path)
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _is_interrupted(job, now, started_at):
+    """
+    Job in coda o in esecuzione in un processo che non esiste più: la coda di _job_runner è in memoria,
+    quindi un riavvio (anche il --reload del server di sviluppo) perde i job e il loro file.
+    """
+    host, _, pid = (job.get("owner") or "").rpartition(":")
+    if host == socket.gethostname() and pid.isdigit():
+        if int(pid) == os.getpid():
+            # stesso pid di un processo precedente (es. container riavviato): job creati prima dell'avvio
+            return _utc(job["createdAt"]) < started_at
+        return not _process_alive(int(pid))
+    # altri host (o job senza owner): solo i job running fermi da troppo tempo
+    return job["status"] == "running" and now - _utc(job["updatedAt"]) > timedelta(seconds=IMPORT_JOB_STALE_SECONDS)
+
+
+def fail_interrupted_imports(started_at):
+    """
+    Da chiamare all'avvio del processo (started_at: istante dell'avvio): chiude come falliti
+    i job di import rimasti senza esecutore.
+    """
+    try:
+        now = datetime.now(timezone.utc)
+        interrupted = [job for job in get_unfinished_import_jobs() if _is_interrupted(job, now, started_at)]
+        failed = fail_import_jobs([job["_id"] for job in interrupted], "Import interrupted by a server restart.")
+    except Exception as e:
+        print(f"[import_service] Cannot check interrupted imports: {e}")
+        return
+    for job in interrupted:
+        # file temporaneo rimasto dal processo terminato (solo se sullo stesso host)
+        host = (job.get("owner") or "").rpartition(":")[0]
+        if host == socket.gethostname() and job.get("path") and os.path.exists(job["path"]):
+            os.remove(job["path"])
+    if failed:
+        print(f"[import_service] Marked {failed} interrupted imports as failed.")
+
+
+def _detect_format(requested, filename, content_type):
+    if requested:
+        return requested.lower()
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    return None
+
+
+def start_product_import_service(user_email, source, filename=None, content_type=None, requested_format=None):
+    """
+    Crea un job di import dal file (stream) caricato: il file viene salvato in un file temporaneo
+    e letto in background. Risposta 202 con l'id del job e l'URL di stato.
+    """
+    user = get_user_by_email(user_email)
+    if not required_permissions(user, ['producer']):
+        return {"message": "Unauthorized: Insufficient permissions."}, 403
+    if not user.get("manufacturer"):
+        return {"message": "User manufacturer not found."}, 400
+
+    file_format = _detect_format(requested_format, filename, content_type)
+    if file_format not in IMPORT_FORMATS:
+        return {"message": "Unsupported import format: use CSV or NDJSON."}, 400
+
+    with tempfile.NamedTemporaryFile(prefix="product-import-", suffix=f".{file_format}", delete=False) as spool:
+        shutil.copyfileobj(source, spool, 1024 * 1024)
+        path = spool.name
+    if os.path.getsize(path) == 0:
+        os.remove(path)
+        return {"message": "The import file is empty."}, 400
+
+    job = create_import_job_model(user["_id"], user["email"], file_format, filename, _owner(), path)
+    create_import_job(job)
+    _job_runner.submit(_run_import, job["_id"], path, file_format, user)
+
+    return {
+        "message": "Import accepted.",
+        "jobId": job["_id"],
+        "status": job["status"],
+        "statusUrl": f"/imports/{job['_id']}",
+        "rowsUrl": f"/imports/{job['_id']}/rows"
+    }, 202
+
+
+def _owned_import_job(user_email, job_id):
+    job = get_import_job(job_id)
+    # gli import di altri utenti non vengono rivelati
+    if not job or job["userEmail"] != user_email:
+        return None
+    return job
+
+
+def get_product_import_service(user_email, job_id):
+    job = _owned_import_job(user_email, job_id)
+    if not job:
+        return {"message": "Import not found."}, 404
+
+    def _iso(value):
+        return value.isoformat() if value else None
+
+    processed = job["uploaded"] + job["skipped"] + job["failed"]
+    return {
+        "jobId": job["_id"],
+        "status": job["status"],
+        "format": job["format"],
+        "filename": job["filename"],
+        "total": job["total"],
+        "processed": processed,
+        "uploaded": job["uploaded"],
+        "skipped": job["skipped"],
+        "failed": job["failed"],
+        "error": job["error"],
+        "createdAt": _iso(job["createdAt"]),
+        "updatedAt": _iso(job["updatedAt"]),
+        "finishedAt": _iso(job["finishedAt"])
+    }, 200
+
+
+def get_product_import_rows_service(user_email, job_id, status=None, after=None, limit=None):
+    """Esito per riga, paginato per numero di riga (nextCursor va passato come `after`)."""
+    if not _owned_import_job(user_email, job_id):
+        return {"message": "Import not found."}, 404
+    try:
+        limit = 100 if limit is None else int(limit)
+        after = int(after) if after else 0
+    except (TypeError, ValueError):
+        return {"message": "Invalid 'limit' or 'after' parameter."}, 400
+    limit = max(1, min(limit, IMPORT_ROWS_PAGE_MAX_LIMIT))
+
+    rows = get_import_rows(job_id, limit, after, status)
+    next_cursor = rows[-1]["row"] if len(rows) == limit else None
+    return {"rows": rows, "nextCursor": next_cursor}, 200
@@ -0,0 +1,144 @@
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import requests
+
+from ..extensions import executor, ledger_executor
+from ..utils.blockchain_utils import verify_manufacturer
+from ..utils.http_client import http_post
+from ..utils.micro_batcher import MicroBatcher
+from .product_view_service import record_movements, record_sensor_data
+from .write_jobs_service import LEDGER_WRITE_TIMEOUT
+
+MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
+
+# Numero massimo di letture in una singola richiesta bulk
+BULK_INGEST_MAX_ITEMS = int(os.getenv("BULK_INGEST_MAX_ITEMS", 1000))
+# Finestra del micro-batching: letture dello stesso prodotto raccolte in un'unica scrittura sul ledger
+INGEST_BATCH_MAX_ITEMS = int(os.getenv("INGEST_BATCH_MAX_ITEMS", 200))
+INGEST_BATCH_MAX_WAIT_MS = int(os.getenv("INGEST_BATCH_MAX_WAIT_MS", 200))
+# Attesa massima della conferma di una lettura (comprende la coda dei flush dello stesso prodotto)
+INGEST_ACK_TIMEOUT = int(os.getenv("INGEST_ACK_TIMEOUT", LEDGER_WRITE_TIMEOUT * 2))
+# Dopo un 404 dell'endpoint bulk si usano le chiamate singole per questo tempo, poi il bulk viene ritentato
+# (il 404 può essere transitorio, es. durante il redeploy del middleware)
+BULK_UNSUPPORTED_RETRY_SECONDS = int(os.getenv("BULK_UNSUPPORTED_RETRY_SECONDS", 300))
+
+SENSOR_PATH = "/api/product/sensor"
+MOVEMENT_PATH = "/api/product/movement"
+
+# endpoint bulk a cui il middleware ha risposto 404 -> istante (monotonic) fino al quale si usano
+# le chiamate per singola lettura
+_bulk_unsupported = {}
+
+
+def _post_readings(path, product_id, readings):
+    """
+    Scrive sul middleware le letture di un prodotto: una sola chiamata a <path>/bulk se disponibile,
+    altrimenti una chiamata per lettura. Restituisce (status, message) per ogni lettura.
+    """
+    bulk_path = f"{path}/bulk"
+    if _bulk_unsupported.get(bulk_path, 0) <= time.monotonic():
+        payload = {"id": product_id, "readings": [{k: v for k, v in r.items() if k != "id"} for r in readings]}
+        try:
+            response = http_post(f"{MIDDLEWARE_BASE_URL}{bulk_path}", json=payload, timeout=LEDGER_WRITE_TIMEOUT)
+        except requests.RequestException as e:
+            return [(502, f"Error connecting to middleware: {e}")] * len(readings)
+        if response.status_code == 200:
+            return [(200, "Reading recorded.")] * len(readings)
+        if response.status_code != 404:
+            return [(500, "Failed to record readings.")] * len(readings)
+        _bulk_unsupported[bulk_path] = time.monotonic() + BULK_UNSUPPORTED_RETRY_SECONDS
+
+    results = []
+    for reading in readings:
+        try:
+            response = http_post(f"{MIDDLEWARE_BASE_URL}{path}", json=reading, timeout=LEDGER_WRITE_TIMEOUT)
+            if response.status_code == 200:
+                results.append((200, "Reading recorded."))
+            else:
+                results.append((500, "Failed to record reading."))
+        except requests.RequestException as e:
+            results.append((502, f"Error connecting to middleware: {e}"))
+    return results
+
+
+# aggiornamento della vista locale del prodotto con le letture confermate
+_VIEW_RECORDERS = {SENSOR_PATH: record_sensor_data, MOVEMENT_PATH: record_movements}
+
+
+def _flush_readings(path, product_id, readings):
+    results = _post_readings(path, product_id, readings)
+    _VIEW_RECORDERS[path](product_id, [reading for reading, (status, _) in zip(readings, results) if status == 200])
+    return results
+
+
+_batch_window = INGEST_BATCH_MAX_WAIT_MS / 1000
+_sensor_batcher = MicroBatcher(lambda pid, items: _flush_readings(SENSOR_PATH, pid, items),
+                               ledger_executor, INGEST_BATCH_MAX_ITEMS, _batch_window)
+_movement_batcher = MicroBatcher(lambda pid, items: _flush_readings(MOVEMENT_PATH, pid, items),
+                                 ledger_executor, INGEST_BATCH_MAX_ITEMS, _batch_window)
+
+
+def _ack(index, status, message):
+    return {"index": index, "status": status, "message": message}
+
+
+def _ingest_bulk(readings, manufacturer, batcher):
+    """
+    Valida le letture, verifica la proprietà una sola volta per prodotto e le affida al micro-batcher.
+    Risposta con un esito per lettura: 200 se tutte registrate, 207 se solo una parte.
+    """
+    if not isinstance(readings, list) or not readings:
+        return {"body": {"message": "A non-empty array of readings is required."}, "status": 400}
+    if len(readings) > BULK_INGEST_MAX_ITEMS:
+        return {"body": {"message": f"Too many readings: at most {BULK_INGEST_MAX_ITEMS} per request."},
+                "status": 413}
+
+    results = [None] * len(readings)
+    by_product = {}
+    for index, reading in enumerate(readings):
+        product_id = reading.get("id") if isinstance(reading, dict) else None
+        if not product_id:
+            results[index] = _ack(index, 400, "Product ID is required.")
+        else:
+            by_product.setdefault(product_id, []).append(index)
+
+    # una verifica sul ledger per prodotto, in parallelo
+    product_ids = list(by_product)
+    verifications = dict(zip(product_ids, executor.map(lambda pid: verify_manufacturer(pid, manufacturer),
+                                                        product_ids)))
+
+    pending = []
+    for product_id, indexes in by_product.items():
+        error = verifications[product_id]
+        for index in indexes:
+            if error:
+                results[index] = _ack(index, error[1], error[0]["message"])
+            else:
+                pending.append((index, batcher.submit(product_id, readings[index])))
+
+    for index, future in pending:
+        try:
+            status, message = future.result(timeout=INGEST_ACK_TIMEOUT)
+        except FutureTimeoutError:
+            # la lettura resta in coda e può essere comunque registrata
+            status, message = 504, "Timed out waiting for ledger acknowledgement."
+        except Exception as e:
+            print(f"[ingestion_service] Flush error: {e}")
+            status, message = 500, "Failed to record reading."
+        results[index] = _ack(index, status, message)
+
+    accepted = sum(1 for result in results if result["status"] == 200)
+    return {
+        "body": {"accepted": accepted, "rejected": len(results) - accepted, "results": results},
+        "status": 200 if accepted == len(results) else 207
+    }
+
+
+def add_sensor_data_bulk_service(readings, manufacturer):
+    return _ingest_bulk(readings, manufacturer, _sensor_batcher)
+
+
+def add_movement_data_bulk_service(readings, manufacturer):
+    return _ingest_bulk(readings, manufacturer, _movement_batcher)
@@ -1,33 +1,208 @@
+import hashlib
 import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import requests
 
+from ..database_mongo.models.seed_run_model import create_seed_run_model
+from ..database_mongo.queries.products_queries import get_existing_product_ids, set_product_owner
+from ..database_mongo.queries.seed_runs_queries import claim_seed_run, finish_seed_run, reset_seed_run, \
+    save_seed_checkpoint
 from ..utils.http_client import http_post
-import os
+from ..utils.json_stream import iter_json_array
+from .product_view_service import record_product_upload
+from .write_jobs_service import LEDGER_WRITE_TIMEOUT
+
 MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
 
-def init_ledger_service():
-    # Leggi il file sampleData.json
+# File con l'array JSON dei prodotti da caricare
+LEDGER_SEED_FILE = os.getenv("LEDGER_SEED_FILE", "sampleData.json")
+# Upload contemporanei verso il middleware
+LEDGER_SEED_CONCURRENCY = int(os.getenv("LEDGER_SEED_CONCURRENCY", 8))
+# Prodotti letti dal file per ogni controllo (una query) degli ID già presenti
+LEDGER_SEED_WINDOW = int(os.getenv("LEDGER_SEED_WINDOW", 200))
+# Ogni quanto salvare il checkpoint su MongoDB e inviare una riga di avanzamento
+LEDGER_SEED_CHECKPOINT_SECONDS = float(os.getenv("LEDGER_SEED_CHECKPOINT_SECONDS", 5))
+# Un run senza checkpoint per questo tempo è considerato interrotto e può essere ripreso
+LEDGER_SEED_LEASE_SECONDS = int(os.getenv("LEDGER_SEED_LEASE_SECONDS", 120))
+
+
+def _lease_until():
+    return datetime.now(timezone.utc) + timedelta(seconds=LEDGER_SEED_LEASE_SECONDS)
+
+
+def _seed_run_id(path, stat):
+    source = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha256(source.encode()).hexdigest()[:32]
+
+
+def _progress_line(event, processed, counters, **extra):
+    return json.dumps({"event": event, "processed": processed, **counters, **extra}) + "\n"
+
+
+def _upload_seed_product(product):
+    """Esito dell'upload di un prodotto: ("uploaded" | "skipped" | "failed", errore)."""
     try:
-        with open('sampleData.json', 'r') as file:
-            products = json.load(file)
-    except Exception as e:
-        print("Errore nella lettura di sampleData.json:", e)
-        return {"message": "Errore nella lettura del file di dati iniziali."}, 500
+        response = http_post(f'{MIDDLEWARE_BASE_URL}/uploadProduct', json=product, timeout=LEDGER_WRITE_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"Errore nell'upload del prodotto {product.get('ID')}: {e}")
+        return "failed", str(e)
 
-    # Invio dei dati del prodotto alla rete
-    errors = []
-    for product in products:
+    if response.status_code != 200:
         try:
-            response = http_post('{MIDDLEWARE_BASE_URL}/uploadProduct', json=product)
-            if response.status_code != 200:
-                errors.append({
-                    "product_id": product.get("ID"),
-                    "error": response.json().get("message", "Unknown error")
-                })
+            message = response.json().get("message", "Unknown error")
+        except ValueError:
+            message = "Unknown error"
+        # il middleware rifiuta con 400 gli ID già presenti sul ledger
+        if response.status_code == 400 and "already exists" in message:
+            return "skipped", None
+        return "failed", message
+
+    # registrato anche in locale: alle esecuzioni successive l'ID viene saltato senza chiamare il ledger
+    if product.get("Manufacturer"):
+        try:
+            set_product_owner(product["ID"], product["Manufacturer"])
         except Exception as e:
-            print(f"Errore nell'upload del prodotto {product.get('ID')}: {e}")
-            errors.append({"product_id": product.get("ID"), "error": str(e)})
+            print(f"Errore nel salvataggio locale del prodotto {product['ID']}: {e}")
+    record_product_upload(product)
+    return "uploaded", None
+
+
+def _windows(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        window = list(islice(iterator, size))
+        if not window:
+            return
+        yield window
+
+
+def _seed_ledger(path, run):
+    """
+    Generatore di righe NDJSON di avanzamento. Legge il file in streaming, salta gli elementi già
+    conclusi nel run e gli ID già presenti, carica gli altri con al più LEDGER_SEED_CONCURRENCY upload
+    in parallelo. Il checkpoint è l'indice fino al quale tutti gli elementi sono conclusi.
+    """
+    run_id = run["_id"]
+    resume_from = run["processed"]
+    watermark = resume_from
+    counters = {key: run[key] for key in ("uploaded", "skipped", "failed")}
+    new_errors = []
+    done = set()  # indici conclusi oltre il watermark (gli upload terminano fuori ordine)
+    inflight = {}  # future -> (indice, ID prodotto)
+    last_checkpoint = time.monotonic()
+    status = "interrupted"
+    pool = ThreadPoolExecutor(max_workers=LEDGER_SEED_CONCURRENCY, thread_name_prefix="ledger-seed")
+
+    def _record(index, outcome, product_id, error):
+        nonlocal watermark
+        counters[outcome] += 1
+        if error:
+            new_errors.append({"index": index, "productId": product_id, "error": error})
+        done.add(index)
+        while watermark in done:
+            done.remove(watermark)
+            watermark += 1
+
+    def _collect(block):
+        if block:
+            # attesa limitata: il lease va rinnovato anche mentre tutti gli upload sono in corso
+            finished, _ = wait(list(inflight), timeout=LEDGER_SEED_CHECKPOINT_SECONDS, return_when=FIRST_COMPLETED)
+        else:
+            finished = [future for future in inflight if future.done()]
+        for future in finished:
+            index, product_id = inflight.pop(future)
+            outcome, error = future.result()
+            _record(index, outcome, product_id, error)
+
+    def _checkpoint():
+        nonlocal last_checkpoint
+        save_seed_checkpoint(run_id, watermark, counters, new_errors, _lease_until())
+        new_errors.clear()
+        last_checkpoint = time.monotonic()
+
+    def _checkpoint_due():
+        return time.monotonic() - last_checkpoint >= LEDGER_SEED_CHECKPOINT_SECONDS
+
+    try:
+        yield _progress_line("started", watermark, counters, resumed=resume_from > 0)
+        with open(path, "r", encoding="utf-8") as file:
+            for window in _windows(enumerate(iter_json_array(file)), LEDGER_SEED_WINDOW):
+                window = [(index, product) for index, product in window if index >= resume_from]
+                if not window:
+                    continue
+                product_ids = {product["ID"] for _, product in window
+                               if isinstance(product, dict) and product.get("ID")}
+                existing = get_existing_product_ids(product_ids) if product_ids else set()
+
+                for index, product in window:
+                    if not isinstance(product, dict) or not product.get("ID"):
+                        _record(index, "failed", None, "Missing product ID.")
+                    elif product["ID"] in existing:
+                        _record(index, "skipped", product["ID"], None)
+                    else:
+                        # coda limitata: il file non viene letto più velocemente di quanto si carica
+                        while len(inflight) >= LEDGER_SEED_CONCURRENCY * 2:
+                            _collect(block=True)
+                            if _checkpoint_due():
+                                _checkpoint()
+                                yield _progress_line("progress", watermark, counters)
+                        product.setdefault("SensorData", [])
+                        product.setdefault("CustomObject", {})
+                        inflight[pool.submit(_upload_seed_product, product)] = (index, product["ID"])
+                    _collect(block=False)
+
+                    # checkpoint (e rinnovo del lease) per prodotto: una finestra intera può durare più del lease
+                    if _checkpoint_due():
+                        _checkpoint()
+                        yield _progress_line("progress", watermark, counters)
+
+            while inflight:
+                _collect(block=True)
+                if _checkpoint_due():
+                    _checkpoint()
+                    yield _progress_line("progress", watermark, counters)
+        status = "completed"
+    except (OSError, ValueError) as e:
+        print(f"Errore nella lettura di {path}:", e)
+        yield _progress_line("error", watermark, counters, message=f"Invalid seed file: {e}")
+    finally:
+        # anche se il client chiude la connessione: gli upload in corso terminano e il checkpoint viene salvato.
+        # Gli upload ancora in coda vengono annullati (shutdown(cancel_futures=...) non esiste in Python 3.8)
+        for future in inflight:
+            future.cancel()
+        pool.shutdown(wait=True)
+        for future, (index, product_id) in list(inflight.items()):
+            if future.done() and not future.cancelled():
+                outcome, error = future.result()
+                _record(index, outcome, product_id, error)
+        _checkpoint()
+        finish_seed_run(run_id, status)
+
+    yield _progress_line(status, watermark, counters)
+
+
+def init_ledger_service(restart=False):
+    """
+    Avvia (o riprende) il caricamento di LEDGER_SEED_FILE sul ledger.
+    Restituisce il generatore dell'avanzamento NDJSON con status 200, oppure (errore, status).
+    """
+    path = LEDGER_SEED_FILE
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        print(f"Errore nella lettura di {path}:", e)
+        return {"message": "Errore nella lettura del file di dati iniziali."}, 500
 
-    if errors:
-        return {"message": "Errore durante l'inizializzazione del ledger.", "errors": errors}, 500
+    run_id = _seed_run_id(path, stat)
+    if restart:
+        reset_seed_run(run_id)
+    run = claim_seed_run(create_seed_run_model(run_id, path, stat.st_size), _lease_until())
+    if run is None:
+        return {"message": "Ledger seeding is already in progress."}, 409
 
-    return {"message": "Ledger initialized successfully with sample data."}, 200
+    return _seed_ledger(path, run), 200
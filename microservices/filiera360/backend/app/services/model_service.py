@@ -1,8 +1,30 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+
+from ..utils.blob_store import BlobNotFound, get_blob_store
 from ..utils.blockchain_utils import verify_manufacturer
+from ..utils.model_utils import DEFAULT_MODEL_CONTENT_TYPE, MODEL_UPLOAD_EXPIRE_HOURS, MODEL_UPLOAD_MAX_SIZE, \
+    MODEL_UPLOAD_PART_SIZE, commit_part_hash, decode_model_data_url, encode_model_data_url, hash_blob, \
+    load_model_bytes, model_download_url, open_part_reader, pop_upload_hash, register_uploaded_model, \
+    resolve_model_content, schedule_model_processing, store_model, upload_blob_key
 from ..utils.permissions_utils import required_permissions
-from ..database_mongo.queries.models_queries import upsert_model_for_product, get_model_by_blockchain_id
+from ..database_mongo.models.model_upload_model import create_model_upload_model
+from ..database_mongo.queries.models_queries import get_model_by_blockchain_id, get_model_catalogue, \
+    get_model_hash_by_blockchain_id
+from ..database_mongo.queries.model_contents_queries import get_model_thumbnail
+from ..database_mongo.queries.model_uploads_queries import claim_upload_session, create_upload_session, \
+    delete_upload_session, get_expired_upload_sessions, get_upload_session, record_upload_part, \
+    reopen_upload_session
 from ..database_mongo.queries.users_queries import get_user_by_email
 
+MODEL_CATALOGUE_DEFAULT_LIMIT = 50
+MODEL_CATALOGUE_MAX_LIMIT = 200
+
 def upload_model_service(user_email, product_data):
     """
     Carica un modello 3D associato a un prodotto.
@@ -13,7 +35,7 @@ def upload_model_service(user_email, product_data):
     if not required_permissions(user, ['producer']):
         return {"message": "Unauthorized: Insufficient permissions."}, 403
 
-    real_manufacturer = user["manufacturer"]
+    real_manufacturer = user.get("manufacturer")
     if not real_manufacturer:
         return {"message": "User manufacturer not found."}, 400
 
@@ -25,6 +47,11 @@ def upload_model_service(user_email, product_data):
     if not glb_file:
         return {"message": "Missing GLB file"}, 400
 
+    try:
+        content_type, model_bytes = decode_model_data_url(glb_file)
+    except ValueError:
+        return {"message": "Invalid GLB file encoding."}, 400
+
     # --- Verifica manufacturer con blockchain ---
     verification_result = verify_manufacturer(product_id, real_manufacturer)
     if verification_result:
@@ -33,9 +60,12 @@ def upload_model_service(user_email, product_data):
     # --- Upload modello ---
     try:
         print(f"Uploading 3D model for product {product_id} by manufacturer {real_manufacturer}...")
-        upsert_model_for_product(product_id, glb_file, user["_id"])
-        return {"message": "Model uploaded successfully"}, 201
+        content_hash = store_model(product_id, model_bytes, content_type, user["_id"])
+        return {"message": "Model uploaded successfully", "contentHash": content_hash,
+                "modelUrl": model_download_url(product_id, content_hash)}, 201
 
+    except DuplicateKeyError:
+        return {"message": "Another model upload for this product is in progress."}, 409
     except Exception as e:
         print(f"[upload_model_service] Error: {e}")
         return {"message": f"An error occurred: {str(e)}"}, 500
@@ -51,8 +81,331 @@ def get_model_service(product_id):
         if not model:
             return {"message": "No model found for the provided product ID."}, 404
 
-        return {"ModelBase64": model["modelString"]}, 200
+        # documenti non ancora migrati: il GLB è ancora inline
+        if "modelString" in model and not model.get("blobKey"):
+            return {"ModelBase64": model["modelString"], "ModelUrl": model_download_url(product_id)}, 200
+
+        model_bytes = load_model_bytes(resolve_model_content(model))
+        return {"ModelBase64": encode_model_data_url(model.get("contentType"), model_bytes),
+                "ModelUrl": model_download_url(product_id, model.get("contentHash"))}, 200
+
+    except BlobNotFound:
+        return {"message": "Model file not found."}, 404
 
     except Exception as e:
         print(f"ERRORE nel service get_model_service: {e}")
         return {"message": f"An error occurred: {str(e)}"}, 500
+
+
+def get_model_url(product_id):
+    """URL di download del modello del prodotto (con l'hash del contenuto se noto), None se non ha un modello."""
+    model = get_model_hash_by_blockchain_id(product_id)
+    if model is None:
+        return None
+    return model_download_url(product_id, model.get("contentHash"))
+
+
+def get_model_info_service(product_id):
+    """
+    Metadati del modello di un prodotto, senza il contenuto: il client scarica il GLB da modelUrl,
+    che include l'hash e resta nella cache del browser finché il modello non cambia.
+    """
+    try:
+        model = get_model_by_blockchain_id(product_id)
+    except Exception as e:
+        print(f"ERRORE nel service get_model_info_service: {e}")
+        return {"message": f"An error occurred: {str(e)}"}, 500
+    if not model:
+        return {"message": "No model found for the provided product ID."}, 404
+
+    # documenti non ancora migrati (GLB inline): l'hash non è salvato, l'URL viene solo rivalidato
+    content_hash = model.get("contentHash") if "modelString" not in model else None
+    return {
+        "productId": product_id,
+        "contentHash": content_hash,
+        "size": model.get("size"),
+        "contentType": model.get("contentType") or DEFAULT_MODEL_CONTENT_TYPE,
+        "modelUrl": model_download_url(product_id, content_hash)
+    }, 200
+
+
+def get_model_file_service(product_id):
+    """
+    Metadati per il download binario del modello: documento, dimensione, hash (usato come ETag),
+    content type e varianti precompresse. I byte vengono letti in streaming dal controller.
+    """
+    try:
+        model = get_model_by_blockchain_id(product_id)
+        if not model:
+            return {"message": "No model found for the provided product ID."}, 404
+
+        model = resolve_model_content(model)
+        if model.get("blobKey"):
+            size = model["size"]
+            content_hash = model["contentHash"]
+        else:
+            # documenti non ancora migrati: hash e dimensione si ricavano dal GLB inline
+            model_bytes = load_model_bytes(model)
+            size = len(model_bytes)
+            content_hash = hashlib.sha256(model_bytes).hexdigest()
+
+        return {
+            "model": model,
+            "size": size,
+            "contentHash": content_hash,
+            "contentType": model.get("contentType") or DEFAULT_MODEL_CONTENT_TYPE,
+            "variants": model.get("variants", {}),
+        }, 200
+
+    except BlobNotFound:
+        return {"message": "Model file not found."}, 404
+
+    except Exception as e:
+        print(f"ERRORE nel service get_model_file_service: {e}")
+        return {"message": f"An error occurred: {str(e)}"}, 500
+
+
+def catalogue_entry(model):
+    content = model.get("content") or {}
+    content_hash = model.get("contentHash")
+    if content and "thumbnail" not in content:
+        # contenuto caricato prima delle anteprime: viene generata ora, in background
+        schedule_model_processing(content_hash)
+    return {
+        "id": str(model["_id"]),
+        "productId": model["blockchainProductId"],
+        "contentHash": content_hash,
+        "size": model.get("size"),
+        "contentType": model.get("contentType") or DEFAULT_MODEL_CONTENT_TYPE,
+        "uploadedAt": model["uploadedAt"].isoformat() if model.get("uploadedAt") else None,
+        "uploadedBy": str(model["uploadedBy"]),
+        "uploaderEmail": model.get("uploaderEmail"),
+        "modelUrl": model_download_url(model["blockchainProductId"], content_hash),
+        "thumbnailUrl": f"/models/thumbnails/{content_hash}.jpg" if content.get("thumbnail") else None
+    }
+
+
+def get_model_catalogue_service(user_email, limit=None, before=None):
+    """
+    Catalogo dei modelli caricati dall'utente: solo metadati e URL dell'anteprima, mai il GLB.
+    Paginato dal più recente; nextCursor va passato come `before` per la pagina successiva.
+    """
+    user = get_user_by_email(user_email)
+    if not required_permissions(user, ['producer']):
+        return {"message": "Unauthorized: Insufficient permissions."}, 403
+
+    try:
+        limit = MODEL_CATALOGUE_DEFAULT_LIMIT if limit is None else int(limit)
+        before_id = ObjectId(before) if before else None
+    except (ValueError, TypeError, InvalidId):
+        return {"message": "Invalid 'limit' or 'before' parameter."}, 400
+    limit = max(1, min(limit, MODEL_CATALOGUE_MAX_LIMIT))
+
+    try:
+        catalogue = get_model_catalogue(user["_id"], limit, before_id)
+        entries = [catalogue_entry(model) for model in catalogue]
+        next_cursor = entries[-1]["id"] if len(entries) == limit else None
+        return {"models": entries, "nextCursor": next_cursor}, 200
+
+    except Exception as e:
+        print(f"ERRORE nel service get_model_catalogue_service: {e}")
+        return {"message": f"An error occurred: {str(e)}"}, 500
+
+
+def get_model_thumbnail_service(content_hash):
+    try:
+        thumbnail = get_model_thumbnail(content_hash)
+        if not thumbnail:
+            return {"message": "Thumbnail not found."}, 404
+        return thumbnail, 200
+
+    except Exception as e:
+        print(f"ERRORE nel service get_model_thumbnail_service: {e}")
+        return {"message": f"An error occurred: {str(e)}"}, 500
+
+
+# --- Upload a parti (init, parti, complete) ---
+
+def _upload_expiry():
+    return datetime.now(timezone.utc) + timedelta(hours=MODEL_UPLOAD_EXPIRE_HOURS)
+
+
+def _upload_status(session):
+    received = sorted(int(part_number) for part_number in session["parts"])
+    return {
+        "uploadId": session["_id"],
+        "productId": session["blockchainProductId"],
+        "size": session["size"],
+        "partSize": session["partSize"],
+        "totalParts": session["totalParts"],
+        "receivedParts": received,
+        "missingParts": [n for n in range(1, session["totalParts"] + 1) if n not in set(received)],
+        "status": session["status"],
+        "expiresAt": session["expiresAt"].isoformat()
+    }
+
+
+def _expected_part_size(session, part_number):
+    if part_number < session["totalParts"]:
+        return session["partSize"]
+    return session["size"] - session["partSize"] * (session["totalParts"] - 1)
+
+
+def _get_owned_upload(user_email, upload_id):
+    """Sessione di upload dell'utente; (None, errore) se non esiste o appartiene a un altro utente."""
+    user = get_user_by_email(user_email)
+    if not required_permissions(user, ['producer']):
+        return None, ({"message": "Unauthorized: Insufficient permissions."}, 403)
+    session = get_upload_session(upload_id)
+    if not session or session["uploadedBy"] != user["_id"]:
+        return None, ({"message": "Upload not found."}, 404)
+    return session, None
+
+
+def _abort_upload(session):
+    try:
+        get_blob_store(session["storage"]).abort_multipart(session["blobKey"], session["multipartHandle"])
+    except Exception as e:
+        print(f"[model_upload] Error aborting upload {session['_id']}: {e}")
+    pop_upload_hash(session["_id"], session["totalParts"])
+    delete_upload_session(session["_id"])
+
+
+def _abort_expired_uploads(limit=10):
+    # pulizia opportunistica: le sessioni abbandonate vengono annullate alla creazione di nuove sessioni
+    for session in get_expired_upload_sessions(datetime.now(timezone.utc), limit):
+        if claim_upload_session(session["_id"]):
+            _abort_upload(session)
+
+
+def init_model_upload_service(user_email, upload_data):
+    """
+    Apre una sessione di upload a parti per il modello 3D di un prodotto.
+    Il client invia poi le parti (partSize byte ciascuna, l'ultima il resto) e chiama complete.
+    """
+    user = get_user_by_email(user_email)
+    if not required_permissions(user, ['producer']):
+        return {"message": "Unauthorized: Insufficient permissions."}, 403
+
+    real_manufacturer = user.get("manufacturer")
+    if not real_manufacturer:
+        return {"message": "User manufacturer not found."}, 400
+
+    product_id = upload_data.get("ID")
+    if not product_id:
+        return {"message": "Product ID is required."}, 400
+
+    size = upload_data.get("size")
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return {"message": "A positive integer 'size' is required."}, 400
+    if size > MODEL_UPLOAD_MAX_SIZE:
+        return {"message": f"Model exceeds the maximum size of {MODEL_UPLOAD_MAX_SIZE} bytes."}, 413
+
+    verification_result = verify_manufacturer(product_id, real_manufacturer)
+    if verification_result:
+        return verification_result
+
+    try:
+        _abort_expired_uploads()
+
+        upload_id = uuid.uuid4().hex
+        content_type = upload_data.get("contentType") or DEFAULT_MODEL_CONTENT_TYPE
+        store = get_blob_store()
+        blob_key = upload_blob_key(upload_id)
+        multipart_handle = store.start_multipart(blob_key, content_type)
+
+        upload_doc = create_model_upload_model(upload_id, product_id, user["_id"], size, MODEL_UPLOAD_PART_SIZE,
+                                               content_type, store.name, blob_key, multipart_handle,
+                                               _upload_expiry())
+        create_upload_session(upload_doc)
+        return _upload_status(upload_doc), 201
+
+    except Exception as e:
+        print(f"[init_model_upload_service] Error: {e}")
+        return {"message": f"An error occurred: {str(e)}"}, 500
+
+
+def upload_model_part_service(user_email, upload_id, part_number, stream, content_length):
+    """Scrive una parte nel blob store leggendo il body a blocchi; reinviare una parte la sovrascrive."""
+    session, error = _get_owned_upload(user_email, upload_id)
+    if error:
+        return error
+    if session["status"] != "open":
+        return {"message": "Upload is being completed."}, 409
+    if part_number < 1 or part_number > session["totalParts"]:
+        return {"message": f"Part number must be between 1 and {session['totalParts']}."}, 400
+
+    expected_size = _expected_part_size(session, part_number)
+    if content_length is not None and content_length != expected_size:
+        return {"message": f"Part {part_number} must be {expected_size} bytes."}, 400
+
+    try:
+        store = get_blob_store(session["storage"])
+        reader = open_part_reader(upload_id, part_number, stream, expected_size)
+        part_info = store.put_part(session["blobKey"], session["multipartHandle"], part_number, reader,
+                                   session["partSize"])
+        if part_info["size"] != expected_size:
+            return {"message": f"Part {part_number} is incomplete: received {part_info['size']} "
+                               f"of {expected_size} bytes."}, 400
+
+        if not record_upload_part(upload_id, part_number, part_info, _upload_expiry()):
+            return {"message": "Upload is being completed."}, 409
+        commit_part_hash(upload_id, part_number, reader)
+
+        session["parts"][str(part_number)] = part_info
+        return _upload_status(session), 200
+
+    except Exception as e:
+        print(f"[upload_model_part_service] Error: {e}")
+        return {"message": f"An error occurred: {str(e)}"}, 500
+
+
+def get_model_upload_service(user_email, upload_id):
+    """Stato della sessione: le parti mancanti sono quelle da reinviare per riprendere l'upload."""
+    session, error = _get_owned_upload(user_email, upload_id)
+    if error:
+        return error
+    return _upload_status(session), 200
+
+
+def complete_model_upload_service(user_email, upload_id):
+    session, error = _get_owned_upload(user_email, upload_id)
+    if error:
+        return error
+
+    session = claim_upload_session(upload_id)
+    if not session:
+        return {"message": "Upload is already being completed."}, 409
+
+    status = _upload_status(session)
+    if status["missingParts"]:
+        reopen_upload_session(upload_id)
+        return {"message": "Some parts are missing.", **status}, 409
+
+    try:
+        store = get_blob_store(session["storage"])
+        parts = [(n, session["parts"][str(n)]) for n in range(1, session["totalParts"] + 1)]
+        store.complete_multipart(session["blobKey"], session["multipartHandle"], parts, session["size"],
+                                 session["contentType"])
+
+        content_hash = pop_upload_hash(upload_id, session["totalParts"]) or hash_blob(store, session["blobKey"])
+        register_uploaded_model(session["blockchainProductId"], content_hash, session["size"], session["blobKey"],
+                                store, session["contentType"], session["uploadedBy"])
+        delete_upload_session(upload_id)
+        return {"message": "Model uploaded successfully", "contentHash": content_hash,
+                "modelUrl": model_download_url(session["blockchainProductId"], content_hash)}, 201
+
+    except Exception as e:
+        print(f"[complete_model_upload_service] Error: {e}")
+        reopen_upload_session(upload_id)
+        return {"message": f"An error occurred: {str(e)}"}, 500
+
+
+def abort_model_upload_service(user_email, upload_id):
+    session, error = _get_owned_upload(user_email, upload_id)
+    if error:
+        return error
+    if not claim_upload_session(upload_id):
+        return {"message": "Upload is already being completed."}, 409
+    _abort_upload(session)
+    return {"message": "Upload aborted."}, 200
@@ -1,20 +1,35 @@
+import os
+
 from ..utils.permissions_utils import required_permissions
-from ..database_mongo.queries.users_queries import get_user_by_email, update_user
+from ..database_mongo.models.operator_model import create_operator_model
+from ..database_mongo.queries.operators_queries import add_operator, get_operators_page, remove_operator
+from ..database_mongo.queries.users_queries import get_user_by_email
+from ..utils.operator_cache import operator_producers_changed
+
+# Paginazione di /operators (cursore: email dell'ultimo operatore restituito)
+OPERATORS_PAGE_DEFAULT_LIMIT = int(os.getenv("OPERATORS_PAGE_DEFAULT_LIMIT", 100))
+OPERATORS_PAGE_MAX_LIMIT = int(os.getenv("OPERATORS_PAGE_MAX_LIMIT", 500))
 
-def get_operators_service(user_email):
+def get_operators_service(user_email, limit=None, after=None):
     user = get_user_by_email(user_email)
 
     if not required_permissions(user, ['producer']):
             return {"operators": []}, 403 # Utente non autorizzato
 
-    operators = user.get("operators") or []
-    # Serializza ObjectId in stringa
+    try:
+        limit = OPERATORS_PAGE_DEFAULT_LIMIT if limit is None else int(limit)
+    except (ValueError, TypeError):
+        return {"message": "Invalid 'limit' parameter."}, 400
+    limit = max(1, min(limit, OPERATORS_PAGE_MAX_LIMIT))
+
+    operators = get_operators_page(user["_id"], limit, after or None)
+    # Serializza ObjectId e date in stringa
     for op in operators:
-        operator_id = op.get("operatorId")
-        if operator_id and not isinstance(operator_id, str):
-            op["operatorId"] = str(operator_id)
+        op["operatorId"] = str(op["operatorId"])
+        op["addedAt"] = op["addedAt"].isoformat() if op.get("addedAt") else None
 
-    return {"operators": operators}, 200
+    next_cursor = operators[-1]["email"] if len(operators) == limit else None
+    return {"operators": operators, "nextCursor": next_cursor}, 200
 
 def add_operator_service(user_email, data):
     user = get_user_by_email(user_email)
@@ -33,12 +48,10 @@ def add_operator_service(user_email, data):
     if not operator.get("flags", [])[1]:  # flags[1] == operator
         return {"message": "User is not an operator and cannot be added."}, 400
 
-    if any(op["email"] == operator_email for op in user.get("operators", [])):
+    # Inserimento atomico: l'indice unico producerId+email respinge i duplicati anche tra richieste concorrenti
+    if not add_operator(create_operator_model(user, operator)):
         return {"message": "Operator already added."}, 409
-
-    # Aggiorna la lista operatori su MongoDB
-    user["operators"].append({"operatorId": operator["_id"], "email": operator_email})
-    update_user(user["_id"], {"operators": user["operators"]})
+    operator_producers_changed(operator_email)
 
     return {"message": "Operator added successfully."}, 201
 
@@ -52,10 +65,8 @@ def remove_operator_service(user_email, data):
     if not operator_email:
         return {"message": "Email is required."}, 400
 
-    if not any(op["email"] == operator_email for op in user.get("operators", [])):
+    if not remove_operator(user["_id"], operator_email):
         return {"message": "Operator not found."}, 404
+    operator_producers_changed(operator_email)
 
-    user["operators"] = [op for op in user["operators"] if op["email"] != operator_email]
-    update_user(user["_id"], {"operators": user["operators"]})
-
-    return {"message": "Operator removed successfully."}, 200
\ No newline at end of file
+    return {"message": "Operator removed successfully."}, 200
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from ..database_mongo.queries.products_queries import get_products_to_reconcile, touch_product_owner_check
+from ..utils.blockchain_utils import read_ledger_manufacturer
+
+# Riconciliazione periodica (opzionale) dell'indice di proprietà con il ledger
+OWNERSHIP_RECONCILE_ENABLED = os.getenv("OWNERSHIP_RECONCILE_ENABLED", "False") == "True"
+OWNERSHIP_RECONCILE_INTERVAL_SECONDS = int(os.getenv("OWNERSHIP_RECONCILE_INTERVAL_SECONDS", 3600))
+# Un prodotto viene ricontrollato sul ledger dopo questo intervallo
+OWNERSHIP_RECONCILE_AFTER_HOURS = int(os.getenv("OWNERSHIP_RECONCILE_AFTER_HOURS", 24))
+OWNERSHIP_RECONCILE_BATCH_SIZE = int(os.getenv("OWNERSHIP_RECONCILE_BATCH_SIZE", 200))
+
+_reconcile_thread = None
+
+
+def reconcile_product_owners(limit=OWNERSHIP_RECONCILE_BATCH_SIZE):
+    """
+    Rilegge dal ledger il manufacturer dei prodotti mai controllati o controllati da più di
+    OWNERSHIP_RECONCILE_AFTER_HOURS; riempie anche l'indice per i prodotti caricati prima della sua introduzione.
+    Restituisce (controllati, corretti).
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=OWNERSHIP_RECONCILE_AFTER_HOURS)
+    checked, corrected = 0, 0
+    for product in get_products_to_reconcile(cutoff, limit):
+        product_id = product["blockchainProductId"]
+        manufacturer, error = read_ledger_manufacturer(product_id)
+        checked += 1
+        if error:
+            touch_product_owner_check(product_id)
+            continue
+        if product.get("manufacturer") and product["manufacturer"] != manufacturer:
+            print(f"[ownership] {product_id}: manufacturer {product['manufacturer']} -> {manufacturer}")
+            corrected += 1
+    return checked, corrected
+
+
+def _reconcile_loop():
+    while True:
+        try:
+            checked, corrected = reconcile_product_owners()
+            if checked:
+                print(f"[ownership] Reconciled {checked} products, {corrected} corrected.")
+        except Exception as e:
+            print(f"[ownership] Reconciliation error: {e}")
+        time.sleep(OWNERSHIP_RECONCILE_INTERVAL_SECONDS)
+
+
+def start_ownership_reconciler():
+    """Avvia la riconciliazione periodica in un thread daemon (se OWNERSHIP_RECONCILE_ENABLED)."""
+    global _reconcile_thread
+    if not OWNERSHIP_RECONCILE_ENABLED or _reconcile_thread is not None:
+        return
+    _reconcile_thread = threading.Thread(target=_reconcile_loop, name="ownership-reconciler", daemon=True)
+    _reconcile_thread.start()
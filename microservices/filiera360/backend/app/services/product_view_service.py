@@ -0,0 +1,207 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from ..database_mongo.models.product_view_model import create_ledger_product_body
+from ..database_mongo.queries.product_view_queries import delete_product_view, get_product_view, \
+    get_product_view_entries, get_product_view_version, push_product_view_entries, save_product_view, \
+    save_product_view_if_unchanged
+from ..utils.http_client import http_get
+from ..utils.subresource_cache import append_subresource, get_subresource, invalidate_subresources, \
+    put_subresource
+
+MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
+
+# Letture dei prodotti dalla vista locale (collection product_view) invece che dal ledger
+PRODUCT_VIEW_ENABLED = os.getenv("PRODUCT_VIEW_ENABLED", "True") == "True"
+# Età massima (secondi) di una vista prima di rileggere il prodotto dal ledger; 0 = nessun limite
+PRODUCT_VIEW_MAX_AGE_SECONDS = int(os.getenv("PRODUCT_VIEW_MAX_AGE_SECONDS", 0))
+
+
+def _is_fresh(view):
+    if not view or not PRODUCT_VIEW_MAX_AGE_SECONDS:
+        return bool(view)
+    synced_at = view["syncedAt"]
+    if synced_at.tzinfo is None:
+        synced_at = synced_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - synced_at <= timedelta(seconds=PRODUCT_VIEW_MAX_AGE_SECONDS)
+
+
+def _fresh_view(product_id):
+    view = get_product_view(product_id)
+    return view if _is_fresh(view) else None
+
+
+def _stamp(view):
+    """Stamp della vista per le liste in cache: cambia a ogni scrittura e quando la vista viene ricreata."""
+    if not view or "version" not in view:
+        return None
+    return view["syncedAt"], view["version"]
+
+
+def _invalidate(product_id, error):
+    """Vista non più allineata al ledger: viene rimossa e ricaricata alla prossima lettura."""
+    print(f"[product_view] Cannot update view of {product_id}: {error}")
+    invalidate_subresources(product_id)
+    try:
+        delete_product_view(product_id)
+    except Exception as e:
+        print(f"[product_view] Cannot invalidate view of {product_id}: {e}")
+
+
+def _view_version(product_id):
+    """Versione della vista prima della lettura dal ledger (None se la vista non esiste)."""
+    view = get_product_view_version(product_id)
+    return view.get("version") if view else None
+
+
+def _read_ledger_product(product_id):
+    """(prodotto, None) dal ledger, oppure (None, errore)."""
+    try:
+        response = http_get(f'{MIDDLEWARE_BASE_URL}/readProduct?productId={product_id}')
+        if response.status_code != 200:
+            return None, f"Failed to fetch product, status {response.status_code}"
+        return response.json(), None
+    except requests.exceptions.RequestException as e:
+        return None, str(e)
+
+
+def _load_view(product_id, verify=False):
+    """
+    Vista del prodotto: dalla collection product_view, oppure (se assente, scaduta o con verify)
+    riletta dal ledger e salvata. Restituisce (vista, None) oppure (None, errore).
+    """
+    if PRODUCT_VIEW_ENABLED and not verify:
+        view = _fresh_view(product_id)
+        if view:
+            return view, None
+
+    # la versione va letta prima del ledger: un $push arrivato nel mezzo non deve essere sovrascritto
+    version = _view_version(product_id) if PRODUCT_VIEW_ENABLED else None
+    product, error = _read_ledger_product(product_id)
+    if error:
+        return None, error
+    view = {"product": product, "movements": []}
+    if PRODUCT_VIEW_ENABLED and isinstance(product, dict) and product.get("ID"):
+        try:
+            # se la vista è cambiata dopo la lettura si usa quella più recente
+            save_product_view_if_unchanged(product, version)
+            view = get_product_view(product_id) or view
+        except Exception as e:
+            print(f"[product_view] Cannot save view of {product_id}: {e}")
+    return view, None
+
+
+def read_product(product_id, verify=False):
+    """Prodotto come restituito da /readProduct; con verify viene sempre letto dal ledger. (prodotto, errore)"""
+    view, error = _load_view(product_id, verify)
+    if error:
+        return None, error
+    return view["product"], None
+
+
+def _read_list(product_id, field):
+    """
+    Lista della vista (es. "movements", "product.SensorData"): dalla cache in memoria se lo stamp della
+    vista non è cambiato (una query sul solo stamp), altrimenti letta da product_view e messa in cache.
+    Se la vista manca o è scaduta viene ricaricata dal ledger. None in caso di errore.
+    """
+    view = get_product_view_version(product_id)
+    if _is_fresh(view):
+        items = get_subresource(product_id, field, _stamp(view))
+        if items is not None:
+            return items
+        view = get_product_view_entries(product_id, field)
+    if not _is_fresh(view):
+        view, error = _load_view(product_id)
+        if error:
+            return None
+
+    items = view
+    for key in field.split("."):
+        items = items.get(key) if isinstance(items, dict) else None
+    items = items or []
+    put_subresource(product_id, field, _stamp(view), items)
+    return items
+
+
+def read_product_entries(product_id, field):
+    """Lista del prodotto (SensorData, Certifications) dalla vista, o None se va letta dal middleware."""
+    if not PRODUCT_VIEW_ENABLED:
+        return None
+    return _read_list(product_id, f"product.{field}")
+
+
+def read_product_movements(product_id):
+    """Movimenti registrati per il prodotto, o None se vanno letti dal middleware."""
+    if not PRODUCT_VIEW_ENABLED:
+        return None
+    return _read_list(product_id, "movements")
+
+
+# --- Aggiornamento della vista dopo le scritture confermate dal ledger ---
+
+def record_product_upload(product_data):
+    if not PRODUCT_VIEW_ENABLED:
+        return
+    try:
+        save_product_view(create_ledger_product_body(product_data))
+    except Exception as e:
+        _invalidate(product_data["ID"], e)
+
+
+def record_product_update(product_id):
+    """
+    L'aggiornamento sul chaincode mantiene i campi vuoti e rinomina alcuni argomenti:
+    invece di replicarne la logica la vista viene riletta dal ledger.
+    """
+    if not PRODUCT_VIEW_ENABLED:
+        return
+    try:
+        version = _view_version(product_id)
+    except Exception as e:
+        _invalidate(product_id, e)
+        return
+    product, error = _read_ledger_product(product_id)
+    if error:
+        _invalidate(product_id, error)
+        return
+    try:
+        if not save_product_view_if_unchanged(product, version):
+            # vista cambiata dopo la lettura (es. dati dei sensori): sarà riletta dal ledger
+            _invalidate(product_id, "view changed while reading the ledger")
+    except Exception as e:
+        _invalidate(product_id, e)
+
+
+def _push_entries(product_id, field, entries):
+    if not PRODUCT_VIEW_ENABLED or not entries:
+        return
+    try:
+        # se la vista non esiste ancora verrà creata dal ledger alla prima lettura
+        view = push_product_view_entries(product_id, field, entries)
+    except Exception as e:
+        _invalidate(product_id, e)
+        return
+    # le liste in cache vengono estese invece che rilette (se nessun'altra scrittura è avvenuta nel mezzo)
+    stamp = _stamp(view)
+    previous = (stamp[0], stamp[1] - 1) if stamp else None
+    append_subresource(product_id, field, previous, stamp, entries)
+
+
+def record_sensor_data(product_id, readings):
+    _push_entries(product_id, "product.SensorData",
+                  [{"SensorId": reading.get("SensorId"), "Signals": reading.get("Signals")} for reading in readings])
+
+
+def record_certification(product_id, certification):
+    _push_entries(product_id, "product.Certifications", [{
+        "CertificationType": certification.get("certificationType"),
+        "CertifyingBody": certification.get("certifyingBody"),
+        "IssueDate": certification.get("issueDate")
+    }])
+
+
+def record_movements(product_id, movements):
+    _push_entries(product_id, "movements", [{k: v for k, v in movement.items() if k != "id"} for movement in movements])
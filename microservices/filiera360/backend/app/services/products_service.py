@@ -5,23 +5,87 @@ import requests
 from ..utils.blockchain_utils import verify_manufacturer
 from ..utils.http_client import http_post, http_get, add_cors_headers
 from ..utils.permissions_utils import required_permissions
-from ..utils.product_utils import get_product_changes
-from ..database_mongo.queries.history_queries import get_last_history_entry, add_history_entry
+from ..utils.product_utils import get_product_changes, apply_product_changes
+from ..utils.search_utils import SEARCH_MAX_PREFIX, SEARCH_MIN_PREFIX, token_trigrams, tokenize
+from ..database_mongo.queries.checkpoint_queries import get_checkpoint_before
+from ..database_mongo.queries.history_queries import get_history_between
+from ..database_mongo.queries.product_state_queries import get_product_state, create_product_state, \
+    rebuild_product_state, record_product_changes
+from ..database_mongo.queries.cooccurrence_queries import ALSO_LIKED_MAX_NEIGHBOURS, get_also_liked
 from ..database_mongo.queries.liked_queries import get_liked_products_by_user, like_a_product, unlike_a_product
-from ..database_mongo.queries.products_queries import create_product
+from ..database_mongo.queries.products_queries import save_uploaded_product
+from ..database_mongo.queries.product_view_queries import get_product_view_summaries, has_product_prefix_match, \
+    search_product_views_by_prefix, search_product_views_by_trigrams
 from ..database_mongo.queries.recently_searched_queries import add_recently_searched
 from ..database_mongo.queries.users_queries import get_user_by_email
+from .model_service import get_model_url
+from .product_view_service import read_product, read_product_entries, read_product_movements, \
+    record_certification, record_movements, record_product_update, record_product_upload, record_sensor_data
+from .trending_service import record_product_like, record_product_search
+from .write_jobs_service import LEDGER_WRITE_TIMEOUT, enqueue_write_job, register_write_handler
 import os
 MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
 
-def get_product_service(product_id):
+# Ricerca dei prodotti: risultati per pagina e risultati raggiungibili con la paginazione
+SEARCH_PAGE_MAX_LIMIT = 100
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 1000))
+# Ricerca con errori di battitura: quota minima di trigrammi in comune
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", 0.4))
+
+def get_product_service(product_id, verify=False):
+    """Prodotto dalla vista locale (product_view); con verify viene riletto dal ledger e la vista riallineata."""
+    product, error = read_product(product_id, verify)
+    if error:
+        return {"error": error}
+    if not isinstance(product, dict):
+        return product
+    # URL del modello 3D con l'hash del contenuto: il client lo scarica senza una richiesta in più
     try:
-        response = http_get(f'{MIDDLEWARE_BASE_URL}/readProduct?productId={product_id}')
-        if response.status_code == 200:
-            return response.json()
-        return {"error": f"Failed to fetch product, status {response.status_code}"}
-    except requests.exceptions.RequestException as e:
-        return {"error": str(e)}
+        model_url = get_model_url(product_id)
+    except Exception as e:
+        print(f"[get_product_service] Cannot read model of {product_id}: {e}")
+        model_url = None
+    return {**product, "ModelUrl": model_url}
+
+def search_products_service(query, page=None, limit=None, manufacturer=None):
+    """
+    Ricerca full-text su nome, ingredienti, origine, manufacturer e ID (vista product_view).
+    Se nessun prodotto contiene tutte le parole come prefisso si passa al confronto per trigrammi,
+    che tollera gli errori di battitura; "match" nella risposta indica quale dei due è stato usato.
+    """
+    tokens = [token for token in tokenize(query or "") if len(token) >= SEARCH_MIN_PREFIX]
+    if not tokens:
+        return {"message": f"Search query must contain at least {SEARCH_MIN_PREFIX} characters."}, 400
+    try:
+        page = 1 if page is None else int(page)
+        limit = 20 if limit is None else int(limit)
+    except (TypeError, ValueError):
+        return {"message": "Invalid 'page' or 'limit' parameter."}, 400
+    page, limit = max(1, page), max(1, min(limit, SEARCH_PAGE_MAX_LIMIT))
+    skip = (page - 1) * limit
+    if skip + limit > SEARCH_MAX_RESULTS:
+        return {"message": f"Only the first {SEARCH_MAX_RESULTS} results can be paged through."}, 400
+
+    prefixes = [token[:SEARCH_MAX_PREFIX] for token in tokens]
+    if has_product_prefix_match(prefixes, manufacturer):
+        match = "prefix"
+        results = search_product_views_by_prefix(prefixes, tokens, skip, limit + 1, manufacturer)
+    else:
+        match = "fuzzy"
+        grams = list(dict.fromkeys(gram for token in tokens for gram in token_trigrams(token)))
+        results = search_product_views_by_trigrams(grams, tokens, skip, limit + 1, SEARCH_MIN_SIMILARITY,
+                                                   manufacturer)
+
+    for result in results:
+        result["score"] = round(result["score"], 3)
+    return {
+        "query": query,
+        "match": match,
+        "page": page,
+        "limit": limit,
+        "results": results[:limit],
+        "hasMore": len(results) > limit
+    }, 200
 
 def get_product_history_service(product_id):
     try:
@@ -35,9 +99,42 @@ def get_product_history_service(product_id):
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
-def upload_product_service(product_data, user_identity):
+def get_product_at_service(product_id, at):
+    """
+    Ricostruisce lo stato del prodotto all'istante `at`: carica il checkpoint più vicino
+    e riapplica solo le history entry successive (al massimo HISTORY_CHECKPOINT_INTERVAL).
+    """
+    try:
+        checkpoint = get_checkpoint_before(product_id, at)
+        if checkpoint:
+            state, after, version = checkpoint["state"], checkpoint["timestamp"], checkpoint["version"]
+        else:
+            # prodotti senza checkpoint (caricati prima dei checkpoint): si riparte dall'inizio
+            state, after, version = {}, None, 0
+
+        deltas = get_history_between(product_id, after, at)
+        if not checkpoint and not deltas:
+            return {"message": "No state recorded for this product at the requested date."}, 404
+
+        for entry in deltas:
+            apply_product_changes(state, entry.get("changes"))
+    except Exception as e:
+        print(f"[get_product_at_service] Error: {e}")
+        return {"message": "Failed to rebuild product state.", "error": str(e)}, 500
+
+    return {
+        "productId": product_id,
+        "at": at.isoformat(),
+        "version": version + len(deltas),
+        "checkpointVersion": version if checkpoint else None,
+        "replayedEntries": len(deltas),
+        "state": state
+    }, 200
+
+def upload_product_service(product_data, user_identity, async_write=False):
     """
     Gestisce l'upload di un prodotto su middleware/blockchain e salva il prodotto su MongoDB.
+    Con async_write la scrittura viene accodata e la risposta è un 202 con l'id del job.
     """
     user = get_user_by_email(user_identity)
 
@@ -55,30 +152,62 @@ def upload_product_service(product_data, user_identity):
     product_data.setdefault("SensorData", [])
     product_data.setdefault("CustomObject", {})
 
-    # Invio al middleware esterno
+    if async_write:
+        return enqueue_write_job(WRITE_UPLOAD_PRODUCT, product_data, user)
+
     try:
-        response = http_post('{MIDDLEWARE_BASE_URL}/uploadProduct', json=product_data)
-    except Exception as e:
+        return commit_product_upload(product_data, user)
+    except requests.RequestException as e:
         return {"message": "Error connecting to middleware.", "error": str(e)}, 500
 
+
+def commit_product_upload(product_data, user):
+    """Scrittura sul ledger e salvataggio locale di un prodotto già validato."""
+    response = http_post(f'{MIDDLEWARE_BASE_URL}/uploadProduct', json=product_data, timeout=LEDGER_WRITE_TIMEOUT)
+
     # Gestione risposta middleware
     if response.status_code != 200:
         return {"message": response.json().get('message', 'Failed to upload product.')}, response.status_code
 
+    return _save_uploaded_product(product_data, user, response.json().get('message', 'Product uploaded successfully!'))
+
+
+def _save_uploaded_product(product_data, user, message):
     # Salvataggio su MongoDB
     try:
-        create_product(product_data["ID"], user["_id"])
+        save_uploaded_product(product_data["ID"], user["_id"], product_data["Manufacturer"])
+        create_product_state(product_data["ID"], product_data)
     except Exception as e:
         print("Errore salvataggio MongoDB:", e)
         return {"message": "Product uploaded to middleware but failed to save locally."}, 500
+    record_product_upload(product_data)
+
+    return {'message': message}, 200
 
-    return {'message': response.json().get('message', 'Product uploaded successfully!')}, 200
+
+def _recover_product_upload(product_data, user):
+    """
+    Upload ritentato rifiutato perché il prodotto esiste già: se il prodotto sul ledger è quello
+    del payload il tentativo precedente è andato a buon fine e restano da fare i salvataggi locali.
+    """
+    response = http_get(f'{MIDDLEWARE_BASE_URL}/readProduct?productId={product_data["ID"]}')
+    if response.status_code != 200:
+        return None
+    product = response.json()
+    if any(product.get(field) != product_data.get(field) for field in ("ID", "Manufacturer", "Name")):
+        return None
+    # il documento in products non basta: viene creato anche dalle letture dal ledger (set_product_owner)
+    if get_product_state(product_data["ID"], ["ID"]):
+        # salvataggi locali già completati dal tentativo precedente
+        return {"message": "Product uploaded successfully!"}, 200
+    return _save_uploaded_product(product_data, user, "Product uploaded successfully!")
 
 
-def update_product_service(product_data, user_identity):
+def update_product_service(product_data, user_identity, async_write=False):
     """
     Aggiorna un prodotto sia su blockchain (middleware) che sul database locale,
     tracciando le modifiche nella history.
+    Con async_write la scrittura viene accodata e la risposta è un 202 con l'id del job.
     """
     user = get_user_by_email(user_identity)
     if not required_permissions(user, ["producer"]):
@@ -103,25 +232,38 @@ def update_product_service(product_data, user_identity):
     if client_manufacturer != real_manufacturer:
         return {"message": "Unauthorized: Manufacturer mismatch."}, 403
 
+    if async_write:
+        return enqueue_write_job(WRITE_UPDATE_PRODUCT, product_data, user)
+
     try:
-        # --- Chiamata al middleware esterno ---
-        response = http_post(
-            "{MIDDLEWARE_BASE_URL}/api/product/updateProduct",
-            json=product_data
-        )
+        return _commit_product_update(product_data, user)
     except requests.RequestException as e:
         print(f"[update_product_service] Middleware error: {e}")
         return {"message": "Middleware request failed.", "error": str(e)}, 502
 
+
+def _commit_product_update(product_data, user):
+    """Scrittura sul ledger e registrazione delle modifiche di un aggiornamento già validato."""
+    product_id = product_data["ID"]
+    _ensure_product_state(product_id)
+
+    # --- Chiamata al middleware esterno ---
+    response = http_post(
+        f"{MIDDLEWARE_BASE_URL}/api/product/updateProduct",
+        json=product_data,
+        timeout=LEDGER_WRITE_TIMEOUT
+    )
+
     if response.status_code != 200:
         return {"message": "Failed to update product."}, response.status_code
+    record_product_update(product_id)
 
-        # --- Salvataggio modifiche su DB ---
+    # --- Salvataggio modifiche su DB ---
     try:
-        old_data = _extract_last_known_data(product_id)
+        old_data = _extract_last_known_data(product_id, product_data.keys())
         changes = get_product_changes(old_data, product_data)
         if changes:
-            add_history_entry(product_id, user["_id"], changes)
+            record_product_changes(product_id, user["_id"], changes)
 
     except Exception as e:
         print(f"[update_product_service] Error: {e}")
@@ -130,28 +272,39 @@ def update_product_service(product_data, user_identity):
     return {"message": "Product updated successfully!"}, 200
 
 
-def _extract_last_known_data(product_id):
+WRITE_UPLOAD_PRODUCT = "uploadProduct"
+WRITE_UPDATE_PRODUCT = "updateProduct"
+register_write_handler(WRITE_UPLOAD_PRODUCT, commit_product_upload, _recover_product_upload)
+register_write_handler(WRITE_UPDATE_PRODUCT, _commit_product_update)
+
+
+def _ensure_product_state(product_id):
     """
-    Ricostruisce lo stato precedente del prodotto a partire dall'ultima history entry.
-    Restituisce un dict con i valori attuali conosciuti.
+    Prodotti caricati prima di product_state: lo snapshot viene ricostruito prima della scrittura sul ledger,
+    partendo dal prodotto attuale, così i campi del caricamento non risultano modificati al primo aggiornamento.
     """
-    last_history = get_last_history_entry(product_id)
-    old_data = {}
-
-    if not last_history or not last_history.get("changes"):
-        return old_data
+    try:
+        if get_product_state(product_id, ["ID"]) is not None:
+            return
+        product, error = read_product(product_id)
+        if error or not isinstance(product, dict):
+            print(f"[update_product_service] Cannot read {product_id} to rebuild its state: {error}")
+            return
+        rebuild_product_state(product_id, product)
+    except Exception as e:
+        print(f"[update_product_service] Cannot rebuild state of {product_id}: {e}")
 
-    for change in last_history["changes"]:
-        field = change["field"]
-        new_value = change["newValue"]
 
-        if field.startswith("CustomObject."):
-            _, subkey = field.split(".", 1)
-            old_data.setdefault("CustomObject", {})[subkey] = new_value
-        else:
-            old_data[field] = new_value
+def _extract_last_known_data(product_id, fields):
+    """
+    Restituisce gli ultimi valori noti dei campi richiesti dallo snapshot product_state.
+    Per i prodotti senza snapshot lo ricostruisce una volta dall'intera history.
+    """
+    snapshot = get_product_state(product_id, fields)
+    if snapshot is None:
+        snapshot = rebuild_product_state(product_id)
 
-    return old_data
+    return snapshot.get("state", {})
 
 # Funzione per aggiungere un prodotto ai liked products
 def like_product_service(data, request):
@@ -173,6 +326,7 @@ def like_product_service(data, request):
         return {"message": "Product already liked"}, 200
 
     like_a_product(user_id, product_data["ID"])
+    record_product_like(product_data["ID"])
     return {"message": "Product added to liked products"}, 201
 
     # Save to JSON file
@@ -197,7 +351,8 @@ def unlike_product_service(request):
         response = {"message": "Product not found in liked products"}
         return add_cors_headers(response), 404
 
-    unlike_a_product(user_id, product_id)
+    if unlike_a_product(user_id, product_id):
+        record_product_like(product_id, liked=False)
     response = {"message": "Product removed from liked products"}
     return add_cors_headers(response), 200
 
@@ -210,6 +365,22 @@ def get_liked_products_service(request):
     liked = get_liked_products_by_user(user_id)
     return liked, 200
 
+# Prodotti piaciuti più spesso agli utenti a cui è piaciuto il prodotto (indice product_cooccurrence)
+def get_also_liked_service(product_id, limit=None):
+    if not product_id:
+        return {"message": "productId is required"}, 400
+    try:
+        limit = 10 if limit is None else int(limit)
+    except (TypeError, ValueError):
+        return {"message": "Invalid 'limit' parameter."}, 400
+    limit = max(1, min(limit, ALSO_LIKED_MAX_NEIGHBOURS))
+
+    products = get_also_liked(product_id, limit)
+    summaries = get_product_view_summaries([product["productId"] for product in products])
+    for product in products:
+        product.update(summaries.get(product["productId"], {"Name": None, "Manufacturer": None}))
+    return {"productId": product_id, "products": products}, 200
+
 # Funzione per salvare i liked products su file JSON (se serve)
 def save_liked_products(products):
     with open('liked_products.json', 'w') as f:
@@ -222,6 +393,7 @@ def add_recently_searched_service(user_email, blockchain_product_id):
 
     user_id = user["_id"]
     add_recently_searched(user_id, blockchain_product_id)
+    record_product_search(blockchain_product_id)
 
 # Initialize the liked_products variable
 #liked_products = load_liked_products()
@@ -238,6 +410,7 @@ def add_sensor_data_service(sensor_data, manufacturer):
     try:
         response = http_post(f'{MIDDLEWARE_BASE_URL}/api/product/sensor', json=sensor_data)
         if response.status_code == 200:
+            record_sensor_data(product_id, [sensor_data])
             return {"body": {"message": "Product uploaded successfully!"}, "status": 200}
         return {"body": {"message": "Failed to upload product."}, "status": 500}
     except Exception as e:
@@ -255,6 +428,7 @@ def add_movement_data_service(movement_data, manufacturer):
     try:
         response = http_post(f'{MIDDLEWARE_BASE_URL}/api/product/movement', json=movement_data)
         if response.status_code == 200:
+            record_movements(product_id, [movement_data])
             return {"body": {"message": "Product uploaded successfully!"}, "status": 200}
         return {"body": {"message": "Failed to upload product."}, "status": 500}
     except Exception as e:
@@ -273,6 +447,7 @@ def add_certification_data_service(certification_data, manufacturer):
     try:
         response = http_post(f'{MIDDLEWARE_BASE_URL}/api/product/certification', json=certification_data)
         if response.status_code == 200:
+            record_certification(product_id, certification_data)
             return {"body": {"message": "Product uploaded successfully!"}, "status": 200}
         return {"body": {"message": "Failed to upload product."}, "status": 500}
     except Exception as e:
@@ -290,6 +465,9 @@ def verify_product_compliance_service(compliance_data):
 
 
 def get_all_movements_service(product_id):
+    movements = read_product_movements(product_id)
+    if movements is not None:
+        return {"body": movements, "status": 200}
     try:
         response = http_get(f'{MIDDLEWARE_BASE_URL}/api/product/getMovements?productId={product_id}')
         if response.status_code == 200:
@@ -300,11 +478,12 @@ def get_all_movements_service(product_id):
 
 def get_all_sensor_data_service(product_id):
     try:
-        response = http_get(f'{MIDDLEWARE_BASE_URL}/api/product/getSensorData?productId={product_id}')
-        if response.status_code != 200:
-            return {"body": {"message": "Failed to get sensor data from middleware"}, "status": 500}
-
-        sensor_data = response.json()
+        sensor_data = read_product_entries(product_id, "SensorData")
+        if sensor_data is None:
+            response = http_get(f'{MIDDLEWARE_BASE_URL}/api/product/getSensorData?productId={product_id}')
+            if response.status_code != 200:
+                return {"body": {"message": "Failed to get sensor data from middleware"}, "status": 500}
+            sensor_data = response.json()
 
         # --- Login Databoom ---
         api_base = current_app.config['DATABOOM_API_BASE']
@@ -363,6 +542,9 @@ def _get_databoom_description(url, headers):
     return "Unnamed"
 
 def get_all_certifications_service(product_id):
+    certifications = read_product_entries(product_id, "Certifications")
+    if certifications is not None:
+        return {"body": certifications, "status": 200}
     try:
         response = http_get(f'{MIDDLEWARE_BASE_URL}/api/product/getCertifications?productId={product_id}')
         if response.status_code == 200:
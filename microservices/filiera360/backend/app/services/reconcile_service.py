@@ -0,0 +1,175 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+from ..database_mongo.models.reconcile_run_model import create_reconcile_run_model
+from ..database_mongo.queries.product_state_queries import create_product_states, get_existing_product_state_ids
+from ..database_mongo.queries.product_view_queries import get_product_view_hashes, save_product_views
+from ..database_mongo.queries.products_queries import get_product_owners, set_product_owners
+from ..database_mongo.queries.reconcile_runs_queries import claim_reconcile_run, release_reconcile_run, \
+    save_reconcile_checkpoint
+from ..database_mongo.queries.users_queries import get_user_by_manufacturer
+from ..utils.http_client import http_get
+from ..utils.product_utils import product_content_hash
+from .product_view_service import PRODUCT_VIEW_ENABLED
+
+MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
+
+# Riconciliazione periodica tra i prodotti sul ledger e le copie locali (products, product_view, product_state)
+LEDGER_RECONCILE_ENABLED = os.getenv("LEDGER_RECONCILE_ENABLED", "True") == "True"
+# Record del world state letti per pagina
+LEDGER_RECONCILE_PAGE_SIZE = int(os.getenv("LEDGER_RECONCILE_PAGE_SIZE", 100))
+# Limite di record letti al secondo dal peer
+LEDGER_RECONCILE_RATE = float(os.getenv("LEDGER_RECONCILE_RATE", 20))
+# Pausa tra la fine di un passaggio completo e l'inizio del successivo
+LEDGER_RECONCILE_INTERVAL_SECONDS = int(os.getenv("LEDGER_RECONCILE_INTERVAL_SECONDS", 6 * 3600))
+# Un worker che non salva il checkpoint per questo tempo perde la riconciliazione, ripresa da un altro
+LEDGER_RECONCILE_LEASE_SECONDS = int(os.getenv("LEDGER_RECONCILE_LEASE_SECONDS", 120))
+# Attesa dopo un errore (pagina non letta, MongoDB non raggiungibile)
+LEDGER_RECONCILE_RETRY_SECONDS = int(os.getenv("LEDGER_RECONCILE_RETRY_SECONDS", 60))
+
+RECONCILE_RUN_ID = "products"
+
+_owner = f"{socket.gethostname()}:{os.getpid()}"
+_reconcile_thread = None
+
+
+def _lease_until():
+    return datetime.now(timezone.utc) + timedelta(seconds=LEDGER_RECONCILE_LEASE_SECONDS)
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value and value.tzinfo is None else value
+
+
+def _fetch_ledger_page(bookmark):
+    """Pagina di prodotti dal ledger: {"products", "bookmark", "fetchedRecordsCount"}. Solleva in caso di errore."""
+    response = http_get(f'{MIDDLEWARE_BASE_URL}/api/product/page'
+                        f'?pageSize={LEDGER_RECONCILE_PAGE_SIZE}&bookmark={quote(bookmark or "")}')
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to read products page, status {response.status_code}")
+    return response.json()
+
+
+def reconcile_products_page(ledger_products):
+    """
+    Confronta una pagina di prodotti del ledger con le copie locali (tre query per pagina)
+    e ripara le differenze con bulk write. Restituisce il numero di prodotti riparati.
+    """
+    ledger_products = [product for product in ledger_products if isinstance(product, dict) and product.get("ID")]
+    if not ledger_products:
+        return 0
+    ids = [product["ID"] for product in ledger_products]
+    owners = get_product_owners(ids)
+    view_hashes = get_product_view_hashes(ids) if PRODUCT_VIEW_ENABLED else {}
+    states = get_existing_product_state_ids(ids)
+
+    owner_fixes, view_fixes, state_fixes, repaired = [], [], [], set()
+    producers = {}  # manufacturer -> _id dell'utente produttore, per i documenti mancanti
+    for product in ledger_products:
+        product_id, manufacturer = product["ID"], product.get("Manufacturer") or None
+
+        if product_id not in owners or (manufacturer and owners[product_id] != manufacturer):
+            created_by = None
+            if product_id not in owners and manufacturer:
+                if manufacturer not in producers:
+                    user = get_user_by_manufacturer(manufacturer)
+                    producers[manufacturer] = user["_id"] if user else None
+                created_by = producers[manufacturer]
+            owner_fixes.append((product_id, manufacturer, created_by))
+            repaired.add(product_id)
+
+        if PRODUCT_VIEW_ENABLED and view_hashes.get(product_id, (None,))[0] != product_content_hash(product):
+            view_fixes.append(product)
+            repaired.add(product_id)
+
+        if product_id not in states:
+            # prodotti caricati sul ledger senza snapshot locale: lo stato attuale diventa il punto di partenza
+            state_fixes.append(product)
+            repaired.add(product_id)
+
+    set_product_owners(owner_fixes)
+    create_product_states(state_fixes)
+    # solo le viste non modificate dopo la lettura della pagina: le scritture successive non vanno perse
+    save_product_views(view_fixes, expected_versions={product_id: version
+                                                      for product_id, (_, version) in view_hashes.items()})
+    return len(repaired)
+
+
+def _reconcile_step():
+    """
+    Riconcilia la pagina successiva al checkpoint. Restituisce i secondi da attendere
+    prima del passo successivo (limite di velocità, pausa tra passaggi o attesa del lease).
+    """
+    run = claim_reconcile_run(create_reconcile_run_model(RECONCILE_RUN_ID), _owner, _lease_until())
+    if run is None:
+        return LEDGER_RECONCILE_LEASE_SECONDS
+
+    last_completed = _utc(run.get("lastPassCompletedAt"))
+    if not run["bookmark"] and last_completed:
+        remaining = (last_completed + timedelta(seconds=LEDGER_RECONCILE_INTERVAL_SECONDS)
+                     - datetime.now(timezone.utc)).total_seconds()
+        if remaining > 0:
+            release_reconcile_run(RECONCILE_RUN_ID, _owner)
+            return min(remaining, LEDGER_RECONCILE_RETRY_SECONDS)
+
+    started = time.monotonic()
+    fields = {}
+    if not run["bookmark"]:
+        fields.update({"passStartedAt": datetime.now(timezone.utc), "scanned": 0, "repaired": 0, "failedPages": 0})
+        run.update(fields)
+
+    try:
+        page = _fetch_ledger_page(run["bookmark"])
+    except Exception as e:
+        print(f"[reconcile] Cannot read ledger page: {e}")
+        save_reconcile_checkpoint(RECONCILE_RUN_ID, _owner, fields, {"failedPages": 1}, _lease_until())
+        return LEDGER_RECONCILE_RETRY_SECONDS
+
+    products = page.get("products") or []
+    fetched = page.get("fetchedRecordsCount", len(products))
+    repaired = reconcile_products_page(products)
+    scanned = run["scanned"] + len(products)
+    total_repaired = run["repaired"] + repaired
+    next_bookmark = page.get("bookmark") or ""
+
+    if fetched < LEDGER_RECONCILE_PAGE_SIZE or not next_bookmark or next_bookmark == run["bookmark"]:
+        # fine del world state: il passaggio è concluso e il successivo riparte dall'inizio
+        now = datetime.now(timezone.utc)
+        fields.update({
+            "bookmark": "", "scanned": 0, "repaired": 0, "failedPages": 0, "lastPassCompletedAt": now,
+            "lastPass": {"startedAt": run["passStartedAt"], "completedAt": now, "scanned": scanned,
+                         "repaired": total_repaired, "failedPages": run["failedPages"]}
+        })
+        print(f"[reconcile] Pass completed: {scanned} products scanned, {total_repaired} repaired.")
+        inc = {"passes": 1}
+    else:
+        fields.update({"bookmark": next_bookmark, "scanned": scanned, "repaired": total_repaired})
+        inc = None
+    save_reconcile_checkpoint(RECONCILE_RUN_ID, _owner, fields, inc, _lease_until())
+
+    # limite di velocità: almeno fetched / LEDGER_RECONCILE_RATE secondi per pagina
+    min_duration = fetched / LEDGER_RECONCILE_RATE if LEDGER_RECONCILE_RATE > 0 else 0
+    return max(0.0, min_duration - (time.monotonic() - started))
+
+
+def _reconcile_loop():
+    while True:
+        try:
+            delay = _reconcile_step()
+        except Exception as e:
+            print(f"[reconcile] Reconciliation error: {e}")
+            delay = LEDGER_RECONCILE_RETRY_SECONDS
+        time.sleep(delay)
+
+
+def start_ledger_reconciler():
+    """Avvia la riconciliazione ledger-MongoDB in un thread daemon (se LEDGER_RECONCILE_ENABLED)."""
+    global _reconcile_thread
+    if not LEDGER_RECONCILE_ENABLED or _reconcile_thread is not None:
+        return
+    _reconcile_thread = threading.Thread(target=_reconcile_loop, name="ledger-reconciler", daemon=True)
+    _reconcile_thread.start()
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from ..database_mongo.queries.product_activity_queries import aggregate_trending_products, \
+    get_most_liked_products, get_product_ranking, increment_product_likes, record_product_activity, \
+    save_product_ranking
+from ..database_mongo.queries.product_view_queries import get_product_view_summaries
+
+# Ore di attività considerate per i prodotti di tendenza (come in setup_indexes)
+TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", 72))
+# Ogni quanto ricalcolare la classifica; un worker non la ricalcola se un altro l'ha appena aggiornata
+TRENDING_REFRESH_SECONDS = int(os.getenv("TRENDING_REFRESH_SECONDS", 300))
+# Prodotti salvati nella classifica materializzata
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", 100))
+# Peso di un like e di una ricerca nel punteggio
+TRENDING_LIKE_WEIGHT = float(os.getenv("TRENDING_LIKE_WEIGHT", 3))
+TRENDING_SEARCH_WEIGHT = float(os.getenv("TRENDING_SEARCH_WEIGHT", 1))
+
+TRENDING_RANKING = "trending"
+TRENDING_KINDS = ("trending", "mostLiked")
+
+_refresh_thread = None
+
+
+# --- Eventi (chiamati dai servizi di like e ricerca; un errore non blocca la richiesta) ---
+
+def record_product_like(product_id, liked=True):
+    amount = 1 if liked else -1
+    try:
+        record_product_activity(product_id, "likes", amount)
+        increment_product_likes(product_id, amount)
+    except Exception as e:
+        print(f"[trending] Cannot record like of {product_id}: {e}")
+
+
+def record_product_search(product_id):
+    try:
+        record_product_activity(product_id, "searches")
+    except Exception as e:
+        print(f"[trending] Cannot record search of {product_id}: {e}")
+
+
+# --- Classifica materializzata ---
+
+def refresh_trending_products():
+    """Ricalcola la classifica dai contatori orari della finestra. Restituisce il numero di prodotti."""
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(hours=TRENDING_WINDOW_HOURS)
+    items = aggregate_trending_products(since, now, TRENDING_LIKE_WEIGHT, TRENDING_SEARCH_WEIGHT, TRENDING_SIZE)
+    for item in items:
+        item["score"] = round(item["score"], 3)
+    save_product_ranking(TRENDING_RANKING, items, TRENDING_WINDOW_HOURS)
+    return len(items)
+
+
+def _refresh_due():
+    ranking = get_product_ranking(TRENDING_RANKING, 0)
+    if not ranking:
+        return True
+    refreshed_at = ranking["refreshedAt"]
+    if refreshed_at.tzinfo is None:
+        refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - refreshed_at >= timedelta(seconds=TRENDING_REFRESH_SECONDS)
+
+
+def _refresh_loop():
+    while True:
+        try:
+            if _refresh_due():
+                refresh_trending_products()
+        except Exception as e:
+            print(f"[trending] Refresh error: {e}")
+        time.sleep(TRENDING_REFRESH_SECONDS)
+
+
+def start_trending_refresher():
+    """Avvia il ricalcolo periodico della classifica in un thread daemon."""
+    global _refresh_thread
+    if _refresh_thread is not None:
+        return
+    _refresh_thread = threading.Thread(target=_refresh_loop, name="trending-refresher", daemon=True)
+    _refresh_thread.start()
+
+
+def get_trending_products_service(kind=None, limit=None):
+    """Primi `limit` prodotti di tendenza (classifica materializzata) o con più like (indice sui contatori)."""
+    kind = kind or "trending"
+    if kind not in TRENDING_KINDS:
+        return {"message": f"Unknown kind: use one of {', '.join(TRENDING_KINDS)}."}, 400
+    try:
+        limit = 10 if limit is None else int(limit)
+    except (TypeError, ValueError):
+        return {"message": "Invalid 'limit' parameter."}, 400
+    limit = max(1, min(limit, TRENDING_SIZE))
+
+    refreshed_at = None
+    if kind == "trending":
+        ranking = get_product_ranking(TRENDING_RANKING, limit)
+        items = ranking["items"] if ranking else []
+        refreshed_at = ranking["refreshedAt"].isoformat() if ranking else None
+    else:
+        items = get_most_liked_products(limit)
+
+    summaries = get_product_view_summaries([item["productId"] for item in items])
+    for item in items:
+        item.update(summaries.get(item["productId"], {"Name": None, "Manufacturer": None}))
+    return {"kind": kind, "products": items, "refreshedAt": refreshed_at}, 200
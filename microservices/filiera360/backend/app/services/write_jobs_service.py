@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from ..extensions import ledger_executor
+from ..database_mongo.models.write_job_model import create_write_job_model
+from ..database_mongo.queries.users_queries import get_user_by_email
+from ..database_mongo.queries.write_jobs_queries import claim_write_job, create_write_job, finish_write_job, \
+    get_pending_write_job_ids, get_write_job, requeue_stale_write_jobs, requeue_write_job
+
+# Timeout delle POST di scrittura al middleware: endorsement e commit Fabric richiedono secondi
+LEDGER_WRITE_TIMEOUT = int(os.getenv("LEDGER_WRITE_TIMEOUT", 30))
+LEDGER_WRITE_MAX_ATTEMPTS = int(os.getenv("LEDGER_WRITE_MAX_ATTEMPTS", 3))
+# Attesa prima del secondo tentativo, raddoppiata a ogni tentativo successivo
+LEDGER_WRITE_RETRY_BACKOFF_SECONDS = float(os.getenv("LEDGER_WRITE_RETRY_BACKOFF_SECONDS", 2))
+# Risposte del middleware per cui la scrittura viene ritentata (servizio o peer non raggiungibili)
+RETRYABLE_STATUS_CODES = (502, 503, 504)
+
+# Recupero dei job rimasti in coda o interrotti (riavvii, worker terminati)
+WRITE_JOB_RECOVERY_ENABLED = os.getenv("WRITE_JOB_RECOVERY_ENABLED", "True") == "True"
+WRITE_JOB_RECOVERY_INTERVAL_SECONDS = int(os.getenv("WRITE_JOB_RECOVERY_INTERVAL_SECONDS", 60))
+WRITE_JOB_STALE_SECONDS = int(os.getenv("WRITE_JOB_STALE_SECONDS", 300))
+
+# Server-sent events su /jobs/<id>/events
+WRITE_JOB_EVENTS_POLL_SECONDS = float(os.getenv("WRITE_JOB_EVENTS_POLL_SECONDS", 0.5))
+WRITE_JOB_EVENTS_TIMEOUT_SECONDS = int(os.getenv("WRITE_JOB_EVENTS_TIMEOUT_SECONDS", 120))
+WRITE_JOB_EVENTS_HEARTBEAT_SECONDS = 15
+# Stream aperti contemporaneamente per processo: ognuno occupa un worker delle richieste per tutta la durata.
+# Oltre il limite la risposta è 429 e lo stato si legge con GET /jobs/<id>
+WRITE_JOB_EVENTS_MAX_STREAMS = int(os.getenv("WRITE_JOB_EVENTS_MAX_STREAMS", 4))
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+_write_handlers = {}
+_event_streams = threading.BoundedSemaphore(WRITE_JOB_EVENTS_MAX_STREAMS)
+_duplicate_handlers = {}
+_recovery_thread = None
+
+
+def register_write_handler(kind, handler, on_duplicate=None):
+    """
+    handler(payload, user) -> (dict, status) esegue la scrittura sul ledger e i passi locali successivi.
+    Le eccezioni requests.RequestException e gli status in RETRYABLE_STATUS_CODES vengono ritentati.
+    on_duplicate(payload, user) -> (dict, status) | None per le scritture non idempotenti (creazioni):
+    se un tentativo successivo al primo viene rifiutato perché il record esiste già, il tentativo
+    precedente potrebbe essere andato a buon fine; on_duplicate lo verifica sul ledger e completa i
+    passi locali (None se il record non corrisponde al payload).
+    """
+    _write_handlers[kind] = handler
+    if on_duplicate:
+        _duplicate_handlers[kind] = on_duplicate
+
+
+def _is_duplicate(body, status):
+    return status == 400 and "already exists" in str(body.get("message", ""))
+
+
+def enqueue_write_job(kind, payload, user):
+    """Salva il job (già validato) e lo affida al pool delle scritture; risposta 202 con l'id del job."""
+    job = create_write_job_model(kind, payload, user["_id"], user["email"], LEDGER_WRITE_MAX_ATTEMPTS)
+    create_write_job(job)
+    _submit(job["_id"])
+    return {
+        "message": "Write accepted.",
+        "jobId": job["_id"],
+        "status": job["status"],
+        "statusUrl": f"/jobs/{job['_id']}"
+    }, 202
+
+
+def _submit(job_id):
+    ledger_executor.submit(_run_write_job, job_id)
+
+
+def _run_write_job(job_id):
+    job = claim_write_job(job_id)
+    if not job:
+        return  # già eseguito da un altro worker/processo
+
+    error = None
+    try:
+        user = get_user_by_email(job["userEmail"])
+        if not user:
+            finish_write_job(job_id, "failed", {"status": 404, "body": {"message": "User not found."}})
+            return
+        body, status = _write_handlers[job["kind"]](job["payload"], user)
+        on_duplicate = _duplicate_handlers.get(job["kind"])
+        if on_duplicate and job["attempts"] > 1 and _is_duplicate(body, status):
+            # un tentativo precedente (timeout, worker interrotto) potrebbe aver già scritto il record
+            body, status = on_duplicate(job["payload"], user) or (body, status)
+        retryable = status in RETRYABLE_STATUS_CODES
+    except requests.RequestException as e:
+        body, status, error, retryable = {"message": "Error connecting to middleware."}, 502, str(e), True
+    except Exception as e:
+        print(f"[write_jobs] Job {job_id} ({job['kind']}) error: {e}")
+        body, status, error, retryable = {"message": "Unexpected error."}, 500, str(e), False
+
+    if retryable and job["attempts"] < job["maxAttempts"]:
+        requeue_write_job(job_id, error or body.get("message"))
+        # il backoff non occupa un worker del pool: il job viene reinviato da un timer
+        delay = LEDGER_WRITE_RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+        timer = threading.Timer(delay, _submit, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+        return
+
+    job_status = "succeeded" if 200 <= status < 300 else "failed"
+    finish_write_job(job_id, job_status, {"status": status, "body": body}, error)
+
+
+def _job_view(job):
+    def _iso(value):
+        return value.isoformat() if value else None
+
+    return {
+        "jobId": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "maxAttempts": job["maxAttempts"],
+        "result": job["result"],
+        "error": job["error"],
+        "createdAt": _iso(job["createdAt"]),
+        "updatedAt": _iso(job["updatedAt"]),
+        "finishedAt": _iso(job["finishedAt"])
+    }
+
+
+_JOB_VIEW_PROJECTION = {"payload": 0}
+
+
+def get_write_job_service(user_email, job_id):
+    job = get_write_job(job_id, _JOB_VIEW_PROJECTION)
+    # i job di altri utenti non vengono rivelati
+    if not job or job["userEmail"] != user_email:
+        return {"message": "Job not found."}, 404
+    return _job_view(job), 200
+
+
+def acquire_event_stream():
+    """Riserva uno degli WRITE_JOB_EVENTS_MAX_STREAMS stream; False se sono tutti in uso."""
+    return _event_streams.acquire(blocking=False)
+
+
+def release_event_stream():
+    _event_streams.release()
+
+
+def stream_write_job_events(job_id):
+    """
+    Generatore di server-sent events: un evento `status` a ogni cambio di stato del job,
+    fino allo stato finale o a WRITE_JOB_EVENTS_TIMEOUT_SECONDS.
+    """
+    deadline = time.monotonic() + WRITE_JOB_EVENTS_TIMEOUT_SECONDS
+    last_sent = None
+    last_heartbeat = time.monotonic()
+
+    while time.monotonic() < deadline:
+        job = get_write_job(job_id, _JOB_VIEW_PROJECTION)
+        if not job:
+            yield "event: error\ndata: {\"message\": \"Job not found.\"}\n\n"
+            return
+
+        view = _job_view(job)
+        marker = (view["status"], view["attempts"])
+        if marker != last_sent:
+            last_sent = marker
+            last_heartbeat = time.monotonic()
+            yield f"event: status\ndata: {json.dumps(view)}\n\n"
+            if view["status"] in TERMINAL_STATUSES:
+                return
+        elif time.monotonic() - last_heartbeat >= WRITE_JOB_EVENTS_HEARTBEAT_SECONDS:
+            last_heartbeat = time.monotonic()
+            yield ": keep-alive\n\n"
+
+        time.sleep(WRITE_JOB_EVENTS_POLL_SECONDS)
+
+    yield "event: timeout\ndata: {}\n\n"
+
+
+def recover_write_jobs():
+    """Rimette in coda i job interrotti e reinvia al pool quelli in coda da troppo tempo."""
+    now = datetime.now(timezone.utc)
+    requeued = requeue_stale_write_jobs(now - timedelta(seconds=WRITE_JOB_STALE_SECONDS))
+    pending = get_pending_write_job_ids(now - timedelta(seconds=WRITE_JOB_RECOVERY_INTERVAL_SECONDS), limit=100)
+    for job_id in pending:
+        _submit(job_id)
+    return requeued, len(pending)
+
+
+def _recovery_loop():
+    while True:
+        try:
+            requeued, submitted = recover_write_jobs()
+            if requeued or submitted:
+                print(f"[write_jobs] Requeued {requeued} interrupted jobs, resubmitted {submitted} pending jobs.")
+        except Exception as e:
+            print(f"[write_jobs] Recovery error: {e}")
+        time.sleep(WRITE_JOB_RECOVERY_INTERVAL_SECONDS)
+
+
+def start_write_job_recovery():
+    """Avvia il recupero periodico dei job di scrittura in un thread daemon."""
+    global _recovery_thread
+    if not WRITE_JOB_RECOVERY_ENABLED or _recovery_thread is not None:
+        return
+    _recovery_thread = threading.Thread(target=_recovery_loop, name="write-job-recovery", daemon=True)
+    _recovery_thread.start()
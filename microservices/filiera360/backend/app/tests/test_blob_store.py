@@ -0,0 +1,172 @@
+"""
+Test dei backend dei blob dei modelli (app/utils/blob_store.py).
+
+Uso (dalla cartella backend):
+    python -m unittest app.tests.test_blob_store
+I test GridFS usano il MongoDB di MONGO_URI (bucket dedicato, eliminato alla fine) e vengono saltati
+se MongoDB non è raggiungibile. I test S3 girano solo con AWS_ENDPOINT_URL impostato (LocalStack,
+docker-compose.yaml nella root del repository), così non partono mai chiamate al vero S3:
+    AWS_ENDPOINT_URL=http://localhost:4566 python -m unittest app.tests.test_blob_store
+"""
+import importlib.util
+import io
+import os
+import socket
+import unittest
+import uuid
+from urllib.parse import urlparse
+
+from pymongo.uri_parser import parse_uri
+
+# LocalStack accetta credenziali fittizie; vanno impostate prima della creazione del client
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+
+from app.database_mongo.mongo_client import get_db, uri  # noqa: E402
+from app.utils.blob_store import BLOB_CHUNK_SIZE, BlobNotFound, GridFSBlobStore, S3BlobStore  # noqa: E402
+from app.utils.s3_utils import AWS_DEFAULT_REGION, AWS_ENDPOINT_URL, get_s3_client  # noqa: E402
+
+# parti multipart da 5 MB: il minimo di S3 (tranne l'ultima) e multiplo di BLOB_CHUNK_SIZE per GridFS
+PART_SIZE = 5 * BLOB_CHUNK_SIZE
+
+
+def _reachable(host, port):
+    try:
+        with socket.create_connection((host, port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def _mongo_available():
+    try:
+        host, port = parse_uri(uri)["nodelist"][0]
+    except Exception:
+        return False
+    return _reachable(host, port)
+
+
+def _localstack_available():
+    if not AWS_ENDPOINT_URL or importlib.util.find_spec("boto3") is None:
+        return False
+    endpoint = urlparse(AWS_ENDPOINT_URL)
+    return _reachable(endpoint.hostname, endpoint.port or 80)
+
+
+class BlobStoreCases:
+    """Casi comuni a tutti i backend: la sottoclasse imposta cls.store in setUpClass."""
+
+    # più di un chunk, per verificare la lettura a blocchi
+    data = os.urandom(BLOB_CHUNK_SIZE + 12345)
+
+    def _put(self, data=None):
+        key = f"{uuid.uuid4().hex}.glb"
+        self.store.put(key, self.data if data is None else data, "model/gltf-binary")
+        return key
+
+    def test_put_and_get_bytes(self):
+        key = self._put()
+        self.assertEqual(self.store.get(key), self.data)
+        self.assertEqual(self.store.size(key), len(self.data))
+        self.assertTrue(self.store.exists(key))
+
+    def test_put_stream(self):
+        key = f"{uuid.uuid4().hex}.glb"
+        self.store.put(key, io.BytesIO(self.data), "model/gltf-binary")
+        self.assertEqual(self.store.get(key), self.data)
+
+    def test_put_overwrites(self):
+        key = self._put()
+        self.store.put(key, b"glTF", "model/gltf-binary")
+        self.assertEqual(self.store.get(key), b"glTF")
+
+    def test_open_stream(self):
+        key = self._put()
+        chunks = list(self.store.open_stream(key))
+        self.assertTrue(all(len(chunk) <= BLOB_CHUNK_SIZE for chunk in chunks))
+        self.assertEqual(b"".join(chunks), self.data)
+
+    def test_ranged_reads(self):
+        key = self._put()
+        start = BLOB_CHUNK_SIZE - 100
+        self.assertEqual(b"".join(self.store.open_stream(key, start, 300)), self.data[start:start + 300])
+        # intervallo aperto: dal byte start alla fine
+        self.assertEqual(b"".join(self.store.open_stream(key, start)), self.data[start:])
+        self.assertEqual(b"".join(self.store.open_stream(key, 0, 1)), self.data[:1])
+
+    def test_delete(self):
+        key = self._put(b"glTF")
+        self.assertTrue(self.store.delete(key))
+        self.assertFalse(self.store.exists(key))
+        with self.assertRaises(BlobNotFound):
+            self.store.get(key)
+        with self.assertRaises(BlobNotFound):
+            list(self.store.open_stream(key))
+
+    def test_missing_key(self):
+        self.assertFalse(self.store.exists("missing.glb"))
+        with self.assertRaises(BlobNotFound):
+            self.store.size("missing.glb")
+
+    def test_multipart_upload(self):
+        key = f"uploads/{uuid.uuid4().hex}.glb"
+        data = os.urandom(PART_SIZE + 12345)
+        handle = self.store.start_multipart(key, "model/gltf-binary")
+        # parti inviate fuori ordine, la prima due volte (reinvio dopo un errore)
+        parts = {}
+        for part_number in (2, 1, 1):
+            start = (part_number - 1) * PART_SIZE
+            parts[part_number] = self.store.put_part(key, handle, part_number,
+                                                     io.BytesIO(data[start:start + PART_SIZE]), PART_SIZE)
+        self.assertEqual(parts[2]["size"], 12345)
+
+        ordered = sorted(parts.items())
+        self.store.complete_multipart(key, handle, ordered, len(data), "model/gltf-binary")
+        self.assertEqual(self.store.get(key), data)
+        # /complete ripetuto dopo un errore successivo: il blob resta quello completato
+        self.store.complete_multipart(key, handle, ordered, len(data), "model/gltf-binary")
+        self.assertEqual(self.store.size(key), len(data))
+
+
+@unittest.skipUnless(_mongo_available(), f"MongoDB not reachable at {uri}")
+class GridFSBlobStoreTest(BlobStoreCases, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bucket = f"test_blobs_{uuid.uuid4().hex[:12]}"
+        cls.store = GridFSBlobStore(bucket_name=cls.bucket)
+
+    @classmethod
+    def tearDownClass(cls):
+        get_db().drop_collection(f"{cls.bucket}.files")
+        get_db().drop_collection(f"{cls.bucket}.chunks")
+
+
+@unittest.skipUnless(_localstack_available(), f"LocalStack not reachable at {AWS_ENDPOINT_URL}")
+class S3BlobStoreTest(BlobStoreCases, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # bucket dedicato a ogni esecuzione, eliminato alla fine
+        cls.bucket = f"test-models-{uuid.uuid4().hex[:12]}"
+        # us-east-1 non accetta LocationConstraint
+        location = {} if AWS_DEFAULT_REGION == "us-east-1" else \
+            {"CreateBucketConfiguration": {"LocationConstraint": AWS_DEFAULT_REGION}}
+        get_s3_client().create_bucket(Bucket=cls.bucket, **location)
+        cls.store = S3BlobStore(bucket_name=cls.bucket, prefix="models/")
+
+    @classmethod
+    def tearDownClass(cls):
+        s3 = get_s3_client()
+        for item in s3.list_objects_v2(Bucket=cls.bucket).get("Contents", []):
+            s3.delete_object(Bucket=cls.bucket, Key=item["Key"])
+        s3.delete_bucket(Bucket=cls.bucket)
+
+    def test_content_type(self):
+        key = self._put()
+        head = get_s3_client().head_object(Bucket=self.bucket, Key=f"models/{key}")
+        self.assertEqual(head["ContentType"], "model/gltf-binary")
+
+
+if __name__ == "__main__":
+    unittest.main()
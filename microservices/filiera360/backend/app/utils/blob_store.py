@@ -0,0 +1,280 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from bson import Binary
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+
+from ..database_mongo.mongo_client import get_db
+from .s3_utils import get_s3_client
+
+# Backend per i file dei modelli 3D: gridfs (default) oppure s3
+MODEL_BLOB_STORE = os.getenv("MODEL_BLOB_STORE", "gridfs")
+MODEL_BLOB_GRIDFS_BUCKET = os.getenv("MODEL_BLOB_GRIDFS_BUCKET", "model_blobs")
+MODEL_BLOB_S3_BUCKET = os.getenv("MODEL_BLOB_S3_BUCKET", "ecofood-models")
+MODEL_BLOB_S3_PREFIX = os.getenv("MODEL_BLOB_S3_PREFIX", "models/")
+
+# Dimensione dei blocchi letti/scritti in streaming
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+def _read_full(source, size):
+    """Legge fino a size byte da source: gli stream WSGI possono restituire meno byte per chiamata."""
+    data = bytearray()
+    while len(data) < size:
+        piece = source.read(size - len(data))
+        if not piece:
+            break
+        data.extend(piece)
+    return bytes(data)
+
+
+class GridFSBlobStore:
+    """Blob su GridFS, nello stesso database dell'applicazione. La chiave è l'_id del file."""
+
+    name = "gridfs"
+
+    def __init__(self, bucket_name=MODEL_BLOB_GRIDFS_BUCKET):
+        self.bucket_name = bucket_name
+        self._chunks_index_ready = False
+
+    def _bucket(self):
+        return GridFSBucket(get_db(), bucket_name=self.bucket_name, chunk_size_bytes=BLOB_CHUNK_SIZE)
+
+    def _chunks_collection(self):
+        chunks = get_db()[f"{self.bucket_name}.chunks"]
+        if not self._chunks_index_ready:
+            # lo stesso indice che il driver crea al primo upload_from_stream
+            chunks.create_index([("files_id", 1), ("n", 1)], unique=True)
+            self._chunks_index_ready = True
+        return chunks
+
+    def put(self, key, source, content_type=None):
+        """source: bytes o file-like letto a blocchi. Sovrascrive un blob con la stessa chiave."""
+        self.delete(key)
+        metadata = {"contentType": content_type} if content_type else None
+        bucket = self._bucket()
+        if isinstance(source, (bytes, bytearray)):
+            bucket.upload_from_stream_with_id(key, key, bytes(source), metadata=metadata)
+        else:
+            bucket.upload_from_stream_with_id(key, key, source, metadata=metadata)
+
+    def get(self, key):
+        try:
+            return self._bucket().open_download_stream(key).read()
+        except NoFile:
+            raise BlobNotFound(key)
+
+    def size(self, key):
+        try:
+            return self._bucket().open_download_stream(key).length
+        except NoFile:
+            raise BlobNotFound(key)
+
+    def open_stream(self, key, start=0, length=None):
+        """Generatore di blocchi da BLOB_CHUNK_SIZE a partire dal byte start, per length byte (o fino alla fine)."""
+        try:
+            grid_out = self._bucket().open_download_stream(key)
+        except NoFile:
+            raise BlobNotFound(key)
+
+        remaining = grid_out.length - start if length is None else length
+
+        def _chunks():
+            with grid_out:
+                grid_out.seek(start)
+                left = remaining
+                while left > 0:
+                    chunk = grid_out.read(min(BLOB_CHUNK_SIZE, left))
+                    if not chunk:
+                        break
+                    left -= len(chunk)
+                    yield chunk
+
+        return _chunks()
+
+    def exists(self, key):
+        return get_db()[f"{self.bucket_name}.files"].count_documents({"_id": key}, limit=1) > 0
+
+    def delete(self, key):
+        try:
+            self._bucket().delete(key)
+            return True
+        except NoFile:
+            return False
+
+    # --- Upload multipart ---
+    # Le parti vengono scritte direttamente come chunk GridFS del file `key`; il documento in
+    # <bucket>.files viene creato al completamento. part_size deve essere multiplo di BLOB_CHUNK_SIZE.
+
+    def start_multipart(self, key, content_type=None):
+        self._chunks_collection().delete_many({"files_id": key})
+        return key
+
+    def put_part(self, key, handle, part_number, source, part_size):
+        chunks = self._chunks_collection()
+        n = (part_number - 1) * (part_size // BLOB_CHUNK_SIZE)
+        written = 0
+        while True:
+            data = _read_full(source, BLOB_CHUNK_SIZE)
+            if not data:
+                break
+            # replace_one rende idempotente il reinvio di una parte
+            chunks.replace_one({"files_id": key, "n": n}, {"files_id": key, "n": n, "data": Binary(data)},
+                               upsert=True)
+            written += len(data)
+            n += 1
+        return {"size": written}
+
+    def complete_multipart(self, key, handle, parts, size, content_type=None):
+        # chunk residui di un'ultima parte reinviata con meno byte
+        total_chunks = -(-size // BLOB_CHUNK_SIZE)
+        self._chunks_collection().delete_many({"files_id": key, "n": {"$gte": total_chunks}})
+        files_doc = {
+            "_id": key,
+            "length": size,
+            "chunkSize": BLOB_CHUNK_SIZE,
+            "uploadDate": datetime.now(timezone.utc),
+            "filename": key,
+        }
+        if content_type:
+            files_doc["metadata"] = {"contentType": content_type}
+        # replace_one: un /complete ripetuto dopo un errore successivo (sessione riaperta) riscrive lo stesso documento
+        get_db()[f"{self.bucket_name}.files"].replace_one({"_id": key}, files_doc, upsert=True)
+
+    def abort_multipart(self, key, handle):
+        self._chunks_collection().delete_many({"files_id": key})
+
+
+class S3BlobStore:
+    """Blob su S3 (in sviluppo LocalStack). La chiave diventa <prefix><key> nel bucket."""
+
+    name = "s3"
+
+    def __init__(self, bucket_name=MODEL_BLOB_S3_BUCKET, prefix=MODEL_BLOB_S3_PREFIX):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def _object_key(self, key):
+        return f"{self.prefix}{key}"
+
+    def put(self, key, source, content_type=None):
+        extra_args = {"ContentType": content_type} if content_type else {}
+        if isinstance(source, (bytes, bytearray)):
+            get_s3_client().put_object(Bucket=self.bucket_name, Key=self._object_key(key), Body=bytes(source),
+                                       **extra_args)
+        else:
+            # upload_fileobj spezza lo stream in parti multipart senza leggerlo tutto in memoria
+            get_s3_client().upload_fileobj(source, self.bucket_name, self._object_key(key),
+                                           ExtraArgs=extra_args or None)
+
+    def get(self, key):
+        s3 = get_s3_client()
+        try:
+            response = s3.get_object(Bucket=self.bucket_name, Key=self._object_key(key))
+        except s3.exceptions.NoSuchKey:
+            raise BlobNotFound(key)
+        return response["Body"].read()
+
+    def size(self, key):
+        s3 = get_s3_client()
+        try:
+            response = s3.head_object(Bucket=self.bucket_name, Key=self._object_key(key))
+        except s3.exceptions.ClientError:
+            raise BlobNotFound(key)
+        return response["ContentLength"]
+
+    def open_stream(self, key, start=0, length=None):
+        """Generatore di blocchi da BLOB_CHUNK_SIZE; il range viene richiesto direttamente a S3."""
+        s3 = get_s3_client()
+        request = {"Bucket": self.bucket_name, "Key": self._object_key(key)}
+        if start or length is not None:
+            end = "" if length is None else start + length - 1
+            request["Range"] = f"bytes={start}-{end}"
+        try:
+            response = s3.get_object(**request)
+        except s3.exceptions.NoSuchKey:
+            raise BlobNotFound(key)
+
+        def _chunks():
+            body = response["Body"]
+            try:
+                for chunk in body.iter_chunks(BLOB_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                body.close()
+
+        return _chunks()
+
+    def exists(self, key):
+        try:
+            self.size(key)
+            return True
+        except BlobNotFound:
+            return False
+
+    def delete(self, key):
+        get_s3_client().delete_object(Bucket=self.bucket_name, Key=self._object_key(key))
+        return True
+
+    # --- Upload multipart (API nativa di S3, parti da almeno 5 MB tranne l'ultima) ---
+
+    def start_multipart(self, key, content_type=None):
+        extra_args = {"ContentType": content_type} if content_type else {}
+        response = get_s3_client().create_multipart_upload(Bucket=self.bucket_name, Key=self._object_key(key),
+                                                           **extra_args)
+        return response["UploadId"]
+
+    def put_part(self, key, handle, part_number, source, part_size):
+        # upload_part richiede un body di lunghezza nota: la parte passa da un file temporaneo
+        # che resta in memoria solo fino a BLOB_CHUNK_SIZE
+        with tempfile.SpooledTemporaryFile(max_size=BLOB_CHUNK_SIZE) as spool:
+            shutil.copyfileobj(source, spool, BLOB_CHUNK_SIZE)
+            size = spool.tell()
+            spool.seek(0)
+            response = get_s3_client().upload_part(Bucket=self.bucket_name, Key=self._object_key(key),
+                                                   UploadId=handle, PartNumber=part_number,
+                                                   Body=spool, ContentLength=size)
+        return {"size": size, "etag": response["ETag"]}
+
+    def complete_multipart(self, key, handle, parts, size, content_type=None):
+        # un /complete ripetuto dopo un errore successivo (sessione riaperta) trova l'oggetto già creato:
+        # complete_multipart_upload risponderebbe NoSuchUpload, quindi la chiamata si salta
+        try:
+            if self.size(key) == size:
+                return
+        except BlobNotFound:
+            pass
+        get_s3_client().complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self._object_key(key),
+            UploadId=handle,
+            MultipartUpload={"Parts": [{"ETag": part["etag"], "PartNumber": part_number}
+                                       for part_number, part in parts]}
+        )
+
+    def abort_multipart(self, key, handle):
+        get_s3_client().abort_multipart_upload(Bucket=self.bucket_name, Key=self._object_key(key), UploadId=handle)
+
+
+_stores = {
+    "gridfs": GridFSBlobStore,
+    "s3": S3BlobStore,
+}
+_instances = {}
+
+
+def get_blob_store(name=None):
+    """Restituisce il blob store configurato (MODEL_BLOB_STORE) o quello indicato per nome."""
+    name = name or MODEL_BLOB_STORE
+    if name not in _stores:
+        raise ValueError(f"Unknown blob store '{name}'")
+    if name not in _instances:
+        _instances[name] = _stores[name]()
+    return _instances[name]
@@ -1,24 +1,56 @@
-import requests
 import os
+
+from ..database_mongo.queries.products_queries import get_product_owner, set_product_owner
+from .http_client import http_get
+
 MIDDLEWARE_BASE_URL = os.environ.get('MIDDLEWARE_URL', 'http://filiera-middleware:3000')
+# Autorizzazione di scrittura tramite l'indice locale prodotto -> manufacturer (collection products)
+OWNERSHIP_INDEX_ENABLED = os.getenv("OWNERSHIP_INDEX_ENABLED", "True") == "True"
 
-def verify_manufacturer(product_id, real_manufacturer):
+def is_indexed_owner(product_id, manufacturer):
     """
-    Verifica che il manufacturer autenticato corrisponda al manufacturer registrato sulla blockchain per un prodotto.
-    Restituisce None se la verifica passa, altrimenti jsonify con errore e status code.
+    True se l'indice locale conferma che il prodotto appartiene a manufacturer.
+    Solo le risposte positive sono locali: un prodotto assente o con un altro manufacturer
+    viene sempre verificato sul ledger prima di negare l'accesso.
+    """
+    if not OWNERSHIP_INDEX_ENABLED or not manufacturer:
+        return False
+    return get_product_owner(product_id) == manufacturer
+
+def read_ledger_manufacturer(product_id):
+    """
+    Legge dal ledger il manufacturer del prodotto e aggiorna l'indice locale.
+    Restituisce (manufacturer, None) oppure (None, (errore, status)).
     """
     try:
-        blockchain_response = requests.get(f'{MIDDLEWARE_BASE_URL}/readProduct?productId={product_id}')
-        if blockchain_response.status_code == 200:
-            blockchain_data = blockchain_response.json()
-            registered_manufacturer = blockchain_data.get("Manufacturer")
-            if not registered_manufacturer:
-                return {"message": "Manufacturer not found on blockchain."}, 404
-            if real_manufacturer != registered_manufacturer:
-                return {"message": "Unauthorized: Manufacturer mismatch."}, 403
-            return None  # Nessun errore
-        else:
-            return {"message": "Failed to retrieve product from blockchain."}, 500
+        blockchain_response = http_get(f'{MIDDLEWARE_BASE_URL}/readProduct?productId={product_id}')
+        if blockchain_response.status_code != 200:
+            return None, ({"message": "Failed to retrieve product from blockchain."}, 500)
+        registered_manufacturer = blockchain_response.json().get("Manufacturer")
+        if not registered_manufacturer:
+            return None, ({"message": "Manufacturer not found on blockchain."}, 404)
     except Exception as e:
         print("Error connecting to blockchain:", e)
-        return {"message": "Error retrieving product from blockchain."}, 500
\ No newline at end of file
+        return None, ({"message": "Error retrieving product from blockchain."}, 500)
+
+    if OWNERSHIP_INDEX_ENABLED:
+        try:
+            set_product_owner(product_id, registered_manufacturer)
+        except Exception as e:
+            print(f"[blockchain_utils] Cannot update ownership index for {product_id}: {e}")
+    return registered_manufacturer, None
+
+def verify_manufacturer(product_id, real_manufacturer):
+    """
+    Verifica che il manufacturer autenticato corrisponda al manufacturer registrato sulla blockchain per un prodotto.
+    Restituisce None se la verifica passa, altrimenti jsonify con errore e status code.
+    """
+    if is_indexed_owner(product_id, real_manufacturer):
+        return None  # Nessun errore, una lettura indicizzata su MongoDB
+
+    registered_manufacturer, error = read_ledger_manufacturer(product_id)
+    if error:
+        return error
+    if real_manufacturer != registered_manufacturer:
+        return {"message": "Unauthorized: Manufacturer mismatch."}, 403
+    return None  # Nessun errore
@@ -0,0 +1,69 @@
+import json
+
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(file, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    """
+    Restituisce uno alla volta gli elementi dell'array JSON di primo livello contenuto in file
+    (aperto in modalità testo), leggendo a blocchi: in memoria resta solo l'elemento corrente.
+    Solleva ValueError se il contenuto non è un array JSON valido.
+    """
+    buffer = ""
+    position = 0
+    eof = False
+
+    def _fill():
+        nonlocal buffer, position, eof
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def _skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            _fill()
+
+    _skip_whitespace()
+    if position >= len(buffer) or buffer[position] != "[":
+        raise ValueError("Expected a JSON array")
+    position += 1
+
+    first = True
+    while True:
+        _skip_whitespace()
+        if position >= len(buffer):
+            raise ValueError("Unexpected end of JSON array")
+        if buffer[position] == "]":
+            return
+        if not first:
+            if buffer[position] != ",":
+                raise ValueError(f"Expected ',' in JSON array, found {buffer[position]!r}")
+            position += 1
+            _skip_whitespace()
+        first = False
+
+        while True:
+            try:
+                element, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("Invalid JSON element in array")
+                _fill()
+                continue
+            # un numero troncato a fine blocco verrebbe decodificato a metà: serve un delimitatore dopo
+            if end == len(buffer) and not eof:
+                _fill()
+                continue
+            break
+        position = end
+        yield element
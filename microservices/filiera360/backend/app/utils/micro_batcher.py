@@ -0,0 +1,90 @@
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Raggruppa per chiave (es. id prodotto) gli elementi inviati da richieste diverse e li consegna
+    a flush_fn(key, items) in un'unica chiamata, quando il gruppo raggiunge max_items elementi
+    o dopo max_wait_seconds dal primo elemento in attesa.
+    flush_fn restituisce un risultato per elemento, nello stesso ordine; ogni submit riceve un Future
+    risolto con il risultato del proprio elemento.
+    I flush della stessa chiave sono serializzati: due transazioni sullo stesso prodotto nello stesso
+    blocco andrebbero in conflitto MVCC sul ledger. I gruppi pronti di una chiave attendono in coda e
+    vengono inviati all'executor uno alla volta, così nessun worker resta fermo ad aspettare la chiave.
+    """
+
+    def __init__(self, flush_fn, executor, max_items=100, max_wait_seconds=0.2):
+        self.flush_fn = flush_fn
+        self.executor = executor
+        self.max_items = max_items
+        self.max_wait_seconds = max_wait_seconds
+        self._pending = {}  # key -> {"items": [...], "futures": [...], "timer": Timer}
+        self._ready = {}  # key -> deque dei gruppi pronti; presente solo mentre un flush della chiave è in corso
+        self._lock = threading.Lock()
+
+    def submit(self, key, item):
+        future = Future()
+        with self._lock:
+            group = self._pending.get(key)
+            if group is None:
+                timer = threading.Timer(self.max_wait_seconds, self._flush_key, args=(key,))
+                timer.daemon = True
+                group = {"items": [], "futures": [], "timer": timer}
+                self._pending[key] = group
+                timer.start()
+            group["items"].append(item)
+            group["futures"].append(future)
+            full = len(group["items"]) >= self.max_items
+            if full:
+                # gruppo pieno: parte subito, i successivi elementi aprono un nuovo gruppo
+                self._pending.pop(key)
+                group["timer"].cancel()
+        if full:
+            self._enqueue(key, group)
+        return future
+
+    def _flush_key(self, key):
+        with self._lock:
+            group = self._pending.pop(key, None)
+        if group:
+            self._enqueue(key, group)
+
+    def _enqueue(self, key, group):
+        with self._lock:
+            queue = self._ready.get(key)
+            if queue is not None:
+                # flush della chiave in corso: il gruppo partirà al suo termine
+                queue.append(group)
+                return
+            self._ready[key] = deque()
+        self.executor.submit(self._flush, key, group)
+
+    def _flush(self, key, group):
+        try:
+            results = self.flush_fn(key, group["items"])
+        except Exception as e:
+            for future in group["futures"]:
+                future.set_exception(e)
+        else:
+            for future, result in zip(group["futures"], results):
+                future.set_result(result)
+        finally:
+            with self._lock:
+                queue = self._ready[key]
+                next_group = queue.popleft() if queue else None
+                if next_group is None:
+                    # nessun gruppo in attesa: la chiave non occupa più memoria
+                    del self._ready[key]
+            if next_group is not None:
+                self.executor.submit(self._flush, key, next_group)
+
+    def flush_all(self):
+        """Consegna subito tutti i gruppi in attesa (es. in chiusura)."""
+        with self._lock:
+            groups = list(self._pending.items())
+            self._pending.clear()
+        for key, group in groups:
+            group["timer"].cancel()
+            self._enqueue(key, group)
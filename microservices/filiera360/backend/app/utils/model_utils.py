@@ -0,0 +1,357 @@
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+import zlib
+from urllib.parse import quote
+
+try:
+    import brotli
+except ImportError:  # brotli è opzionale: senza il pacchetto si genera solo la variante gzip
+    brotli = None
+
+from ..database_mongo.models.model_content_model import create_model_content_model
+from ..database_mongo.queries.model_contents_queries import add_model_content_ref, create_model_content, \
+    delete_unreferenced_model_content, get_model_content, release_model_content_ref, set_model_content_thumbnail, \
+    set_model_content_variant
+from ..database_mongo.queries.models_queries import upsert_model_for_product
+from ..extensions import executor
+from .blob_store import BLOB_CHUNK_SIZE, BlobNotFound, get_blob_store
+from .thumbnail_utils import extract_glb_image, make_thumbnail, thumbnails_enabled
+
+DEFAULT_MODEL_CONTENT_TYPE = "model/gltf-binary"
+
+# Upload a parti: parti in MB (multiple dei chunk GridFS, minimo 5 MB come richiesto da S3)
+MODEL_UPLOAD_PART_SIZE = max(5, int(os.getenv("MODEL_UPLOAD_PART_SIZE_MB", 8))) * BLOB_CHUNK_SIZE
+MODEL_UPLOAD_MAX_SIZE = int(os.getenv("MODEL_UPLOAD_MAX_SIZE_MB", 512)) * 1024 * 1024
+# Dopo questo tempo senza completamento la sessione viene annullata e le parti eliminate
+MODEL_UPLOAD_EXPIRE_HOURS = int(os.getenv("MODEL_UPLOAD_EXPIRE_HOURS", 24))
+
+# Varianti precompresse generate una volta per contenuto, in ordine di preferenza
+MODEL_PRECOMPRESSED_ENCODINGS = [
+    encoding for encoding in os.getenv("MODEL_PRECOMPRESSED_ENCODINGS", "br,gzip").split(",")
+    if encoding == "gzip" or (encoding == "br" and brotli is not None)
+]
+# Una variante viene tenuta solo se risparmia almeno questa frazione della dimensione originale
+MODEL_VARIANT_MIN_SAVING = float(os.getenv("MODEL_VARIANT_MIN_SAVING", 0.05))
+_VARIANT_EXTENSIONS = {"gzip": "gz", "br": "br"}
+# Tentativi di creare il documento del contenuto o di aggiungervi un riferimento (upload concorrenti)
+MODEL_CONTENT_REF_ATTEMPTS = 5
+
+
+class HashingReader:
+    """File-like in sola lettura: legge al massimo limit byte da stream aggiornando hasher (se presente)."""
+
+    def __init__(self, stream, hasher=None, limit=None):
+        self._stream = stream
+        self.hasher = hasher
+        self._remaining = limit
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        if self._remaining is not None:
+            if self._remaining <= 0:
+                return b""
+            size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._stream.read(size)
+        if self.hasher is not None:
+            self.hasher.update(data)
+        self.bytes_read += len(data)
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return data
+
+
+# Hash incrementale degli upload a parti: upload_id -> (ultima parte inclusa, hasher).
+# È solo un'ottimizzazione del processo corrente: se manca (riavvio, altro worker, parti fuori
+# ordine) l'hash viene ricalcolato dal blob completato.
+_upload_hashes = {}
+_upload_hashes_lock = threading.Lock()
+
+
+def decode_model_data_url(model_string):
+    """
+    Il frontend invia il GLB come data URL (data:<mime>;base64,<dati>) o come base64 puro.
+    Restituisce (content_type, bytes); ValueError se la codifica non è valida.
+    """
+    content_type = DEFAULT_MODEL_CONTENT_TYPE
+    payload = model_string
+    if model_string.startswith("data:") and "," in model_string:
+        header, payload = model_string.split(",", 1)
+        mime = header[len("data:"):].split(";", 1)[0]
+        if mime:
+            content_type = mime
+    try:
+        return content_type, base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid base64 model data")
+
+
+def encode_model_data_url(content_type, data):
+    return f"data:{content_type or DEFAULT_MODEL_CONTENT_TYPE};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def model_download_url(blockchain_product_id, content_hash=None):
+    """URL di download del modello; con l'hash del contenuto la risposta è cacheabile per sempre (immutable)."""
+    url = f"/models/{quote(blockchain_product_id, safe='')}.glb"
+    return f"{url}?v={content_hash}" if content_hash else url
+
+
+def model_blob_key(content_hash):
+    # suffisso casuale: un contenuto eliminato e subito ricaricato non riusa la chiave del blob in cancellazione
+    return f"{content_hash}-{uuid.uuid4().hex[:12]}.glb"
+
+
+def store_model(blockchain_product_id, model_bytes, content_type, uploaded_by):
+    """
+    Collega il GLB al prodotto. Il file è salvato una sola volta per hash SHA-256 (in
+    `model_contents`, con conteggio dei riferimenti); se è già presente non viene riscritto.
+    """
+    content_hash = hashlib.sha256(model_bytes).hexdigest()
+    if not add_model_content_ref(content_hash):
+        store = get_blob_store()
+        blob_key = model_blob_key(content_hash)
+        store.put(blob_key, model_bytes, content_type)
+        _create_content_or_add_ref(content_hash, len(model_bytes), content_type, store, blob_key)
+
+    _link_product_model(blockchain_product_id, content_hash, len(model_bytes), content_type, uploaded_by)
+    return content_hash
+
+
+def register_uploaded_model(blockchain_product_id, content_hash, size, blob_key, store, content_type, uploaded_by):
+    """
+    Collega al prodotto un blob già scritto (upload a parti). Se lo stesso contenuto è già
+    presente la copia appena caricata viene eliminata.
+    """
+    if add_model_content_ref(content_hash):
+        store.delete(blob_key)
+    else:
+        _create_content_or_add_ref(content_hash, size, content_type, store, blob_key)
+
+    _link_product_model(blockchain_product_id, content_hash, size, content_type, uploaded_by)
+    return content_hash
+
+
+def _create_content_or_add_ref(content_hash, size, content_type, store, blob_key):
+    # il contenuto può essere creato ed eliminato da altri upload tra i due passi: pochi tentativi, poi errore
+    for _ in range(MODEL_CONTENT_REF_ATTEMPTS):
+        if create_model_content(create_model_content_model(content_hash, size, content_type, store.name, blob_key)):
+            schedule_model_processing(content_hash)
+            return
+        # un upload concorrente ha creato lo stesso contenuto: si usa il suo blob
+        if add_model_content_ref(content_hash):
+            store.delete(blob_key)
+            return
+    raise RuntimeError(f"Cannot register model content {content_hash}: it keeps being created and deleted.")
+
+
+def _link_product_model(blockchain_product_id, content_hash, size, content_type, uploaded_by):
+    try:
+        previous = upsert_model_for_product(blockchain_product_id, content_hash, size, content_type, uploaded_by)
+    except Exception:
+        release_model_content(content_hash)
+        raise
+
+    if not previous:
+        return
+    if previous.get("blobKey"):
+        # documento precedente ai contenuti condivisi: il blob apparteneva solo a questo prodotto
+        get_blob_store(previous.get("storage")).delete(previous["blobKey"])
+    elif previous.get("contentHash"):
+        release_model_content(previous["contentHash"])
+
+
+def release_model_content(content_hash):
+    """Rilascia un riferimento al contenuto; all'ultimo vengono eliminati blob e varianti."""
+    content = release_model_content_ref(content_hash)
+    if not content or content["refCount"] > 0:
+        return
+    content = delete_unreferenced_model_content(content_hash)
+    if not content:
+        return
+    store = get_blob_store(content["storage"])
+    store.delete(content["blobKey"])
+    for variant in content.get("variants", {}).values():
+        store.delete(variant["blobKey"])
+    if content.get("thumbnail"):
+        store.delete(content["thumbnail"]["blobKey"])
+
+
+def resolve_model_content(model):
+    """Documento di `models` completato con posizione del blob e varianti del contenuto condiviso."""
+    if model.get("blobKey") or "modelString" in model:
+        # documenti precedenti ai contenuti condivisi
+        return model
+    content = get_model_content(model["contentHash"])
+    if not content:
+        raise BlobNotFound(model["contentHash"])
+    return {**model, "storage": content["storage"], "blobKey": content["blobKey"],
+            "variants": content.get("variants", {})}
+
+
+def _compress_chunks(encoding, chunks):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=11)
+        for chunk in chunks:
+            yield compressor.process(chunk)
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 31)  # wbits 31: formato gzip
+        for chunk in chunks:
+            yield compressor.compress(chunk)
+        yield compressor.flush()
+
+
+def build_model_variants(content_hash):
+    """Genera (una sola volta) le varianti precompresse del contenuto, leggendo e scrivendo in streaming."""
+    content = get_model_content(content_hash)
+    if not content:
+        return
+    store = get_blob_store(content["storage"])
+
+    for encoding in MODEL_PRECOMPRESSED_ENCODINGS:
+        if encoding in content.get("variants", {}):
+            continue
+        variant_key = f"{content['blobKey']}.{_VARIANT_EXTENSIONS[encoding]}"
+        with tempfile.SpooledTemporaryFile(max_size=BLOB_CHUNK_SIZE) as spool:
+            for compressed in _compress_chunks(encoding, store.open_stream(content["blobKey"])):
+                spool.write(compressed)
+            size = spool.tell()
+            if size > content["size"] * (1 - MODEL_VARIANT_MIN_SAVING):
+                continue  # il GLB è già compresso (es. texture JPEG/KTX2): non conviene
+            spool.seek(0)
+            store.put(variant_key, spool, content["contentType"])
+
+        if not set_model_content_variant(content_hash, encoding, {"blobKey": variant_key, "size": size}):
+            # contenuto eliminato durante la compressione
+            store.delete(variant_key)
+            return
+
+
+def build_model_thumbnail(content_hash):
+    """Anteprima JPEG dalla texture principale del GLB, generata una sola volta per contenuto."""
+    content = get_model_content(content_hash)
+    if not content or "thumbnail" in content or not thumbnails_enabled():
+        return
+    store = get_blob_store(content["storage"])
+
+    thumbnail = None
+    try:
+        image_bytes = extract_glb_image(store, content["blobKey"], content["size"])
+        thumbnail_bytes = make_thumbnail(image_bytes) if image_bytes else None
+        if thumbnail_bytes:
+            thumbnail = {"blobKey": f"{content['blobKey']}.thumb.jpg", "contentType": "image/jpeg",
+                         "size": len(thumbnail_bytes)}
+            store.put(thumbnail["blobKey"], thumbnail_bytes, thumbnail["contentType"])
+    except Exception as e:
+        # GLB corrotto o non leggibile: l'esito (nessuna anteprima) si salva comunque,
+        # altrimenti catalogo e dashboard ripianificherebbero il job rileggendo tutto il blob
+        print(f"[model_contents] Thumbnail not available for {content_hash}: {e}")
+        thumbnail = None
+
+    if not set_model_content_thumbnail(content_hash, thumbnail) and thumbnail:
+        store.delete(thumbnail["blobKey"])
+
+
+def _process_model_content_job(content_hash):
+    try:
+        for build in (build_model_variants, build_model_thumbnail):
+            try:
+                build(content_hash)
+            except Exception as e:
+                print(f"[model_contents] Error in {build.__name__} for {content_hash}: {e}")
+    finally:
+        # a job concluso il contenuto può essere ripianificato (es. dal catalogo dopo un errore)
+        with _scheduled_contents_lock:
+            _scheduled_contents.discard(content_hash)
+
+
+# contenuti con un job in coda o in esecuzione in questo processo (evita job doppi dal catalogo)
+_scheduled_contents = set()
+_scheduled_contents_lock = threading.Lock()
+
+
+def schedule_model_processing(content_hash):
+    """Varianti precompresse e anteprima del contenuto, generate in background."""
+    with _scheduled_contents_lock:
+        if content_hash in _scheduled_contents:
+            return
+        _scheduled_contents.add(content_hash)
+    try:
+        executor.submit(_process_model_content_job, content_hash)
+    except RuntimeError:
+        # executor chiuso (arresto del processo)
+        with _scheduled_contents_lock:
+            _scheduled_contents.discard(content_hash)
+
+
+def load_model_bytes(model):
+    """Contenuto del modello dal blob store (o dal campo inline se il documento non è ancora migrato)."""
+    if model.get("blobKey"):
+        return get_blob_store(model.get("storage")).get(model["blobKey"])
+    _, model_bytes = decode_model_data_url(model["modelString"])
+    return model_bytes
+
+
+def open_model_stream(model, start=0, length=None, encoding=None):
+    """
+    Generatore dei byte del modello nell'intervallo richiesto, senza caricarlo tutto in memoria.
+    Con encoding restituisce la variante precompressa (model deve venire da resolve_model_content).
+    """
+    if encoding:
+        return get_blob_store(model.get("storage")).open_stream(model["variants"][encoding]["blobKey"], start, length)
+    if model.get("blobKey"):
+        return get_blob_store(model.get("storage")).open_stream(model["blobKey"], start, length)
+
+    # documento non migrato: il GLB inline è già in memoria
+    model_bytes = load_model_bytes(model)
+    end = len(model_bytes) if length is None else start + length
+    return iter([model_bytes[start:end]])
+
+
+def upload_blob_key(upload_id):
+    return f"uploads/{upload_id}.glb"
+
+
+def open_part_reader(upload_id, part_number, stream, limit):
+    """
+    Reader della parte part_number: se le parti precedenti sono già state hashate in ordine,
+    l'hash prosegue su una copia dello stato (confermata con commit_part_hash).
+    """
+    with _upload_hashes_lock:
+        state = _upload_hashes.get(upload_id)
+        if part_number == 1:
+            hasher = hashlib.sha256()
+        elif state and state[0] == part_number - 1:
+            hasher = state[1].copy()
+        else:
+            hasher = None
+            if state and part_number <= state[0]:
+                # una parte già hashata viene riscritta: lo stato non è più affidabile
+                _upload_hashes.pop(upload_id, None)
+    return HashingReader(stream, hasher, limit)
+
+
+def commit_part_hash(upload_id, part_number, reader):
+    with _upload_hashes_lock:
+        if reader.hasher is not None:
+            _upload_hashes[upload_id] = (part_number, reader.hasher)
+
+
+def pop_upload_hash(upload_id, total_parts):
+    """Hash dell'upload se tutte le parti sono state hashate in ordine da questo processo, altrimenti None."""
+    with _upload_hashes_lock:
+        state = _upload_hashes.pop(upload_id, None)
+    if state and state[0] == total_parts:
+        return state[1].hexdigest()
+    return None
+
+
+def hash_blob(store, blob_key):
+    hasher = hashlib.sha256()
+    for chunk in store.open_stream(blob_key):
+        hasher.update(chunk)
+    return hasher.hexdigest()
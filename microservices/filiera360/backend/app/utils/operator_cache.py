@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+from ..database_mongo.queries.cache_versions_queries import bump_cache_version, get_cache_version
+from ..database_mongo.queries.operators_queries import find_operator_producer, get_all_operator_producers
+
+# Mappa in memoria email operatore -> produttore, condivisa tra le richieste del worker.
+# La versione in cache_versions segnala agli altri worker che la mappa va ricaricata.
+OPERATOR_CACHE_NAME = "operator_producers"
+# Ogni quanto (secondi) confrontare la versione locale con quella su MongoDB; 0 = a ogni lettura
+OPERATOR_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("OPERATOR_CACHE_VERSION_CHECK_SECONDS", 2))
+
+_operator_producers = {}
+_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _producer_entry(operator):
+    return {"_id": operator["producerId"], "email": operator["producerEmail"], "manufacturer": operator["manufacturer"]}
+
+
+def load_operator_producers():
+    """Ricarica l'intera mappa; chiamata all'avvio del worker e quando la versione cambia."""
+    global _operator_producers, _version, _checked_at
+    # la versione viene letta prima dei dati: una modifica concorrente lascia la mappa "vecchia" e forza un nuovo reload
+    version = get_cache_version(OPERATOR_CACHE_NAME)
+    mapping = {}
+    for operator in get_all_operator_producers():
+        # vale la prima associazione, come in find_operator_producer
+        mapping.setdefault(operator["email"], _producer_entry(operator))
+    with _lock:
+        _operator_producers = mapping
+        _version = version
+        _checked_at = time.monotonic()
+    return len(mapping)
+
+
+def _ensure_fresh():
+    global _checked_at
+    if _version is not None and time.monotonic() - _checked_at < OPERATOR_CACHE_VERSION_CHECK_SECONDS:
+        return
+    if _version is None or get_cache_version(OPERATOR_CACHE_NAME) != _version:
+        load_operator_producers()
+    else:
+        _checked_at = time.monotonic()
+
+
+def get_producer_for_operator(operator_email):
+    """Produttore ({_id, email, manufacturer}) a cui è associato l'operatore, o None."""
+    _ensure_fresh()
+    return _operator_producers.get(operator_email)
+
+
+def operator_producers_changed(operator_email=None):
+    """
+    Da chiamare dopo l'aggiunta o la rimozione di un operatore: invalida la mappa negli altri worker.
+    Nel worker corrente viene riletta solo l'associazione dell'operatore, se nessun'altra modifica
+    è avvenuta nel frattempo; altrimenti (o senza operator_email) la mappa viene ricaricata.
+    """
+    global _version, _checked_at
+    new_version = bump_cache_version(OPERATOR_CACHE_NAME)
+    if operator_email is None or _version is None or new_version != _version + 1:
+        load_operator_producers()
+        return
+    operator = find_operator_producer(operator_email)
+    with _lock:
+        if operator:
+            _operator_producers[operator_email] = _producer_entry(operator)
+        else:
+            _operator_producers.pop(operator_email, None)
+        _version = new_version
+        _checked_at = time.monotonic()
+
+
+def preload_operator_producers():
+    """Caricamento all'avvio del worker; se MongoDB non risponde la mappa viene caricata alla prima lettura."""
+    try:
+        count = load_operator_producers()
+        print(f"[operator_cache] Loaded {count} operator-producer associations.")
+    except Exception as e:
+        print(f"[operator_cache] Preload failed: {e}")
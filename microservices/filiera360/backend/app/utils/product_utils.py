@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 # Funzione di utilità per confrontare i dati vecchi e nuovi e restituire le modifiche effettive
 def get_product_changes(old_data, new_data):
     changes = []
@@ -19,4 +22,32 @@ def get_product_changes(old_data, new_data):
                     "oldValue": old_data.get(key),
                     "newValue": new_data.get(key)
                 })
-    return changes
\ No newline at end of file
+    return changes
+
+# Applica a uno stato del prodotto le modifiche di una history entry ([{field, oldValue, newValue}, ...])
+def apply_product_changes(state, changes):
+    for change in changes or []:
+        field = change["field"]
+        new_value = change["newValue"]
+
+        if field.startswith("CustomObject."):
+            _, subkey = field.split(".", 1)
+            custom = state.get("CustomObject")
+            if not isinstance(custom, dict):
+                custom = state["CustomObject"] = {}
+            custom[subkey] = new_value
+        else:
+            state[field] = new_value
+    return state
+
+
+
+# Annulla su uno stato del prodotto le modifiche di una history entry (ripristina gli oldValue)
+def revert_product_changes(state, changes):
+    return apply_product_changes(state, [{"field": change["field"], "newValue": change.get("oldValue")}
+                                         for change in reversed(changes or [])])
+
+# Hash del contenuto di un prodotto (indipendente dall'ordine delle chiavi), per confrontare ledger e copie locali
+def product_content_hash(product):
+    canonical = json.dumps(product, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,26 @@
+import os
+import threading
+
+# Con LocalStack: AWS_ENDPOINT_URL=http://localstack:4566 e credenziali fittizie
+AWS_ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL")
+AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION", "eu-central-1")
+
+_clients = {}
+_lock = threading.Lock()
+
+def get_s3_client():
+    """Client S3 condiviso, creato al primo utilizzo (uno per processo, boto3 non è fork-safe)."""
+    pid = os.getpid()
+    client = _clients.get(pid)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(pid)
+        if client is None:
+            import boto3  # import locale: serve solo se è configurato un backend S3
+
+            client = boto3.client("s3", endpoint_url=AWS_ENDPOINT_URL, region_name=AWS_DEFAULT_REGION)
+            _clients.clear()
+            _clients[pid] = client
+        return client
@@ -0,0 +1,66 @@
+import re
+import unicodedata
+
+# Campi del prodotto indicizzati per la ricerca (il nome ha un peso maggiore nel punteggio)
+SEARCH_FIELDS = ("ID", "Name", "Manufacturer", "CountryOfOrigin", "Ingredients")
+# Lunghezza minima e massima dei prefissi indicizzati
+SEARCH_MIN_PREFIX = 2
+SEARCH_MAX_PREFIX = 12
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(value):
+    """Minuscolo e senza accenti (es. "Caffè" -> "caffe")."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def _strings(value):
+    """Testi contenuti in un valore del prodotto (stringhe, liste o oggetti, es. Ingredients)."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _strings(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield str(value)
+
+
+def tokenize(value):
+    """Parole normalizzate e senza ripetizioni, nell'ordine in cui compaiono."""
+    tokens = {}
+    for text in _strings(value):
+        for token in _TOKEN_PATTERN.findall(normalize_text(text)):
+            tokens.setdefault(token, None)
+    return list(tokens)
+
+
+def token_prefixes(token):
+    return [token[:length] for length in range(SEARCH_MIN_PREFIX, min(len(token), SEARCH_MAX_PREFIX) + 1)]
+
+
+def token_trigrams(token):
+    """Trigrammi della parola con i bordi (" ca", "caf", ...): la base del confronto con errori di battitura."""
+    padded = f" {token} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def build_search_fields(product):
+    """Campi di ricerca di un prodotto: parole, parole del nome, prefissi e trigrammi."""
+    terms = tokenize([product.get(field) for field in SEARCH_FIELDS])
+    prefixes, grams = {}, {}
+    for token in terms:
+        for prefix in token_prefixes(token):
+            prefixes.setdefault(prefix, None)
+        for gram in token_trigrams(token):
+            grams.setdefault(gram, None)
+    return {
+        "terms": terms,
+        "name": tokenize(product.get("Name")),
+        "prefixes": list(prefixes),
+        "grams": list(grams)
+    }
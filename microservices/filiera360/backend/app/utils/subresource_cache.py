@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Cache in memoria delle liste dei prodotti (movimenti, certificazioni, dati dei sensori), condivisa tra le
+# richieste del worker. Ogni lista è associata allo stamp (syncedAt, version) della vista product_view da cui
+# è stata letta: una scrittura di un altro worker cambia lo stamp e la lista in cache viene scartata alla lettura.
+SUBRESOURCE_CACHE_MAX_ENTRIES = int(os.getenv("SUBRESOURCE_CACHE_MAX_ENTRIES", 1000))
+# Liste più lunghe non vengono tenute in memoria
+SUBRESOURCE_CACHE_MAX_ITEMS = int(os.getenv("SUBRESOURCE_CACHE_MAX_ITEMS", 5000))
+
+_entries = OrderedDict()  # (ID prodotto, campo) -> (versione, lista), in ordine di uso
+_lock = threading.Lock()
+
+
+def get_subresource(product_id, field, stamp):
+    """Lista in cache se letta con lo stesso stamp della vista, altrimenti None."""
+    key = (product_id, field)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != stamp:
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return entry[1]
+
+
+def put_subresource(product_id, field, stamp, items):
+    key = (product_id, field)
+    with _lock:
+        if stamp is None or len(items) > SUBRESOURCE_CACHE_MAX_ITEMS:
+            _entries.pop(key, None)
+            return
+        _entries[key] = (stamp, list(items))
+        _entries.move_to_end(key)
+        while len(_entries) > SUBRESOURCE_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def append_subresource(product_id, field, previous_stamp, stamp, items):
+    """
+    Da chiamare dopo una scrittura che ha aggiunto `items` a `field` portando la vista da `previous_stamp`
+    a `stamp`. Le liste del prodotto lette a previous_stamp (nessun'altra scrittura nel mezzo) restano
+    valide e passano al nuovo stamp, quella di `field` con gli elementi aggiunti; le altre vengono scartate.
+    """
+    with _lock:
+        for key in [key for key in _entries if key[0] == product_id]:
+            cached_stamp, cached_items = _entries[key]
+            if cached_stamp != previous_stamp:
+                del _entries[key]
+            elif key[1] != field:
+                _entries[key] = (stamp, cached_items)
+            elif len(cached_items) + len(items) > SUBRESOURCE_CACHE_MAX_ITEMS:
+                del _entries[key]
+            else:
+                # nuova lista: chi ha già letto quella precedente non la vede cambiare
+                _entries[key] = (stamp, cached_items + list(items))
+
+
+def invalidate_subresources(product_id):
+    with _lock:
+        for key in [key for key in _entries if key[0] == product_id]:
+            del _entries[key]
@@ -0,0 +1,91 @@
+import base64
+import io
+import json
+import os
+import struct
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow è opzionale: senza il pacchetto le anteprime non vengono generate
+    Image = None
+
+# Lato massimo (pixel) dell'anteprima JPEG dei modelli
+MODEL_THUMBNAIL_SIZE = int(os.getenv("MODEL_THUMBNAIL_SIZE", 256))
+MODEL_THUMBNAIL_QUALITY = int(os.getenv("MODEL_THUMBNAIL_QUALITY", 80))
+
+GLB_MAGIC = b"glTF"
+GLB_HEADER_SIZE = 12
+GLB_CHUNK_HEADER_SIZE = 8
+GLB_JSON_CHUNK = 0x4E4F534A
+
+
+def thumbnails_enabled():
+    return Image is not None
+
+
+def _read_range(store, blob_key, start, length):
+    return b"".join(store.open_stream(blob_key, start, length))
+
+
+def _preferred_image_index(gltf):
+    """Immagine della texture base del primo materiale, altrimenti la prima immagine del file."""
+    try:
+        texture_index = gltf["materials"][0]["pbrMetallicRoughness"]["baseColorTexture"]["index"]
+        image_index = gltf["textures"][texture_index]["source"]
+        if 0 <= image_index < len(gltf["images"]):
+            return image_index
+    except (KeyError, IndexError, TypeError):
+        pass
+    return 0
+
+
+def extract_glb_image(store, blob_key, size):
+    """
+    Restituisce i byte della texture principale di un GLB, o None se non ce ne sono.
+    Dal blob store vengono letti solo header, chunk JSON e l'immagine, non l'intero file.
+    """
+    header = _read_range(store, blob_key, 0, GLB_HEADER_SIZE + GLB_CHUNK_HEADER_SIZE)
+    if len(header) < GLB_HEADER_SIZE + GLB_CHUNK_HEADER_SIZE or header[:4] != GLB_MAGIC:
+        return None
+    json_length, chunk_type = struct.unpack_from("<II", header, GLB_HEADER_SIZE)
+    json_start = GLB_HEADER_SIZE + GLB_CHUNK_HEADER_SIZE
+    if chunk_type != GLB_JSON_CHUNK or json_start + json_length > size:
+        return None
+
+    gltf = json.loads(_read_range(store, blob_key, json_start, json_length))
+    images = gltf.get("images") or []
+    if not images:
+        return None
+    image = images[_preferred_image_index(gltf)]
+
+    if "bufferView" in image:
+        view = gltf["bufferViews"][image["bufferView"]]
+        if view.get("buffer", 0) != 0:
+            return None
+        # il chunk BIN segue il chunk JSON (allineato a 4 byte) e il suo header
+        bin_start = json_start + json_length + GLB_CHUNK_HEADER_SIZE
+        image_start = bin_start + view.get("byteOffset", 0)
+        if image_start + view["byteLength"] > size:
+            return None
+        return _read_range(store, blob_key, image_start, view["byteLength"])
+
+    uri = image.get("uri", "")
+    if uri.startswith("data:") and ";base64," in uri:
+        return base64.b64decode(uri.split(",", 1)[1])
+    return None
+
+
+def make_thumbnail(image_bytes):
+    """JPEG ridimensionato a MODEL_THUMBNAIL_SIZE; None se Pillow non riconosce il formato (es. KTX2)."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.draft("RGB", (MODEL_THUMBNAIL_SIZE, MODEL_THUMBNAIL_SIZE))
+            image.thumbnail((MODEL_THUMBNAIL_SIZE, MODEL_THUMBNAIL_SIZE))
+            output = io.BytesIO()
+            image.convert("RGB").save(output, format="JPEG", quality=MODEL_THUMBNAIL_QUALITY, optimize=True)
+            return output.getvalue()
+    except (OSError, ValueError) as e:
+        print(f"[thumbnail_utils] Cannot create thumbnail: {e}")
+        return None
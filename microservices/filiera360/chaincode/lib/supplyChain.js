@@ -358,6 +358,26 @@ class SupplyChainContract extends Contract {
         console.info(`Dati del sensore aggiunti per il prodotto ${id}.`);
     }
 
+    async AddSensorDataBatch(ctx, id, readings) {
+        const productAsBytes = await ctx.stub.getState(id);
+        if (!productAsBytes || productAsBytes.length === 0) {
+            throw new Error(`Il prodotto ${id} non esiste.`);
+        }
+        const product = JSON.parse(productAsBytes.toString());
+
+        // Più letture in una sola transazione: un solo putState per prodotto
+        const parsedReadings = JSON.parse(readings);
+        for (const reading of parsedReadings) {
+            product.SensorData.push({
+                SensorId: reading.SensorId,
+                Signals: reading.Signals
+            });
+        }
+
+        await ctx.stub.putState(id, Buffer.from(JSON.stringify(product)));
+        console.info(`${parsedReadings.length} letture di sensori aggiunte per il prodotto ${id}.`);
+    }
+
     async AddCertification(ctx, id, certificationType, certifyingBody, issueDate) {
          // Retrieve the product data from the state
          const productAsBytes = await ctx.stub.getState(id);
@@ -402,6 +422,31 @@ class SupplyChainContract extends Contract {
         return ctx.stub.putState(id, Buffer.from(stringify(sortKeysRecursive(res))));
     }
 
+    // Pagina di prodotti del world state (i lotti e gli altri valori vengono esclusi), per le scansioni complete
+    async GetProductsPage(ctx, pageSize, bookmark) {
+        const { iterator, metadata } = await ctx.stub.getStateByRangeWithPagination('', '', parseInt(pageSize, 10), bookmark || '');
+        const products = [];
+        while (true) {
+            const res = await iterator.next();
+            if (res.value) {
+                let record;
+                try {
+                    record = JSON.parse(res.value.value.toString('utf8'));
+                } catch (err) {
+                    record = null;
+                }
+                if (record && typeof record === 'object' && record.ID && record.Manufacturer !== undefined && record.ProductId === undefined) {
+                    products.push(record);
+                }
+            }
+            if (res.done) {
+                await iterator.close();
+                break;
+            }
+        }
+        return JSON.stringify({ products, bookmark: metadata.bookmark, fetchedRecordsCount: metadata.fetchedRecordsCount });
+    }
+
     async GetAllSensorData(ctx, id) {
         const productAsBytes = await ctx.stub.getState(id);
         if (!productAsBytes || productAsBytes.length === 0) {
@@ -6,18 +6,21 @@ export const ManageOperators = () => {
   const [operators, setOperators] = useState([]);
   const [newOperator, setNewOperator] = useState('');
   const [errorMessage, setErrorMessage] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
 
-  // Funzione per caricare la lista operatori dal backend
-  const fetchOperators = async () => {
+  // Funzione per caricare la lista operatori dal backend (paginata: `after` è il cursore della pagina successiva)
+  const fetchOperators = async (after = null) => {
     try {
       const response = await axios.get(`api/operators`, {
+        params: after ? { after } : {},
         headers: {
           Authorization: `Bearer ${localStorage.getItem('token')}`,
         },
       });
       // estrai solo le email dagli oggetti operatori
       const operatorEmails = (response.data.operators || []).map((op) => (typeof op === 'string' ? op : op.email));
-      setOperators(operatorEmails);
+      setOperators((previous) => (after ? [...previous, ...operatorEmails] : operatorEmails));
+      setNextCursor(response.data.nextCursor || null);
     } catch (error) {
       console.error(error);
     }
@@ -129,6 +132,16 @@ export const ManageOperators = () => {
                 </Button>
               </div>
             ))}
+            {nextCursor && (
+              <div style={{ textAlign: 'center' }}>
+                <Button
+                  variant="outline-secondary"
+                  onClick={() => fetchOperators(nextCursor)}
+                >
+                  Load more
+                </Button>
+              </div>
+            )}
           </div>
         </div>
       </div>
@@ -4,6 +4,7 @@ import { Card, Form, Button } from 'react-bootstrap';
 import '../../../../styles/App.css';
 import Viewer3D from '../../../products/Viewer3D';
 import AddSensorData from './AddSensorData';
+import { uploadModel as uploadProductModel } from '../../../../services/productService';
 
 const UpdateProduct = ({ productId, onProductUpdate }) => {
   const [name, setName] = useState('');
@@ -98,39 +99,11 @@ const UpdateProduct = ({ productId, onProductUpdate }) => {
 
     console.log('Sending updated product data:', productData);
 
-    // Funzione per convertire il file GLB in base64
-    const convertFileToBase64 = async (glbFile) => {
-      console.log('Converting blob URL to base64...');
-      return fetch(glbFile)
-        .then((response) => response.blob())
-        .then((blob) => {
-          return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-            reader.onloadend = () => resolve(reader.result);
-            reader.onerror = reject;
-            reader.readAsDataURL(blob);
-          });
-        })
-        .catch((error) => {
-          console.error('Error fetching blob:', error);
-          throw new Error('Failed to convert blob URL to base64.');
-        });
-    };
-
-    // Funzione per fare POST del modello 3D aggiornato
+    // Funzione per caricare il modello 3D aggiornato (upload a parti)
     const uploadModel = async () => {
       try {
-        const base64File = await convertFileToBase64(glbFile);
-        const postData = {
-          ID: productId,
-          ModelBase64: base64File,
-        };
         console.log('Uploading updated model for product: ' + productId);
-
-        const token = localStorage.getItem('token');
-        const response = await axios.post('api/uploadModel', postData, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
+        await uploadProductModel(productId, glbFile);
         console.log('Model uploaded successfully!');
       } catch (error) {
         console.error('Failed to upload model.');
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
+import { fetchModel } from '../../../../services/productService';
 
 export const useBatchScanner = () => {
     const [itemCodeBatch, setItemCodeBatch] = useState('');
@@ -31,7 +32,7 @@ export const useBatchScanner = () => {
 
                 if (responseProduct.status === 200) {
                     setBatchProduct(responseProduct.data);
-                    await fetchGLBModel(idproduct);
+                    await fetchGLBModel(responseProduct.data.ModelUrl);
                 }
 
                 setMessageBatch(`Batch ${itemCodeBatch} found!`);
@@ -49,19 +50,16 @@ export const useBatchScanner = () => {
         }
     };
 
-    const fetchGLBModel = async (productId) => {
+    const fetchGLBModel = async (modelUrl) => {
+        if (!modelUrl) {
+            // prodotto senza modello 3D
+            setGlbFile(null);
+            return;
+        }
         try {
-            const modelResponse = await axios.get(`api/getModel?productId=${productId}`);
+            const modelResponse = await fetchModel(modelUrl);
             if (modelResponse.status === 200) {
-                const base64Model = modelResponse.data.ModelBase64;
-                const byteCharacters = atob(base64Model.split(',')[1]);
-                const byteArray = new Uint8Array(byteCharacters.length);
-
-                for (let i = 0; i < byteCharacters.length; i++) {
-                    byteArray[i] = byteCharacters.charCodeAt(i);
-                }
-
-                const glbBlob = new Blob([byteArray], { type: 'application/octet-stream' });
+                const glbBlob = modelResponse.data;
                 setGlbFile(glbBlob);
             }
         } catch (error) {
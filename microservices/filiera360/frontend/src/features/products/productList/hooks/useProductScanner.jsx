@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
+import { fetchModel } from '../../../../services/productService';
 
 export const useProductScanner = () => {
     const [itemCode, setItemCode] = useState('');
@@ -25,7 +26,7 @@ export const useProductScanner = () => {
                 setMessage(`Product ${itemCode} found!`);
                 setProductHistory(historyResponse.data || '');
                 // Fetch GLB model
-                await fetchGLBModel(itemCode);
+                await fetchGLBModel(productData.ModelUrl);
 
                 window.scrollTo({ top: 0, behavior: 'smooth' });
                 return productData;
@@ -41,20 +42,17 @@ export const useProductScanner = () => {
         }
     };
 
-    const fetchGLBModel = async (productId) => {
+    const fetchGLBModel = async (modelUrl) => {
+        if (!modelUrl) {
+            // prodotto senza modello 3D
+            setGlbFile(null);
+            return;
+        }
         try {
-            const modelResponse = await axios.get(`api/getModel?productId=${productId}`);
+            const modelResponse = await fetchModel(modelUrl);
 
             if (modelResponse.status === 200) {
-                const base64Model = modelResponse.data.ModelBase64;
-                const byteCharacters = atob(base64Model.split(',')[1]);
-                const byteArray = new Uint8Array(byteCharacters.length);
-
-                for (let i = 0; i < byteCharacters.length; i++) {
-                    byteArray[i] = byteCharacters.charCodeAt(i);
-                }
-
-                const glbBlob = new Blob([byteArray], { type: 'application/octet-stream' });
+                const glbBlob = modelResponse.data;
                 setGlbFile(glbBlob);
                 console.log('GLB model loaded successfully!');
             } else {
@@ -1,5 +1,4 @@
 import axios from 'axios';
-import { convertFileToBase64 } from '../utils/file';
 
 export const uploadProduct = async (productData) => {
   const token = localStorage.getItem('token');
@@ -12,22 +11,51 @@ export const uploadProduct = async (productData) => {
   });
 };
 
+const MODEL_UPLOAD_RETRIES = 3;
+
+// Upload a parti riprendibile: init, PUT delle parti mancanti, complete.
+// Se una parte fallisce si chiede al server lo stato e si reinviano solo le parti mancanti.
 export const uploadModel = async (id, glbFile) => {
   try {
-    const base64File = await convertFileToBase64(glbFile);
-    const token = localStorage.getItem('token');
+    const file = typeof glbFile === 'string' ? await fetch(glbFile).then((res) => res.blob()) : glbFile;
+    const headers = { Authorization: `Bearer ${localStorage.getItem('token')}` };
 
-    return axios.post(
-      'api/uploadModel',
-      { ID: id, ModelBase64: base64File },
-      { headers: { Authorization: `Bearer ${token}` } },
+    const { data: upload } = await axios.post(
+      'api/uploadModel/init',
+      { ID: id, size: file.size, contentType: file.type || 'model/gltf-binary' },
+      { headers },
     );
+
+    let missingParts = upload.missingParts;
+    for (let attempt = 0; missingParts.length > 0; attempt++) {
+      try {
+        for (const partNumber of missingParts) {
+          const start = (partNumber - 1) * upload.partSize;
+          await axios.put(
+            `api/uploadModel/${upload.uploadId}/parts/${partNumber}`,
+            file.slice(start, start + upload.partSize),
+            { headers: { ...headers, 'Content-Type': 'application/octet-stream' } },
+          );
+        }
+        missingParts = [];
+      } catch (err) {
+        if (attempt >= MODEL_UPLOAD_RETRIES) throw err;
+        const { data: status } = await axios.get(`api/uploadModel/${upload.uploadId}`, { headers });
+        missingParts = status.missingParts;
+      }
+    }
+
+    return axios.post(`api/uploadModel/${upload.uploadId}/complete`, null, { headers });
   } catch (err) {
     console.error('Failed to upload 3D model.', err);
     throw err;
   }
 };
 
+// Il modello si scarica dall'URL con l'hash del contenuto (ModelUrl di /getProduct, ?v=<hash>), servito come
+// immutabile: il browser lo riusa dalla cache senza rivalidarlo finché il modello non cambia.
+export const fetchModel = async (modelUrl) => axios.get(`api${modelUrl}`, { responseType: 'blob' });
+
 export const addToRecentlyScanned = async (productData) => {
   try {
     const scannedProduct = {
@@ -115,6 +115,47 @@ class ProductController {
         }
     }
 
+    /**
+     * Add a batch of sensor readings to product
+     */
+    async addSensorDataBatch(req, res) {
+        try {
+            const { id, readings } = req.body;
+            if (!id || !Array.isArray(readings) || readings.length === 0) {
+                return res.status(400).json({ error: 'id and a non-empty readings array are required' });
+            }
+            await contractService.addSensorDataBatch(id, readings);
+
+            res.status(200).json({
+                message: `${readings.length} sensor readings added to product ${id}`
+            });
+        } catch (error) {
+            console.error(`Failed to add sensor data batch: ${error}`);
+            res.status(500).json({
+                error: `Error adding sensor data batch: ${error.message}`
+            });
+        }
+    }
+
+    /**
+     * Get a page of products (bookmark from the previous page)
+     */
+    async getProductsPage(req, res) {
+        const pageSize = parseInt(req.query.pageSize, 10) || 100;
+        if (pageSize < 1 || pageSize > 1000) {
+            return res.status(400).json({ error: 'pageSize must be between 1 and 1000' });
+        }
+        try {
+            const page = await contractService.getProductsPage(pageSize, req.query.bookmark);
+            res.json(page);
+        } catch (error) {
+            console.error(`Failed to get products page: ${error}`);
+            res.status(500).json({
+                error: `Error getting products page: ${error.message}`
+            });
+        }
+    }
+
     /**
      * Add certification to product
      */
@@ -282,6 +282,14 @@ class ContractService {
         await contract.submitTransaction('AddSensorData', id, sensorId, JSON.stringify(signals));
     }
 
+    /**
+     * Add several sensor readings to a product in a single transaction
+     */
+    async addSensorDataBatch(id, readings) {
+        const contract = this.getContract();
+        await contract.submitTransaction('AddSensorDataBatch', id, JSON.stringify(readings));
+    }
+
     /**
      * Add certification to product
      */
@@ -290,6 +298,15 @@ class ContractService {
         await contract.submitTransaction('AddCertification', id, certificationType, certifyingBody, issueDate);
     }
 
+    /**
+     * Get a page of products from the world state
+     */
+    async getProductsPage(pageSize, bookmark) {
+        const contract = this.getContract();
+        const response = await contract.evaluateTransaction('GetProductsPage', String(pageSize), bookmark || '');
+        return JSON.parse(utf8Decoder.decode(response));
+    }
+
     /**
      * Get all sensor data for a product
      */
@@ -13,6 +13,9 @@ router.get('/readProduct', productController.readProduct);
 // GET /productHistory?productId=xxx
 router.get('/productHistory', productController.getProductHistory);
 
+// GET /api/product/page?pageSize=xxx&bookmark=xxx
+router.get('/api/product/page', productController.getProductsPage);
+
 // POST /uploadProduct
 router.post('/uploadProduct', productController.uploadProduct);
 
@@ -22,6 +25,9 @@ router.post('api/product/updateProduct', productController.updateProduct);
 // POST api/product/sensor
 router.post('api/product/sensor', productController.addSensorData);
 
+// POST /api/product/sensor/bulk
+router.post('/api/product/sensor/bulk', productController.addSensorDataBatch);
+
 // POST api/product/certification
 router.post('api/product/certification', productController.addCertification);
 
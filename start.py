@@ -223,6 +223,9 @@ def start_infrastructure():
     # allow_fail=True ensures script doesn't crash if bucket/repo already exists
     print("   - Ensure S3 Bucket 'ecofood-backup' exists")
     run_command(["awslocal", "s3", "mb", "s3://ecofood-backup"], allow_fail=True)
+
+    print("   - Ensure S3 Bucket 'ecofood-models' exists")
+    run_command(["awslocal", "s3", "mb", "s3://ecofood-models"], allow_fail=True)
     
     print("   - Ensure ECR Repo 'metaverso' exists")
     run_command(["awslocal", "ecr", "create-repository", "--repository-name", "metaverso"], allow_fail=True)